@@ -0,0 +1,376 @@
+"""
+Command-line entry point: `helioweb <command> ...`.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from helioweb.infra.core import close_mongodb, get_mongodb
+
+
+def check_hierarchy(args):
+    from helioweb.infra.hierarchy import check_hierarchy
+
+    async def run():
+        try:
+            return {
+                type_: await check_hierarchy(get_mongodb(), type_, ids=args.id)
+                for type_ in args.type or ["Concept", "Institution"]
+            }
+        finally:
+            await close_mongodb()
+
+    problems = asyncio.run(run())
+    for type_, found in problems.items():
+        print(f"{type_}: {len(found)} discrepancies")
+        for p in found:
+            print(json.dumps(p))
+    return 1 if any(problems.values()) else 0
+
+
+def refresh_facets(args):
+    from helioweb.infra.facets import materialize_facets, refresh_facets
+
+    async def run():
+        try:
+            if args.materialize:
+                await materialize_facets(get_mongodb())
+            else:
+                await refresh_facets(get_mongodb())
+        finally:
+            await close_mongodb()
+
+    asyncio.run(run())
+    return 0
+
+
+def index_autocomplete(args):
+    from helioweb.infra.autocomplete import AC_TYPES, backfill_autocomplete
+    from helioweb.infra.indexes import ensure_indexes
+
+    async def run():
+        mdb = get_mongodb()
+        try:
+            await ensure_indexes(mdb, collections=["alldocs"])
+            return await backfill_autocomplete(mdb, types=args.type or AC_TYPES)
+        finally:
+            await close_mongodb()
+
+    print(f"{asyncio.run(run())} documents updated")
+    return 0
+
+
+def ensure_indexes(args):
+    from helioweb.infra.indexes import ensure_indexes
+
+    async def run():
+        try:
+            return await ensure_indexes(get_mongodb())
+        finally:
+            await close_mongodb()
+
+    created = asyncio.run(run())
+    print(f"created {', '.join(created)}" if created else "all indexes exist")
+    return 0
+
+
+def check_indexes(args):
+    from helioweb.infra.indexes import collscans, index_drift
+
+    async def run():
+        mdb = get_mongodb()
+        try:
+            return await index_drift(mdb), await collscans(mdb) if args.explain else []
+        finally:
+            await close_mongodb()
+
+    drift, scans = asyncio.run(run())
+    for d in drift:
+        print(f"{d['collection']}.{d['name']}: {d['problem']}")
+    for label in scans:
+        print(f"{label}: COLLSCAN")
+    return 1 if drift or scans else 0
+
+
+def sync_edges(args):
+    from helioweb.infra.edges import rebuild_edges
+    from helioweb.infra.indexes import ensure_indexes
+
+    async def run():
+        mdb = get_mongodb()
+        try:
+            await ensure_indexes(mdb, collections=["edges"])
+            await rebuild_edges(mdb)
+            return await mdb.edges.estimated_document_count()
+        finally:
+            await close_mongodb()
+
+    print(f"{asyncio.run(run())} edges")
+    return 0
+
+
+def snapshot_graph(args):
+    from helioweb.infra.config import GRAPH_SNAPSHOT_PATH
+    from helioweb.infra.core import get_sync_mongodb
+    from helioweb.infra.snapshot import build_snapshot
+
+    path = args.path or GRAPH_SNAPSHOT_PATH
+    if not path:
+        print("no path given and GRAPH_SNAPSHOT_PATH is not set", file=sys.stderr)
+        return 2
+    meta = build_snapshot(get_sync_mongodb(), path)
+    print(
+        f"published {path}: {meta['nodes']} nodes, {sum(meta['edges'].values())} edges"
+    )
+    return 0
+
+
+def similar_authors(args):
+    from helioweb.infra.similar import build_similar, update_similar
+    from helioweb.ui.cache import invalidate_pages
+
+    async def run():
+        mdb = get_mongodb()
+        try:
+            if args.stale:
+                n = await update_similar(mdb, k=args.k)
+            else:
+                n = await build_similar(mdb, k=args.k)
+            if n:
+                # author pages show the lists, and cached pages do not expire
+                await invalidate_pages(mdb)
+            return n
+        finally:
+            await close_mongodb()
+
+    print(f"{asyncio.run(run())} authors updated")
+    return 0
+
+
+def invalidate_caches(args):
+    from helioweb.infra.search import invalidate_search
+    from helioweb.ui.cache import invalidate_pages
+
+    async def run():
+        mdb = get_mongodb()
+        try:
+            await invalidate_search(mdb)
+            await invalidate_pages(mdb)
+        finally:
+            await close_mongodb()
+
+    asyncio.run(run())
+    return 0
+
+
+def load_dump(args):
+    from helioweb.infra.config import GRAPH_SNAPSHOT_PATH
+    from helioweb.infra.core import get_sync_mongodb
+    from helioweb.infra.edges import rebuild_edges
+    from helioweb.infra.facets import materialize_facets
+    from helioweb.infra.funnel import invalidate_funnel
+    from helioweb.infra.hierarchy import invalidate_hierarchies
+    from helioweb.infra.indexes import INDEXES
+    from helioweb.infra.load import load
+    from helioweb.infra.search import invalidate_search
+    from helioweb.infra.similar import build_similar
+    from helioweb.infra.snapshot import build_snapshot
+    from helioweb.ui.cache import invalidate_pages
+
+    load(
+        get_sync_mongodb(),
+        args.path,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        swap=not args.no_swap,
+        restart=args.restart,
+        indexes=INDEXES["alldocs"],
+    )
+
+    async def refresh():
+        # rebuild what is derived from the corpus, and have every worker drop its copies
+        mdb = get_mongodb()
+        try:
+            await rebuild_edges(mdb)
+            await build_similar(mdb)
+            await materialize_facets(mdb)
+            await invalidate_hierarchies(mdb)
+            await invalidate_funnel(mdb)
+            await invalidate_search(mdb)
+            await invalidate_pages(mdb)
+        finally:
+            await close_mongodb()
+
+    asyncio.run(refresh())
+    if GRAPH_SNAPSHOT_PATH:
+        build_snapshot(get_sync_mongodb(), GRAPH_SNAPSHOT_PATH)
+    return 0
+
+
+def ingest_vocabulary(args):
+    from helioweb.infra.config import GRAPH_SNAPSHOT_PATH
+    from helioweb.infra.core import get_sync_mongodb
+    from helioweb.infra.facets import materialize_facets
+    from helioweb.infra.funnel import invalidate_funnel
+    from helioweb.infra.hierarchy import invalidate_hierarchies
+    from helioweb.infra.ontology import TOPIC_ROOT, ingest
+    from helioweb.infra.search import invalidate_search
+    from helioweb.infra.snapshot import build_snapshot
+    from helioweb.ui.cache import invalidate_pages
+
+    counts = ingest(
+        get_sync_mongodb(),
+        args.path,
+        source=args.source,
+        format=args.format,
+        topic_root=args.topic_root or TOPIC_ROOT,
+        batch_size=args.batch_size,
+    )
+    if not counts["written"] and not counts["deleted"]:
+        return 0
+
+    async def refresh():
+        # facet lists and pages copy concepts' labels
+        mdb = get_mongodb()
+        try:
+            await materialize_facets(mdb)
+            await invalidate_hierarchies(mdb)
+            await invalidate_funnel(mdb)
+            await invalidate_search(mdb)
+            await invalidate_pages(mdb)
+        finally:
+            await close_mongodb()
+
+    asyncio.run(refresh())
+    if GRAPH_SNAPSHOT_PATH:
+        build_snapshot(get_sync_mongodb(), GRAPH_SNAPSHOT_PATH)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="helioweb")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser(
+        "check-hierarchy",
+        help="compare the in-process hierarchy index against the database aggregations",
+    )
+    p.add_argument(
+        "--type",
+        action="append",
+        choices=["Concept", "Institution"],
+        help="hierarchy to check (repeatable; default: both)",
+    )
+    p.add_argument("--id", action="append", help="node to check (default: all)")
+    p.set_defaults(func=check_hierarchy)
+
+    p = commands.add_parser(
+        "refresh-facets",
+        help="make every worker reload the cached funnel/concept facet lists",
+    )
+    p.add_argument(
+        "--materialize",
+        action="store_true",
+        help="first rebuild all_author_concepts and all_work_institutions from alldocs",
+    )
+    p.set_defaults(func=refresh_facets)
+
+    p = commands.add_parser(
+        "index-autocomplete",
+        help="store and index the work/concept autocomplete keys (run after a load)",
+    )
+    p.add_argument(
+        "--type",
+        action="append",
+        choices=["Work", "Concept"],
+        help="document type to index (repeatable; default: both)",
+    )
+    p.set_defaults(func=index_autocomplete)
+
+    p = commands.add_parser(
+        "ensure-indexes", help="create the indexes that page queries rely on"
+    )
+    p.set_defaults(func=ensure_indexes)
+
+    p = commands.add_parser(
+        "check-indexes",
+        help="report indexes missing from or differing from the registry; exit 1 if any",
+    )
+    p.add_argument(
+        "--explain",
+        action="store_true",
+        help="also fail if a route's canonical query would scan a whole collection",
+    )
+    p.set_defaults(func=check_indexes)
+
+    p = commands.add_parser(
+        "sync-edges",
+        help="rebuild the edges collection from the outgoing arrays in alldocs",
+    )
+    p.set_defaults(func=sync_edges)
+
+    p = commands.add_parser(
+        "snapshot-graph",
+        help="build the memory-mapped graph snapshot and publish it for the workers",
+    )
+    p.add_argument("--path", help="default: GRAPH_SNAPSHOT_PATH")
+    p.set_defaults(func=snapshot_graph)
+
+    p = commands.add_parser(
+        "similar-authors",
+        help="store each author's most similar authors by concept alignment",
+    )
+    p.add_argument(
+        "--stale",
+        action="store_true",
+        help="only recompute authors whose concept edges changed since the last run",
+    )
+    p.add_argument("--k", type=int, default=20, help="authors to keep per author")
+    p.set_defaults(func=similar_authors)
+
+    p = commands.add_parser(
+        "invalidate-caches",
+        help="make every worker drop its cached search results and rendered pages",
+    )
+    p.set_defaults(func=invalidate_caches)
+
+    p = commands.add_parser(
+        "load",
+        help="load the alldocs NDJSON dump (.gz or plain), resuming an interrupted load",
+    )
+    p.add_argument("path", help="e.g. helioweb.alldocs.ndjson.gz")
+    p.add_argument("--batch-size", type=int, default=1000)
+    p.add_argument("--workers", type=int, default=4, help="concurrent insert threads")
+    p.add_argument(
+        "--no-swap",
+        action="store_true",
+        help="write into alldocs directly instead of a staging collection renamed over it",
+    )
+    p.add_argument(
+        "--restart", action="store_true", help="ignore any checkpoint and start over"
+    )
+    p.set_defaults(func=load_dump)
+
+    p = commands.add_parser(
+        "ingest-vocabulary",
+        help="upsert the concepts of a SKOS/OWL vocabulary (e.g. CfHA.ttl) into alldocs",
+    )
+    p.add_argument("path", help="Turtle, N-Triples, RDF/XML, ... (.gz or plain)")
+    p.add_argument("--source", help="tag for the documents (default: the file name)")
+    p.add_argument("--format", help="rdflib parser name (default: from the extension)")
+    p.add_argument(
+        "--topic-root",
+        help="class whose subclasses and their individuals are concepts "
+        "(default: CfHA:Topic)",
+    )
+    p.add_argument("--batch-size", type=int, default=1000)
+    p.set_defaults(func=ingest_vocabulary)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
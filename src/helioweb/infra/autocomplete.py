@@ -0,0 +1,99 @@
+"""
+Indexed autocomplete over the `display_name` of works and concepts.
+
+Each document stores the normalized words of its name in `_ac`, served by a {type, _ac} index.
+A query matches documents with, for each of its words, a stored word starting with it, so every
+lookup is an anchored, case-sensitive prefix scan of that index. Candidates are then ranked in
+process: names starting with the whole query first, then more whole-word hits, then shorter names.
+"""
+
+import re
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import ExecutionTimeout
+
+from helioweb.infra.config import AUTOCOMPLETE_MAX_TIME_MS
+from helioweb.infra.metrics import named
+from helioweb.infra.typeahead import normalize
+
+AC_FIELD = "_ac"
+AC_INDEX = [("type", ASCENDING), (AC_FIELD, ASCENDING)]
+AC_TYPES = ["Work", "Concept"]
+CANDIDATES = 200
+
+
+def ac_words(s):
+    """Normalized words of `s`, in order, without duplicates."""
+    return list(dict.fromkeys(re.findall(r"\w+", normalize(s))))
+
+
+def ac_keys(doc):
+    """The `_ac` value to store with `doc`."""
+    return ac_words(doc.get("display_name"))
+
+
+def _rank(words):
+    prefix = " ".join(words)
+
+    def key(doc):
+        keys = ac_keys(doc)
+        name = " ".join(keys)
+        return (
+            not name.startswith(prefix),
+            -len(set(words) & set(keys)),
+            len(name),
+            name,
+        )
+
+    return key
+
+
+@named("autocomplete")
+async def autocomplete(mdb, type_, q, filter_=None, projection=None, limit=25):
+    """Up to `limit` docs of `type_` matching `q`, best first.
+
+    `filter_` further restricts the matches, e.g. to exclude already-linked documents. The lookup
+    is abandoned after AUTOCOMPLETE_MAX_TIME_MS, returning no suggestions for that keystroke.
+    """
+    words = ac_words(q)
+    if not words:
+        return []
+    query = {
+        "type": type_,
+        "$and": [{AC_FIELD: re.compile("^" + re.escape(w))} for w in words],
+        **(filter_ or {}),
+    }
+    try:
+        candidates = await mdb.alldocs.find(
+            query,
+            ["display_name", *(projection or [])],
+            limit=CANDIDATES,
+            max_time_ms=AUTOCOMPLETE_MAX_TIME_MS,
+        ).to_list()
+    except ExecutionTimeout:
+        return []
+    return sorted(candidates, key=_rank(words))[:limit]
+
+
+async def backfill_autocomplete(mdb, types=AC_TYPES, batch_size=1000):
+    """Store `_ac` keys for every document of `types` whose keys are missing or stale.
+
+    Returns the number of documents updated.
+    """
+    updated, batch = 0, []
+    async for doc in mdb.alldocs.find(
+        {"type": {"$in": list(types)}},
+        ["display_name", AC_FIELD],
+        batch_size=batch_size,
+    ):
+        keys = ac_keys(doc)
+        if doc.get(AC_FIELD) != keys:
+            batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {AC_FIELD: keys}}))
+        if len(batch) >= batch_size:
+            updated += (
+                await mdb.alldocs.bulk_write(batch, ordered=False)
+            ).modified_count
+            batch = []
+    if batch:
+        updated += (await mdb.alldocs.bulk_write(batch, ordered=False)).modified_count
+    return updated
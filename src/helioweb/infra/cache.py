@@ -0,0 +1,64 @@
+"""
+Process-local LRU cache bounded by the total size of its values, with an optional TTL.
+
+`hits` and `misses` count lookups since the cache was created.
+"""
+
+from collections import OrderedDict
+import time
+
+
+class LRUCache:
+    def __init__(self, max_bytes, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is not None and (
+            self.ttl is not None and time.monotonic() - entry[2] >= self.ttl
+        ):
+            self.pop(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size):
+        """Store `value`, counted as `size` bytes, evicting least recently used entries."""
+        self.pop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size, time.monotonic())
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+
+    def pop(self, key):
+        if (entry := self._entries.pop(key, None)) is not None:
+            self.nbytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
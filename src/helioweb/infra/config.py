@@ -5,6 +5,33 @@ MONGO_HOST = os.environ.get("MONGO_HOST")
 MONGO_TLS = bool(os.environ.get("MONGO_TLS"))
 MONGO_USER = os.environ.get("MONGO_USER")
 MONGO_PASSWORD = os.environ.get("MONGO_PASSWORD")
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 20))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 300_000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 5_000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000)
+)
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", 60_000))
+MONGO_PING_ON_STARTUP = bool(os.environ.get("MONGO_PING_ON_STARTUP"))
+INDEX_CHECK_ON_STARTUP = bool(os.environ.get("INDEX_CHECK_ON_STARTUP"))
+METRICS_ENABLED = bool(os.environ.get("METRICS_ENABLED"))
+VERSION_CHECK_SECONDS = float(os.environ.get("VERSION_CHECK_SECONDS", 5))
+FACET_TTL_SECONDS = float(os.environ.get("FACET_TTL_SECONDS", 3600))
+AUTOCOMPLETE_MAX_TIME_MS = int(os.environ.get("AUTOCOMPLETE_MAX_TIME_MS", 200))
+TEMPLATE_STREAMING = bool(os.environ.get("TEMPLATE_STREAMING"))
+TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get("TEMPLATE_BYTECODE_CACHE_DIR")
+CONNECTION_TIMEOUT_MS = int(os.environ.get("CONNECTION_TIMEOUT_MS", 500))
+PAGE_CACHE_MAX_BYTES = int(os.environ.get("PAGE_CACHE_MAX_BYTES", 64 * 2**20))
+SEARCH_CACHE_MAX_BYTES = int(os.environ.get("SEARCH_CACHE_MAX_BYTES", 32 * 2**20))
+SEARCH_CACHE_TTL_SECONDS = float(os.environ.get("SEARCH_CACHE_TTL_SECONDS", 600))
+SEARCH_CACHE_SHARED = bool(os.environ.get("SEARCH_CACHE_SHARED"))
+GRAPH_SNAPSHOT_PATH = os.environ.get("GRAPH_SNAPSHOT_PATH")
 ORCID_CLIENT_ID = os.environ.get("ORCID_CLIENT_ID")
 ORCID_CLIENT_SECRET = os.environ.get("ORCID_CLIENT_SECRET")
 ORCID_REDIRECT_URI = os.environ.get("ORCID_REDIRECT_URI")
+ORCID_TOKEN_URL = os.environ.get("ORCID_TOKEN_URL", "https://orcid.org/oauth/token")
+ORCID_TIMEOUT_SECONDS = float(os.environ.get("ORCID_TIMEOUT_SECONDS", 5))
+ORCID_RETRIES = int(os.environ.get("ORCID_RETRIES", 2))
+ORCID_BREAKER_FAILURES = int(os.environ.get("ORCID_BREAKER_FAILURES", 5))
+ORCID_BREAKER_RESET_SECONDS = float(os.environ.get("ORCID_BREAKER_RESET_SECONDS", 30))
@@ -1,11 +1,75 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 
-from helioweb.infra.config import MONGO_HOST, MONGO_TLS, MONGO_USER, MONGO_PASSWORD
+from helioweb.infra.config import (
+    MONGO_HOST,
+    MONGO_TLS,
+    MONGO_USER,
+    MONGO_PASSWORD,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    METRICS_ENABLED,
+)
+from helioweb.infra.metrics import command_metrics
 
+_client: AsyncMongoClient | None = None
+_sync_client: MongoClient | None = None
 
-def get_mongodb():
-    client = MongoClient(
-        host=MONGO_HOST, username=MONGO_USER, password=MONGO_PASSWORD, tls=MONGO_TLS
+
+def _client_kwargs():
+    return dict(
+        host=MONGO_HOST,
+        username=MONGO_USER,
+        password=MONGO_PASSWORD,
+        tls=MONGO_TLS,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        appname="helioweb",
+        event_listeners=[command_metrics] if METRICS_ENABLED else [],
     )
-    mdb = client.helioweb
-    return mdb
+
+
+def connect_mongodb():
+    """Create the process-wide pooled async client, if not already created.
+
+    Construction does no I/O: server discovery and the TLS handshake happen in the background,
+    and connections are then reused across requests.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(**_client_kwargs())
+    return _client
+
+
+async def close_mongodb():
+    global _client, _sync_client
+    if _client is not None:
+        await _client.close()
+        _client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+
+
+async def check_mongodb():
+    """Raise if the deployment cannot be reached within the server-selection timeout."""
+    await connect_mongodb().admin.command("ping")
+
+
+def get_mongodb():
+    return connect_mongodb().helioweb
+
+
+def get_sync_mongodb():
+    """Blocking counterpart of `get_mongodb`, for command-line tools and batch jobs."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = MongoClient(**_client_kwargs())
+    return _sync_client.helioweb
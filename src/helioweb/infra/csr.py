@@ -0,0 +1,38 @@
+"""
+Compressed sparse row (CSR) adjacency as NumPy (indptr, indices) pairs.
+
+Row `r`'s neighbors are `indices[indptr[r]:indptr[r + 1]]`.
+"""
+
+import numpy as np
+
+
+def csr_from_rows(rows, n_cols):
+    """CSR (indptr, indices) for a list of per-row column lists, plus its transpose."""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(r) for r in rows], out=indptr[1:])
+    indices = np.fromiter(
+        (c for r in rows for c in r), dtype=np.int32, count=indptr[-1]
+    )
+    row_of = np.repeat(np.arange(len(rows), dtype=np.int32), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    t_indptr = np.zeros(n_cols + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=n_cols), out=t_indptr[1:])
+    return (indptr, indices), (t_indptr, row_of[order])
+
+
+def csr_from_pairs(src, dst, n):
+    """CSR over `n` rows for the edges src[k] -> dst[k], each row's neighbors sorted."""
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32)
+
+
+def gather(csr, rows):
+    """Concatenated column indices of `rows`."""
+    indptr, indices = csr
+    starts, ends = indptr[rows], indptr[rows + 1]
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return indices[offsets + np.arange(lengths.sum())]
@@ -0,0 +1,98 @@
+"""
+Append-only log of edges asserted after a corpus load.
+
+Each entry's `_id` is a sequence number allocated from the `edge_log_ids` counter. The entries are
+written before the shared `edge_log` version counter is raised to their last sequence number, so a
+process-local index built at sequence N can catch up by replaying the entries after N.
+
+Concurrent writers may still publish out of order, leaving a gap that a slower writer fills a
+moment later, or never, if it fails. A `LogReader` advances across gap-free runs only, until the
+entry after a gap is GAP_SECONDS old, when the missing entries are taken to be lost.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+from helioweb.infra.versions import VERSIONS_ID, current_versions, raise_version
+
+EDGE_LOG = "edge_log"
+EDGE_LOG_IDS = "edge_log_ids"
+GAP_SECONDS = 60
+
+
+async def log_edges(mdb, edges):
+    """Append `edges`, dicts with at least "s", "p" and "o", to the log."""
+    if not edges:
+        return
+    # allocate past both counters, since logs written before `edge_log_ids` used `edge_log`
+    counters = [{"$ifNull": [f"${name}", 0]} for name in (EDGE_LOG_IDS, EDGE_LOG)]
+    allocated = await mdb.meta.find_one_and_update(
+        {"_id": VERSIONS_ID},
+        [{"$set": {EDGE_LOG_IDS: {"$add": [{"$max": counters}, len(edges)]}}}],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    last = allocated[EDGE_LOG_IDS]
+    at = datetime.now(timezone.utc)
+    await mdb.edge_log.insert_many(
+        [
+            {"_id": seq, **edge, "at": at}
+            for seq, edge in enumerate(edges, start=last - len(edges) + 1)
+        ]
+    )
+    # this worker's own cached versions see the entries at once, e.g. on the redirect after a POST
+    await raise_version(mdb, EDGE_LOG, last)
+
+
+async def edge_log_seq(mdb):
+    return (await current_versions(mdb)).get(EDGE_LOG, 0)
+
+
+async def edges_since(mdb, seq):
+    return await mdb.edge_log.find({"_id": {"$gt": seq}}, sort=[("_id", 1)]).to_list()
+
+
+def _utc(at):
+    return at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+
+
+class LogReader:
+    """How far a process-local index has replayed the log.
+
+    Every entry up to `seq` has been applied. Entries applied past a gap are remembered, with when
+    they were logged, so that they are applied only once.
+    """
+
+    def __init__(self, seq=0):
+        self.seq = seq
+        self._ahead: dict[int, datetime] = {}
+
+    async def behind(self, mdb):
+        """Whether entries may have been logged that are not applied yet."""
+        return bool(self._ahead) or await edge_log_seq(mdb) > self.seq
+
+    async def catch_up(self, mdb, apply):
+        """Call `apply(entry)` on each entry not yet applied, in order. Returns the results."""
+        if not await self.behind(mdb):
+            return []
+        entries = [
+            e for e in await edges_since(mdb, self.seq) if e["_id"] not in self._ahead
+        ]
+        results = [apply(e) for e in entries]
+        self.applied(entries)
+        return results
+
+    def applied(self, entries, now=None):
+        """Record `entries` as applied, and advance `seq` as far as the log allows."""
+        now = now or datetime.now(timezone.utc)
+        for e in entries:
+            self._ahead[e["_id"]] = _utc(e["at"])
+        while self._ahead:
+            next_seq = min(self._ahead)
+            if next_seq != self.seq + 1 and now - self._ahead[next_seq] < timedelta(
+                seconds=GAP_SECONDS
+            ):
+                break
+            self.seq = next_seq
+            del self._ahead[next_seq]
@@ -0,0 +1,72 @@
+"""
+The graph's edges as one document each, `{s, p, o, q, q2}`, in the `edges` collection.
+
+`alldocs` keeps each document's edges in its `outgoing` array, which serves forward lookups but
+makes every reverse lookup a multikey scan over documents of every type. `edges` is indexed in
+both directions, (s, p, o) and (o, p, s), so "who links to `o` with `p`" is a range scan.
+
+During the migration both are written: asserted edges are upserted here in the same batch as
+their `$push` to `outgoing` (see `helioweb.ui.assertions`), and `rebuild_edges` re-derives
+`edges` from `outgoing`, e.g. after a corpus load.
+"""
+
+from helioweb.infra.metrics import named
+from helioweb.infra.util import aggregate_list
+
+
+@named("edges.subjects")
+async def subjects(mdb, p, o):
+    """The edges (as {"s", "q", "q2"}) linking to `o` with predicate `p`."""
+    return await mdb.edges.find({"o": o, "p": p}, ["s", "q", "q2"]).to_list()
+
+
+@named("edges.subject_ids")
+async def subject_ids(mdb, o, predicates):
+    """IDs of the documents linking to `o` with any of `predicates`."""
+    found = await mdb.edges.find(
+        {"o": o, "p": {"$in": list(predicates)}}, ["s"]
+    ).to_list()
+    return [e["s"] for e in found]
+
+
+@named("edges.object_ids")
+async def object_ids(mdb, subjects_, p):
+    """IDs of the documents that any of `subjects_` link to with `p`."""
+    found = await mdb.edges.find(
+        {"s": {"$in": list(subjects_)}, "p": p}, ["o"]
+    ).to_list()
+    return list({e["o"] for e in found})
+
+
+async def rebuild_edges(mdb):
+    """Replace `edges` with the edges in `alldocs`' `outgoing` arrays.
+
+    `$out` keeps the collection's indexes and swaps the new contents in when done. Repeated
+    (s, p, o) edges are merged, keeping the qualifiers of the last.
+    """
+    await aggregate_list(
+        mdb.alldocs,
+        [
+            {"$match": {"outgoing.0": {"$exists": True}}},
+            {"$unwind": {"path": "$outgoing"}},
+            {
+                "$group": {
+                    "_id": {"s": "$_id", "p": "$outgoing.p", "o": "$outgoing.o"},
+                    "q": {"$last": "$outgoing.q"},
+                    "q2": {"$last": "$outgoing.q2"},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "s": "$_id.s",
+                    "p": "$_id.p",
+                    "o": "$_id.o",
+                    "q": 1,
+                    "q2": 1,
+                }
+            },
+            {"$out": "edges"},
+        ],
+        allowDiskUse=True,
+    )
@@ -0,0 +1,98 @@
+"""
+Facet lists offered as filter choices on the funnel and concept pages.
+
+The lists are materialized in their own collections (`all_author_concepts`, `all_work_institutions`)
+and cached per worker, so a page view costs no database work for them. A cached list is reloaded
+after FACET_TTL_SECONDS or when any worker calls `refresh_facets`.
+"""
+
+from helioweb.infra.config import FACET_TTL_SECONDS
+from helioweb.infra.util import aggregate_list
+from helioweb.infra.versions import Versioned, bump_versions
+
+
+async def _load_authors(mdb):
+    return await mdb.alldocs.find({"type": "Author"}, ["display_name"]).to_list()
+
+
+async def _load_author_concepts(mdb):
+    return await mdb.all_author_concepts.find().to_list()
+
+
+async def _load_work_institutions(mdb):
+    return await mdb.all_work_institutions.find().to_list()
+
+
+facets = {
+    name: Versioned(f"facet_{name}", load, ttl=FACET_TTL_SECONDS)
+    for name, load in (
+        ("authors", _load_authors),
+        ("author_concepts", _load_author_concepts),
+        ("work_institutions", _load_work_institutions),
+    )
+}
+
+
+async def get_facet(mdb, name):
+    """Return the cached list of {"_id", "display_name"} docs. Do not mutate it."""
+    return await facets[name].get(mdb)
+
+
+async def refresh_facets(mdb, *names):
+    """Have every worker reload the named facets (default: all) on next use."""
+    await bump_versions(mdb, *(facets[n].name for n in names or facets))
+
+
+def _materialize(s_type, p, o_type, into):
+    return [
+        {"$match": {"type": s_type, "outgoing.p": p}},
+        {"$unwind": {"path": "$outgoing"}},
+        {"$match": {"outgoing.p": p}},
+        {"$group": {"_id": "$outgoing.o"}},
+        {
+            "$lookup": {
+                "from": "alldocs",
+                "localField": "_id",
+                "foreignField": "_id",
+                "as": "o",
+            }
+        },
+        {"$match": {"o.type": o_type}},
+        {"$project": {"display_name": {"$first": "$o.display_name"}}},
+        {"$sort": {"display_name": 1}},
+        {"$out": into},
+    ]
+
+
+async def materialize_facets(mdb):
+    """Rebuild the materialized facet collections from `alldocs`, e.g. after a load."""
+    await aggregate_list(
+        mdb.alldocs,
+        _materialize("Author", "dcterms:relation", "Concept", "all_author_concepts"),
+        allowDiskUse=True,
+    )
+    await aggregate_list(
+        mdb.alldocs,
+        _materialize("Work", "affil", "Institution", "all_work_institutions"),
+        allowDiskUse=True,
+    )
+    await refresh_facets(mdb)
+
+
+async def add_author_concepts(mdb, concept_ids):
+    """Keep `all_author_concepts` current after author-concept edges are asserted."""
+    await aggregate_list(
+        mdb.alldocs,
+        [
+            {"$match": {"_id": {"$in": list(concept_ids)}, "type": "Concept"}},
+            {"$project": {"display_name": 1}},
+            {
+                "$merge": {
+                    "into": "all_author_concepts",
+                    "whenMatched": "keepExisting",
+                    "whenNotMatched": "insert",
+                }
+            },
+        ],
+    )
+    await refresh_facets(mdb, "author_concepts")
@@ -0,0 +1,358 @@
+"""
+Author funnel over interned integer IDs.
+
+Authors and works are interned to dense integers once per worker. Each concept maps to a sorted
+array of its authors, each institution to a sorted array of its works, and works and authors are
+linked by CSR adjacency in both directions. A funnel query is then a few vectorized boolean
+operations, with exact counts and a top page sorted by display name.
+"""
+
+import asyncio
+from bisect import bisect_right
+import time
+
+import numpy as np
+
+from helioweb.infra.csr import csr_from_rows, gather
+from helioweb.infra.edgelog import LogReader, edge_log_seq
+from helioweb.infra.versions import Versioned
+
+FUNNEL = "funnel"
+
+
+class FunnelEngine:
+    def __init__(self, authors, works, seq=0):
+        """Build from `authors`, (id, display_name, related_ids) tuples, and `works`,
+        (id, author_ids, institution_ids) tuples. `seq` is the edge-log sequence already applied.
+        """
+        self.log = LogReader(seq)
+        self.author_ids = [a[0] for a in authors]
+        self.author_names = [a[1] for a in authors]
+        self.author_index = {id_: i for i, id_ in enumerate(self.author_ids)}
+        # authors in page order, by (display_name, id), and each author's position in it
+        order = sorted(
+            range(len(authors)),
+            key=lambda i: (self.author_names[i] or "", self.author_ids[i]),
+        )
+        self.sort_keys = [
+            (self.author_names[i] or "", self.author_ids[i]) for i in order
+        ]
+        self.rank = np.empty(len(authors), dtype=np.int32)
+        self.rank[np.array(order, dtype=np.int32)] = np.arange(
+            len(authors), dtype=np.int32
+        )
+
+        concept_authors = {}
+        for i, (_, _, related) in enumerate(authors):
+            for o in related:
+                concept_authors.setdefault(o, []).append(i)
+        self.concept_authors = {
+            o: np.unique(np.array(a, dtype=np.int32))
+            for o, a in concept_authors.items()
+        }
+
+        self.work_ids = [w[0] for w in works]
+        self.work_index = {id_: i for i, id_ in enumerate(self.work_ids)}
+        self.work_authors, self.author_works = csr_from_rows(
+            [
+                [self.author_index[a] for a in w[1] if a in self.author_index]
+                for w in works
+            ],
+            len(authors),
+        )
+        institution_works = {}
+        for i, (_, _, institutions) in enumerate(works):
+            for o in institutions:
+                institution_works.setdefault(o, []).append(i)
+        self.institution_works = {
+            o: np.unique(np.array(w, dtype=np.int32))
+            for o, w in institution_works.items()
+        }
+        # author-of-work edges asserted since the build: work -> authors, author -> works
+        self.extra_work_authors = {}
+        self.extra_author_works = {}
+
+    @property
+    def n_authors(self):
+        return len(self.author_ids)
+
+    @property
+    def n_works(self):
+        return len(self.work_index)
+
+    def add_edge(self, s, p, o):
+        """Apply an asserted edge in place. Return False if a full rebuild is needed instead."""
+        if p == "dcterms:relation":
+            if s not in self.author_index:
+                return False
+            self.concept_authors[o] = np.union1d(
+                self.concept_authors.get(o, np.empty(0, dtype=np.int32)),
+                np.array([self.author_index[s]], dtype=np.int32),
+            )
+        elif p == "author":
+            if s not in self.work_index or o not in self.author_index:
+                return False
+            w, a = self.work_index[s], self.author_index[o]
+            # replaced, not changed in place, for a `coauthor_path` running in another thread
+            self.extra_work_authors = _with(self.extra_work_authors, w, a)
+            self.extra_author_works = _with(self.extra_author_works, a, w)
+        elif p == "affil":
+            if s not in self.work_index:
+                return False
+            self.institution_works[o] = np.union1d(
+                self.institution_works.get(o, np.empty(0, dtype=np.int32)),
+                np.array([self.work_index[s]], dtype=np.int32),
+            )
+        return True
+
+    def concept_author_ids(self, concept_id):
+        return {
+            self.author_ids[i]
+            for i in self.concept_authors.get(concept_id, np.empty(0, dtype=np.int32))
+        }
+
+    def _mask(self, n, arrays):
+        mask = np.zeros(n, dtype=bool)
+        for a in arrays:
+            mask[a] = True
+        return mask
+
+    def _works_of(self, author_id):
+        if author_id not in self.author_index:
+            return np.empty(0, dtype=np.int32)
+        a = self.author_index[author_id]
+        works = self.author_works[1][
+            self.author_works[0][a] : self.author_works[0][a + 1]
+        ]
+        extra = np.array(list(self.extra_author_works.get(a, ())), dtype=np.int32)
+        return np.union1d(works, extra)
+
+    def _select(self, concepts=None, institutions=None, coauthors=()):
+        if concepts is None:
+            authors = np.ones(self.n_authors, dtype=bool)
+        else:
+            authors = self._mask(
+                self.n_authors,
+                (
+                    self.concept_authors[c]
+                    for c in concepts
+                    if c in self.concept_authors
+                ),
+            )
+        if institutions is None and not coauthors:
+            authoring = np.diff(self.author_works[0]) > 0
+            authoring[list(self.extra_author_works)] = True
+            authors &= authoring
+        else:
+            if institutions is None:
+                works = np.ones(self.n_works, dtype=bool)
+            else:
+                works = self._mask(
+                    self.n_works,
+                    (
+                        self.institution_works[i]
+                        for i in institutions
+                        if i in self.institution_works
+                    ),
+                )
+            for c in coauthors:
+                works &= self._mask(self.n_works, [self._works_of(c)])
+            selected = np.flatnonzero(works)
+            authoring = self._mask(
+                self.n_authors,
+                [
+                    gather(self.work_authors, selected),
+                    *(
+                        np.array(list(a), dtype=np.int32)
+                        for w, a in self.extra_work_authors.items()
+                        if works[w]
+                    ),
+                ],
+            )
+            authors &= authoring
+        return authors
+
+    def _page(self, authors, after=None, limit=50):
+        """Count the `authors` mask and return its first `limit` authors by display name that
+        come after the `after` cursor, plus the cursor for the next page (or None)."""
+        matches = np.flatnonzero(authors)
+        count = len(matches)
+        if after is not None:
+            matches = matches[
+                self.rank[matches] >= bisect_right(self.sort_keys, tuple(after))
+            ]
+        top = matches[np.argsort(self.rank[matches], kind="stable")[: limit + 1]]
+        items = [
+            {"_id": self.author_ids[i], "display_name": self.author_names[i]}
+            for i in top[:limit]
+        ]
+        more = len(top) > limit
+        return (
+            count,
+            items,
+            list(self.sort_keys[self.rank[top[limit - 1]]]) if more else None,
+        )
+
+    def query(self, concepts=None, institutions=None, coauthors=(), limit=50):
+        """Authors related to any of `concepts` and authoring a work that is affiliated with any
+        of `institutions` and coauthored by all of `coauthors`.
+
+        `None` for `concepts` or `institutions` means "unconstrained". Returns the exact count and
+        the first `limit` matches by display name, as {"_id", "display_name"} dicts.
+        """
+        count, items, _ = self._page(
+            self._select(concepts, institutions, coauthors), limit=limit
+        )
+        return count, items
+
+    def institution_authors(self, institution_id, after=None, limit=50):
+        """Authors of works affiliated with the institution: (count, page, next cursor)."""
+        return self._page(
+            self._select(institutions=[institution_id]), after=after, limit=limit
+        )
+
+    def coauthors(self, author_id, after=None, limit=50):
+        """Authors sharing a work with the author: (count, page, next cursor)."""
+        authors = self._select(coauthors=[author_id])
+        if author_id in self.author_index:
+            authors[self.author_index[author_id]] = False
+        return self._page(authors, after=after, limit=limit)
+
+    @staticmethod
+    def _expand(csr, extra, rows):
+        """Neighbors of `rows` through `csr` and the `extra` {row: set} edges, as (neighbor,
+        origin row) arrays."""
+        indptr, _ = csr
+        neighbors = [gather(csr, rows)]
+        origins = [np.repeat(rows, indptr[rows + 1] - indptr[rows])]
+        if extra:
+            keys = np.fromiter(extra, dtype=np.int32, count=len(extra))
+            for r in keys[np.isin(keys, rows)]:
+                more = np.fromiter(extra[r], dtype=np.int32)
+                neighbors.append(more)
+                origins.append(np.full(len(more), r, dtype=np.int32))
+        return np.concatenate(neighbors), np.concatenate(origins)
+
+    def _coauthor_step(self, frontier):
+        """Authors sharing a work with any of `frontier`: (author, work, frontier author)."""
+        works, via = self._expand(self.author_works, self.extra_author_works, frontier)
+        works, first = np.unique(works, return_index=True)
+        via = via[first]
+        authors, work_of = self._expand(
+            self.work_authors, self.extra_work_authors, works
+        )
+        return authors, work_of, via[np.searchsorted(works, work_of)]
+
+    def coauthor_path(self, source_id, target_id, max_depth=6, timeout=0.5):
+        """A shortest chain of coauthorships from one author to another, by bidirectional BFS.
+
+        Returns (status, authors, works): status is "found", "unknown" (an ID is not an
+        author), "unconnected", "too_far" (no chain of at most `max_depth` works) or "timeout";
+        when found,
+        `authors` runs from source to target and works[i] links authors[i] and authors[i + 1].
+        """
+        if source_id not in self.author_index or target_id not in self.author_index:
+            return "unknown", [], []
+        deadline = time.monotonic() + timeout
+        ends = (self.author_index[source_id], self.author_index[target_id])
+        seen = [np.zeros(self.n_authors, dtype=bool) for _ in ends]
+        parent = [np.full(self.n_authors, -1, dtype=np.int32) for _ in ends]
+        via = [np.full(self.n_authors, -1, dtype=np.int32) for _ in ends]
+        frontier = [np.array([e], dtype=np.int32) for e in ends]
+        for side, end in enumerate(ends):
+            seen[side][end] = True
+        meet = ends[0] if ends[0] == ends[1] else None
+        depth = 0
+        while meet is None:
+            if not (len(frontier[0]) and len(frontier[1])):
+                return "unconnected", [], []
+            if depth >= max_depth:
+                return "too_far", [], []
+            if time.monotonic() > deadline:
+                return "timeout", [], []
+            # grow the smaller side
+            side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+            authors, works, origins = self._coauthor_step(frontier[side])
+            new = ~seen[side][authors]
+            authors, first = np.unique(authors[new], return_index=True)
+            parent[side][authors] = origins[new][first]
+            via[side][authors] = works[new][first]
+            seen[side][authors] = True
+            frontier[side] = authors
+            depth += 1
+            if len(met := authors[seen[1 - side][authors]]):
+                meet = met[0]
+
+        # walk back from the meeting author to each end
+        halves = []
+        for side in (0, 1):
+            authors, works, a = [], [], meet
+            while a != ends[side]:
+                works.append(via[side][a])
+                a = parent[side][a]
+                authors.append(a)
+            halves.append((authors, works))
+        (head, head_works), (tail, tail_works) = halves
+        chain = [*reversed(head), meet, *tail]
+        works = [*reversed(head_works), *tail_works]
+        return (
+            "found",
+            [
+                {"_id": self.author_ids[a], "display_name": self.author_names[a]}
+                for a in chain
+            ],
+            [self.work_ids[w] for w in works],
+        )
+
+
+def _with(extra, row, other):
+    """A copy of the {row: frozenset} edges `extra` with `other` added to `row`."""
+    return {**extra, row: extra.get(row, frozenset()) | {other}}
+
+
+async def build_funnel(mdb):
+    seq = await edge_log_seq(mdb)
+    authors, works = [], []
+    async for d in mdb.alldocs.find(
+        {"type": {"$in": ["Author", "Work"]}},
+        ["type", "display_name", "outgoing.p", "outgoing.o"],
+        batch_size=10_000,
+    ):
+        edges = d.get("outgoing", [])
+        if d["type"] == "Author":
+            authors.append((d["_id"], d.get("display_name"), [e["o"] for e in edges]))
+        else:
+            works.append(
+                (
+                    d["_id"],
+                    [e["o"] for e in edges if e["p"] == "author"],
+                    [e["o"] for e in edges if e["p"] == "affil"],
+                )
+            )
+    # the arrays take seconds to build on a large corpus
+    return await asyncio.to_thread(FunnelEngine, authors, works, seq=seq)
+
+
+_funnel = Versioned(FUNNEL, build_funnel)
+_catch_up = asyncio.Lock()
+
+
+async def get_funnel(mdb) -> FunnelEngine:
+    """The worker's engine, rebuilt after a load and caught up with the edge log."""
+    engine = await _funnel.get(mdb)
+    if not await engine.log.behind(mdb):
+        return engine
+    async with _catch_up:
+        results = await engine.log.catch_up(
+            mdb, lambda e: engine.add_edge(e["s"], e["p"], e["o"])
+        )
+    if not all(results):
+        # an edge names a document loaded after the build
+        await _funnel.invalidate(mdb)
+        engine = await _funnel.get(mdb)
+    return engine
+
+
+async def invalidate_funnel(mdb):
+    """Have every worker rebuild its engine, e.g. after a corpus load."""
+    await _funnel.invalidate(mdb)
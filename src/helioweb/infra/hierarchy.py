@@ -0,0 +1,188 @@
+"""
+In-process index of the skos:broader hierarchies of concepts and of institutions.
+
+Both hierarchies are small and rarely change, so each worker loads them once and answers
+tent (self and descendants) and closure (self and ancestors) queries from memory.
+"""
+
+from collections import defaultdict
+
+from toolz import concat, unique
+
+from helioweb.infra.util import aggregate_list
+from helioweb.infra.versions import Versioned, bump_versions
+
+BROADER = "skos:broader"
+
+
+class Hierarchy:
+    def __init__(self, parents: dict[str, set[str]]):
+        self.parents = {
+            n: frozenset(p for p in ps if p in parents and p != n)
+            for n, ps in parents.items()
+        }
+        children = defaultdict(set)
+        for n, ps in self.parents.items():
+            for p in ps:
+                children[p].add(n)
+        self.children = {n: frozenset(children[n]) for n in self.parents}
+        self.ancestors = {n: self._reachable(n, self.parents) for n in self.parents}
+        descendants = defaultdict(set)
+        for n, ancestors in self.ancestors.items():
+            for a in ancestors:
+                descendants[a].add(n)
+        self.descendants = {n: frozenset(descendants[n]) for n in self.parents}
+
+    @staticmethod
+    def _reachable(start, edges):
+        seen, frontier = set(), [start]
+        while frontier:
+            for m in edges[frontier.pop()]:
+                if m not in seen and m != start:
+                    seen.add(m)
+                    frontier.append(m)
+        return frozenset(seen)
+
+    def __contains__(self, id_):
+        return id_ in self.parents
+
+    def tent(self, ids):
+        """IDs in `ids` and all of their descendants."""
+        return list(unique(concat([i, *self.descendants[i]] for i in ids if i in self)))
+
+    def closure(self, id_):
+        """`id_` and all of its ancestors."""
+        return [id_, *self.ancestors[id_]] if id_ in self else []
+
+
+async def load_hierarchy(mdb, type_):
+    return Hierarchy(
+        {
+            d["_id"]: {e["o"] for e in d.get("outgoing", []) if e["p"] == BROADER}
+            for d in await mdb.alldocs.find({"type": type_}, ["outgoing"]).to_list()
+        }
+    )
+
+
+hierarchies = {
+    type_: Versioned(
+        f"{type_.lower()}_hierarchy", lambda mdb, t=type_: load_hierarchy(mdb, t)
+    )
+    for type_ in ("Concept", "Institution")
+}
+
+
+async def get_hierarchy(mdb, type_) -> Hierarchy:
+    return await hierarchies[type_].get(mdb)
+
+
+async def invalidate_hierarchies(mdb):
+    """Call after writing skos:broader edges, e.g. from a route or an ingest."""
+    await bump_versions(mdb, *(h.name for h in hierarchies.values()))
+
+
+async def aggregate_tent(mdb, id_, type_):
+    """Tent of `id_` via $graphLookup, as computed before the in-process index."""
+    return [
+        d["_id"]
+        for d in await aggregate_list(
+            mdb.alldocs,
+            [
+                {"$match": {"_id": id_}},
+                {
+                    "$graphLookup": {
+                        "from": "alldocs",
+                        "startWith": "$_id",
+                        "connectFromField": "_id",
+                        "connectToField": "outgoing.o",
+                        "restrictSearchWithMatch": {"type": type_},
+                        "as": "descendants",
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "tent": {"$concatArrays": ["$descendants", [{"_id": "$_id"}]]},
+                    }
+                },
+                {"$unwind": {"path": "$tent"}},
+                {"$project": {"_id": "$tent._id"}},
+                {"$group": {"_id": "$_id"}},
+            ],
+            allowDiskUse=True,
+        )
+    ]
+
+
+async def aggregate_closure(mdb, id_, type_):
+    """Closure of `id_` via aggregation, as computed before the in-process index."""
+    if type_ == "Concept":
+        # no need for $graphLookup
+        #   because skos:braoderTransitive relations are materialized in `outgoing.o`
+        ancestors = {
+            "$lookup": {
+                "from": "alldocs",
+                "localField": "outgoing.o",
+                "foreignField": "_id",
+                "as": "ancestors",
+            }
+        }
+    else:
+        # institution hierarchy is currently just one-deep, so $lookup would currently work as well.
+        ancestors = {
+            "$graphLookup": {
+                "from": "alldocs",
+                "startWith": "$outgoing.o",
+                "connectFromField": "outgoing.o",
+                "connectToField": "_id",
+                "as": "ancestors",
+            }
+        }
+    return [
+        d["_id"]
+        for d in await aggregate_list(
+            mdb.alldocs,
+            [
+                {"$match": {"_id": id_}},
+                ancestors,
+                {
+                    "$project": {
+                        "_id": 0,
+                        "closure": {"$concatArrays": ["$ancestors", [{"_id": "$_id"}]]},
+                    }
+                },
+                {"$unwind": {"path": "$closure"}},
+                {"$project": {"_id": "$closure._id"}},
+                {"$group": {"_id": "$_id"}},
+            ],
+        )
+    ]
+
+
+async def check_hierarchy(mdb, type_, ids=None):
+    """Compare the index against the aggregations for `ids` (default: every node).
+
+    Returns a list of discrepancies, each naming the ID, the query, and the IDs only the index
+    (`extra`) or only the aggregation (`missing`) returned.
+    """
+    hierarchy = await load_hierarchy(mdb, type_)
+    problems = []
+    for id_ in ids or list(hierarchy.parents):
+        for query, indexed, aggregated in (
+            ("tent", hierarchy.tent([id_]), await aggregate_tent(mdb, id_, type_)),
+            (
+                "closure",
+                hierarchy.closure(id_),
+                await aggregate_closure(mdb, id_, type_),
+            ),
+        ):
+            if set(indexed) != set(aggregated):
+                problems.append(
+                    {
+                        "id": id_,
+                        "query": query,
+                        "extra": sorted(set(indexed) - set(aggregated)),
+                        "missing": sorted(set(aggregated) - set(indexed)),
+                    }
+                )
+    return problems
@@ -0,0 +1,225 @@
+"""
+Registry of the indexes the app's queries rely on.
+
+`ensure_indexes` creates missing ones (it is safe to re-run), `index_drift` compares the registry
+with the database, and `collscans` explains each route's canonical queries against sample
+documents and reports any that would scan a whole collection.
+"""
+
+import logging
+import re
+
+from pymongo import ASCENDING, TEXT, IndexModel
+
+from helioweb.infra.autocomplete import AC_INDEX
+from helioweb.infra.config import SEARCH_CACHE_TTL_SECONDS
+
+log = logging.getLogger(__name__)
+
+# an institution's works, newest first, by a backward walk
+WORK_LIST_INDEX = [
+    ("type", ASCENDING),
+    ("outgoing.o", ASCENDING),
+    ("ads_work.year", ASCENDING),
+    ("display_name", ASCENDING),
+    ("_id", ASCENDING),
+]
+
+INDEXES = {
+    "alldocs": [
+        # /search
+        IndexModel([("display_name", TEXT)], name="display_name_text"),
+        # facet, funnel and hierarchy loads by type
+        IndexModel([("type", ASCENDING)], name="type"),
+        # incoming edges, until every reverse lookup reads `edges`
+        IndexModel(
+            [("outgoing.o", ASCENDING), ("outgoing.p", ASCENDING)], name="outgoing_o_p"
+        ),
+        # connectable-works/-concepts autocomplete
+        IndexModel(AC_INDEX, name="type_ac"),
+        # affiliated works, and works by type and linked node
+        IndexModel(WORK_LIST_INDEX, name="type_o_year_name"),
+    ],
+    "edges": [
+        # forward: a document's edges, by predicate
+        IndexModel(
+            [("s", ASCENDING), ("p", ASCENDING), ("o", ASCENDING)],
+            name="s_p_o",
+            unique=True,
+        ),
+        # reverse: the documents linking to one, by predicate
+        IndexModel(
+            [("o", ASCENDING), ("p", ASCENDING), ("s", ASCENDING)], name="o_p_s"
+        ),
+    ],
+    "edge_provenance": [
+        # who asserted an edge, and when
+        IndexModel(
+            [("s", ASCENDING), ("p", ASCENDING), ("o", ASCENDING), ("at", ASCENDING)],
+            name="s_p_o_at",
+        ),
+    ],
+    "similar_authors": [
+        # authors awaiting an incremental recompute
+        IndexModel([("stale", ASCENDING)], name="stale", sparse=True),
+    ],
+    "search_cache": [
+        IndexModel(
+            [("at", ASCENDING)],
+            name="at_ttl",
+            expireAfterSeconds=int(SEARCH_CACHE_TTL_SECONDS),
+        ),
+    ],
+}
+
+# options that change what an index does, compared when checking for drift
+_SIGNIFICANT = (
+    "unique",
+    "sparse",
+    "expireAfterSeconds",
+    "partialFilterExpression",
+    "collation",
+)
+
+
+def _normalize(info):
+    """(key, options) of an index, as either `listIndexes` or `IndexModel.document` gives it."""
+    key = [(f, k) for f, k in info["key"].items() if f not in ("_fts", "_ftsx")]
+    # the server lists a text index's fields under "weights"
+    text = sorted(info.get("weights") or [f for f, k in key if k == TEXT])
+    key = [(f, k) for f, k in key if k != TEXT] + [(f, TEXT) for f in text]
+    return key, {k: info[k] for k in _SIGNIFICANT if k in info}
+
+
+async def _actual(mdb, coll):
+    return {
+        info["name"]: info
+        for info in await (await mdb[coll].list_indexes()).to_list()
+        if info["name"] != "_id_"
+    }
+
+
+async def index_drift(mdb):
+    """Differences between the registry and the database, as dicts with "collection", "name" and
+    "problem": "missing", "different" (same name, other keys or options) or "undeclared"."""
+    drift = []
+    for coll, models in INDEXES.items():
+        actual = await _actual(mdb, coll)
+        declared = {m.document["name"]: m.document for m in models}
+        for name, doc in declared.items():
+            if name not in actual:
+                drift.append({"collection": coll, "name": name, "problem": "missing"})
+            elif _normalize(actual[name]) != _normalize(doc):
+                drift.append({"collection": coll, "name": name, "problem": "different"})
+        for name in sorted(actual.keys() - declared.keys()):
+            drift.append({"collection": coll, "name": name, "problem": "undeclared"})
+    return drift
+
+
+async def ensure_indexes(mdb, collections=None):
+    """Create the registered indexes that do not exist yet. Returns their names.
+
+    An index that exists under its name with other keys or options is left for an operator,
+    since replacing it means dropping it first; `index_drift` reports it.
+    """
+    created = []
+    for coll, models in INDEXES.items():
+        if collections is not None and coll not in collections:
+            continue
+        actual = await _actual(mdb, coll)
+        missing = [m for m in models if m.document["name"] not in actual]
+        if missing:
+            created += await mdb[coll].create_indexes(missing)
+    return created
+
+
+async def report_index_drift(mdb):
+    """Log index drift, e.g. at startup. Never raises."""
+    try:
+        for d in await index_drift(mdb):
+            log.warning(
+                "index drift: %s.%s is %s", d["collection"], d["name"], d["problem"]
+            )
+    except Exception:
+        log.exception("could not check indexes")
+
+
+async def _sample_ids(mdb):
+    ids = {}
+    for type_ in ("Author", "Concept", "Institution", "Work"):
+        doc = await mdb.alldocs.find_one({"type": type_}, ["_id"])
+        ids[type_] = doc["_id"] if doc else f"missing-{type_}"
+    return ids
+
+
+def canonical_queries(ids):
+    """(label, collection, filter, sort) for the queries the routes run most."""
+    a, c, i, w = ids["Author"], ids["Concept"], ids["Institution"], ids["Work"]
+
+    def incoming(p, o):
+        return {"o": o, "p": p}
+
+    return [
+        ("search", "alldocs", {"$text": {"$search": "solar wind"}}, None),
+        ("entity page: document", "alldocs", {"_id": a}, None),
+        (
+            "entity page: neighborhood",
+            "alldocs",
+            {"_id": {"$in": [a, c, w]}},
+            None,
+        ),
+        (
+            "entity page: incoming edges",
+            "edges",
+            {"o": a, "p": {"$in": ["author", "skos:broader"]}},
+            None,
+        ),
+        ("author page: works", "edges", incoming("author", a), None),
+        (
+            "author page: institutions",
+            "edges",
+            {"s": {"$in": [w]}, "p": "affil"},
+            None,
+        ),
+        (
+            "affil page: works",
+            "alldocs",
+            {"type": "Work", "outgoing.o": i},
+            [("ads_work.year", -1), ("display_name", -1), ("_id", -1)],
+        ),
+        ("concept page: children", "edges", incoming("skos:broader", c), None),
+        ("concept page: authors", "edges", incoming("dcterms:relation", c), None),
+        ("affil page: children", "edges", incoming("skos:broader", i), None),
+        (
+            "connectable-works",
+            "alldocs",
+            {"type": "Work", "$and": [{"_ac": re.compile("^sol")}]},
+            None,
+        ),
+        ("facets/funnel: by type", "alldocs", {"type": "Author"}, None),
+        ("edge log replay", "edge_log", {"_id": {"$gt": 0}}, [("_id", 1)]),
+    ]
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for v in plan.values():
+            yield from _stages(v)
+    elif isinstance(plan, list):
+        for v in plan:
+            yield from _stages(v)
+
+
+async def collscans(mdb):
+    """Labels of the canonical queries whose winning plan scans a whole collection."""
+    found = []
+    for label, coll, filter_, sort in canonical_queries(await _sample_ids(mdb)):
+        command = {"find": coll, "filter": filter_}
+        if sort:
+            command["sort"] = dict(sort)
+        explained = await mdb.command({"explain": command, "verbosity": "queryPlanner"})
+        if "COLLSCAN" in _stages(explained["queryPlanner"]["winningPlan"]):
+            found.append(label)
+    return found
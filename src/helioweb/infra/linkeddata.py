@@ -0,0 +1,133 @@
+"""
+RDF for the graph's documents: an entity's description, and a dump of the whole graph.
+
+IDs that are IRIs (ORCID, OpenAlex, ...) are used as they are; others are minted under the site's
+entity pages, e.g. `<base>work:<id>`, so they dereference. Since a document's edges only name
+their targets, a target's type, and so its page, is inferred from the predicate.
+
+Triples are written as N-Triples lines directly, so the dump streams from a cursor in constant
+memory. Turtle and JSON-LD, which one entity's triples are small enough for, go through rdflib.
+"""
+
+import re
+from urllib.parse import quote
+
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import DCTERMS, FOAF, RDF, RDFS, SKOS
+
+MEDIA_TYPES = {
+    "text/turtle": "turtle",
+    "application/n-triples": "nt",
+    "application/ld+json": "json-ld",
+}
+PAGE_PREFIXES = {
+    "Author": "author:",
+    "Work": "work:",
+    "Institution": "affil:",
+    "Concept": "concept:",
+}
+CLASSES = {
+    "Author": FOAF.Person,
+    "Work": DCTERMS.BibliographicResource,
+    "Institution": FOAF.Organization,
+    "Concept": SKOS.Concept,
+}
+# predicate -> (type of subjects, type of objects); None is "same as the other end"
+TYPES = {
+    "author": ("Work", "Author"),
+    "affil": ("Work", "Institution"),
+    "dcterms:relation": ("Author", "Concept"),
+    "skos:broader": (None, None),
+}
+_PREFIXES = {"skos": str(SKOS), "dcterms": str(DCTERMS)}
+_IRI = re.compile(r"^[a-z][a-z0-9+.-]*://\S+$", re.IGNORECASE)
+# characters that may stand in an IRI unescaped
+_IRI_SAFE = ":/?#[]@!$&'()*+,;=-._~%"
+_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r"})
+
+
+def negotiate(accept):
+    """The RDF media type `accept` prefers over HTML, if any."""
+    offered = []
+    for i, item in enumerate(accept.split(",")):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        offered.append((-q, i, media_type.lower()))
+    for neg_q, _, media_type in sorted(offered):
+        if neg_q == 0:
+            break
+        if media_type in MEDIA_TYPES:
+            return media_type
+        if media_type in ("text/html", "application/xhtml+xml", "text/*", "*/*"):
+            return None
+    return None
+
+
+class Minter:
+    """IRIs of the graph's nodes and predicates, for a site at `base`."""
+
+    def __init__(self, base):
+        self.base = base
+        self.vocab = f"{base}vocab#"
+
+    def node(self, id_, type_):
+        if not _IRI.match(id_) and type_ in PAGE_PREFIXES:
+            id_ = f"{self.base}{PAGE_PREFIXES[type_]}{id_}"
+        return quote(id_, safe=_IRI_SAFE)
+
+    def predicate(self, p):
+        if p == "author":
+            return str(DCTERMS.creator)
+        prefix, _, local = p.rpartition(":")
+        if prefix in _PREFIXES:
+            return _PREFIXES[prefix] + local
+        return self.vocab + p
+
+    def outgoing(self, doc):
+        """Triples (s, p, o, is_literal) of the document's type, label and outgoing edges."""
+        type_ = doc.get("type")
+        s = self.node(doc["_id"], type_)
+        if type_ in CLASSES:
+            yield s, str(RDF.type), str(CLASSES[type_]), False
+        if name := doc.get("display_name"):
+            yield s, str(RDFS.label), name, True
+        if year := doc.get("ads_work", {}).get("year"):
+            yield s, str(DCTERMS.issued), str(year), True
+        for e in doc.get("outgoing", []):
+            target_type = TYPES.get(e["p"], (None, None))[1] or type_
+            yield s, self.predicate(e["p"]), self.node(e["o"], target_type), False
+
+    def incoming(self, doc, edges):
+        """Triples of `edges` ({"s", "p"}) into the document."""
+        o = self.node(doc["_id"], doc.get("type"))
+        for e in edges:
+            source_type = TYPES.get(e["p"], (None, None))[0] or doc.get("type")
+            yield self.node(e["s"], source_type), self.predicate(e["p"]), o, False
+
+
+def ntriples(triples):
+    """N-Triples lines for (s, p, o, is_literal) triples."""
+    for s, p, o, literal in triples:
+        o = f'"{o.translate(_ESCAPES)}"' if literal else f"<{o}>"
+        yield f"<{s}> <{p}> {o} .\n"
+
+
+def serialize(triples, format, vocab=None):
+    """One entity's triples in an rdflib `format`, with `vocab` bound to "helioweb"."""
+    if format == "nt":
+        return "".join(ntriples(triples))
+    graph = Graph(bind_namespaces="core")
+    graph.bind("skos", SKOS)
+    graph.bind("dcterms", DCTERMS)
+    graph.bind("foaf", FOAF)
+    if vocab:
+        graph.bind("helioweb", vocab)
+    for s, p, o, literal in triples:
+        graph.add((URIRef(s), URIRef(p), Literal(o) if literal else URIRef(o)))
+    return graph.serialize(format=format)
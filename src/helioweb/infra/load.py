@@ -0,0 +1,230 @@
+"""
+Bulk loader for the `alldocs` NDJSON dump (see README, "Data Dump").
+
+The dump is decompressed and parsed as a stream, validated, and written in batches by a pool of
+threads, with at most two batches per thread in flight. By default documents go to a staging
+collection that has no secondary indexes; when the load completes, the indexes of the live
+collection (and any others requested) are built on it, and it is renamed over `alldocs` in
+one step, so the site keeps serving the old corpus until then.
+
+Progress is checkpointed in `meta` as the number of input lines whose batches are all written,
+so an interrupted load resumes after the last checkpoint. Re-sent documents that were already
+written are skipped as duplicate keys.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import os
+import sys
+import threading
+import time
+
+from bson import json_util
+from pymongo import TEXT, IndexModel
+from pymongo.errors import BulkWriteError
+
+from helioweb.infra.autocomplete import AC_FIELD, AC_TYPES, ac_keys
+
+DOC_TYPES = {"Author", "Concept", "Institution", "Work"}
+DUPLICATE_KEY = 11000
+
+
+class InvalidDocument(ValueError):
+    pass
+
+
+def validate(doc):
+    """Raise InvalidDocument unless `doc` has the shape the app reads."""
+    if not isinstance(doc, dict):
+        raise InvalidDocument("not an object")
+    if not isinstance(doc.get("_id"), str):
+        raise InvalidDocument("missing or non-string _id")
+    if doc.get("type") not in DOC_TYPES:
+        raise InvalidDocument(f"unknown type {doc.get('type')!r}")
+    outgoing = doc.get("outgoing", [])
+    if not isinstance(outgoing, list) or not all(
+        isinstance(e, dict) and "p" in e and "o" in e for e in outgoing
+    ):
+        raise InvalidDocument("outgoing must be a list of edges with p and o")
+
+
+def prepare(doc):
+    if doc["type"] in AC_TYPES:
+        doc[AC_FIELD] = ac_keys(doc)
+    return doc
+
+
+def read_batches(path, batch_size, skip=0, errors=sys.stderr):
+    """Yield (end_line, docs) batches of valid documents from line `skip` on."""
+    opener = gzip.open if path.endswith(".gz") else open
+    batch = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        line_no = 0
+        for line_no, line in enumerate(f, start=1):
+            if line_no <= skip or not line.strip():
+                continue
+            try:
+                doc = json_util.loads(line)
+                validate(doc)
+            except ValueError as e:
+                print(f"line {line_no}: skipped: {e}", file=errors)
+                continue
+            batch.append(prepare(doc))
+            if len(batch) >= batch_size:
+                yield line_no, batch
+                batch = []
+        yield line_no, batch
+
+
+def insert_batch(collection, docs):
+    """Insert `docs`, tolerating documents already present from an interrupted run."""
+    if not docs:
+        return 0
+    try:
+        return len(collection.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        if any(err["code"] != DUPLICATE_KEY for err in e.details["writeErrors"]):
+            raise
+        return e.details["nInserted"]
+
+
+class Checkpoint:
+    """Contiguous progress through the input, persisted in `meta`."""
+
+    def __init__(self, db, target, path):
+        self.db = db
+        self._id = f"load:{target}"
+        self.source = {"path": os.path.abspath(path), "size": os.path.getsize(path)}
+        self._lock = threading.Lock()
+        self._done = {}  # batch number -> end line
+        self._next = 0
+        doc = db.meta.find_one({"_id": self._id}) or {}
+        self.line = doc.get("line", 0) if doc.get("source") == self.source else 0
+
+    def done(self, batch_no, end_line):
+        with self._lock:
+            self._done[batch_no] = end_line
+            advanced = False
+            while self._next in self._done:
+                self.line = self._done.pop(self._next)
+                self._next += 1
+                advanced = True
+            if advanced:
+                self.db.meta.replace_one(
+                    {"_id": self._id},
+                    {"source": self.source, "line": self.line},
+                    upsert=True,
+                )
+
+    def clear(self):
+        self.db.meta.delete_one({"_id": self._id})
+
+
+def index_models(db, live, required=()):
+    """Indexes to build after the load: those on `live`, plus the IndexModels `required`."""
+    models = {}
+    if live in db.list_collection_names():
+        for info in db[live].list_indexes():
+            info = dict(info)
+            name = info.pop("name")
+            key = list(info.pop("key").items())
+            if name == "_id_":
+                continue
+            if ("_fts", "text") in key:
+                # a text index lists its fields under "weights", not "key"
+                i = key.index(("_fts", "text"))
+                key[i : i + 2] = [(field, TEXT) for field in info["weights"]]
+            for internal in ("v", "ns"):
+                info.pop(internal, None)
+            models[tuple(key)] = IndexModel(key, name=name, **info)
+    for model in required:
+        models.setdefault(tuple(model.document["key"].items()), model)
+    return list(models.values())
+
+
+def load(
+    db,
+    path,
+    target="alldocs",
+    batch_size=1000,
+    workers=4,
+    swap=True,
+    restart=False,
+    indexes=(),
+    report_every=5.0,
+    out=sys.stderr,
+):
+    """Load the NDJSON (optionally gzipped) dump at `path` into `target`. Returns docs written.
+
+    With `swap`, load into `<target>_loading` and rename it over `target` when done. `indexes`
+    are IndexModels to build along with the live collection's indexes.
+    """
+    staging = f"{target}_loading" if swap else target
+    checkpoint = Checkpoint(db, staging, path)
+    if restart or (swap and checkpoint.line == 0):
+        if swap:
+            db.drop_collection(staging)
+        checkpoint.clear()
+        checkpoint.line = 0
+    if checkpoint.line:
+        print(f"resuming after line {checkpoint.line}", file=out)
+
+    collection = db[staging]
+    written = 0
+    written_lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(2 * workers)
+    started = last_report = time.monotonic()
+
+    def write(batch_no, end_line, docs):
+        nonlocal written
+        try:
+            n = insert_batch(collection, docs)
+            with written_lock:
+                written += n
+            checkpoint.done(batch_no, end_line)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for batch_no, (end_line, docs) in enumerate(
+            read_batches(path, batch_size, skip=checkpoint.line)
+        ):
+            in_flight.acquire()
+            futures.append(pool.submit(write, batch_no, end_line, docs))
+            for f in futures:
+                if f.done():
+                    f.result()  # stop on the first failed batch
+            futures = [f for f in futures if not f.done()]
+            now = time.monotonic()
+            if now - last_report >= report_every:
+                last_report = now
+                rate = written / (now - started)
+                print(f"{written} docs written ({rate:,.0f} docs/s)", file=out)
+        for f in futures:
+            f.result()
+
+    elapsed = time.monotonic() - started
+    print(
+        f"{written} docs written in {elapsed:.1f}s "
+        f"({written / max(elapsed, 1e-9):,.0f} docs/s)",
+        file=out,
+    )
+
+    if models := index_models(db, target, indexes):
+        print(f"building {len(models)} indexes", file=out)
+        started = time.monotonic()
+        # one createIndexes command builds them all in a single collection scan
+        collection.create_indexes(models)
+        print(f"indexes built in {time.monotonic() - started:.1f}s", file=out)
+
+    if swap:
+        db.client.admin.command(
+            "renameCollection",
+            f"{db.name}.{staging}",
+            to=f"{db.name}.{target}",
+            dropTarget=True,
+        )
+        print(f"swapped {staging} in as {target}", file=out)
+    checkpoint.clear()
+    return written
@@ -0,0 +1,211 @@
+"""
+Prometheus metrics: HTTP request latency, and the database work each route and named query does.
+
+A pymongo command listener attributes every command to the route of the request that ran it,
+through a context variable set by `MetricsMiddleware`, and to the innermost `named_query`, or
+else to its command and collection, e.g. "find edges". Per command, its duration as the driver
+measures it and the number of documents its reply carries are observed; per request, its number of
+commands, their total duration and the total documents returned. Replies are not re-encoded to
+weigh them, which would double the BSON work of large getMore batches.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory before the workers start: each
+worker then writes its samples there, and `/metrics` sums them across workers. Only counters and
+histograms are used, which stay correct when a worker exits.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+
+_LATENCY = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_DOCUMENTS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10_000, 50_000)
+_COUNTS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+HTTP_SECONDS = Histogram(
+    "helioweb_http_request_duration_seconds",
+    "HTTP request latency, until the last byte of the response is sent.",
+    ["method", "route", "status"],
+    buckets=_LATENCY,
+)
+DB_COMMAND_SECONDS = Histogram(
+    "helioweb_db_command_duration_seconds",
+    "Database command round-trip time, by route and named query.",
+    ["route", "query"],
+    buckets=_LATENCY,
+)
+DB_COMMAND_DOCUMENTS = Histogram(
+    "helioweb_db_command_documents",
+    "Documents returned by database commands, by route and named query.",
+    ["route", "query"],
+    buckets=_DOCUMENTS,
+)
+DB_COMMAND_FAILURES = Counter(
+    "helioweb_db_command_failures_total",
+    "Database commands that failed, by route and named query.",
+    ["route", "query"],
+)
+DB_REQUEST_COMMANDS = Histogram(
+    "helioweb_db_request_commands",
+    "Database commands per HTTP request, by route.",
+    ["route"],
+    buckets=_COUNTS,
+)
+DB_REQUEST_SECONDS = Histogram(
+    "helioweb_db_request_duration_seconds",
+    "Total database command time per HTTP request, by route.",
+    ["route"],
+    buckets=_LATENCY,
+)
+DB_REQUEST_DOCUMENTS = Histogram(
+    "helioweb_db_request_documents",
+    "Total documents returned by the database per HTTP request, by route.",
+    ["route"],
+    buckets=_DOCUMENTS,
+)
+
+# outside a request, e.g. at startup or in a command-line job
+NO_ROUTE = "-"
+
+_request: ContextVar[dict | None] = ContextVar("request_db_stats", default=None)
+_query: ContextVar[str | None] = ContextVar("query_name", default=None)
+
+
+@contextmanager
+def named_query(name):
+    """Attribute the database commands run inside the block to `name`."""
+    token = _query.set(name)
+    try:
+        yield
+    finally:
+        _query.reset(token)
+
+
+def named(name):
+    """Attribute the database commands the decorated coroutine function runs to `name`."""
+
+    def decorate(f):
+        @wraps(f)
+        async def wrapper(*args, **kwargs):
+            with named_query(name):
+                return await f(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _query_name(event):
+    if name := _query.get():
+        return name
+    target = event.command.get(event.command_name) if event.command else None
+    if not isinstance(target, str):
+        target = (event.command or {}).get("collection", "")
+    return f"{event.command_name} {target}".strip()
+
+
+def _documents(reply):
+    """Documents in the batch of a cursor-returning command's reply, e.g. find or getMore."""
+    cursor = reply.get("cursor") or {}
+    return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Observes each command under the current route and query name."""
+
+    def __init__(self):
+        # names of the commands in flight, since only the started event has the command
+        self._started = {}
+
+    def started(self, event):
+        self._started[event.connection_id, event.request_id] = _query_name(event)
+
+    def _finish(self, event):
+        query = self._started.pop(
+            (event.connection_id, event.request_id), event.command_name
+        )
+        stats = _request.get()
+        route = _route(stats["scope"]) if stats else NO_ROUTE
+        seconds = event.duration_micros / 1e6
+        DB_COMMAND_SECONDS.labels(route, query).observe(seconds)
+        if stats:
+            stats["commands"] += 1
+            stats["seconds"] += seconds
+        return route, query, stats
+
+    def succeeded(self, event):
+        route, query, stats = self._finish(event)
+        documents = _documents(event.reply)
+        DB_COMMAND_DOCUMENTS.labels(route, query).observe(documents)
+        if stats:
+            stats["documents"] += documents
+
+    def failed(self, event):
+        route, query, _ = self._finish(event)
+        DB_COMMAND_FAILURES.labels(route, query).inc()
+
+
+command_metrics = CommandMetrics()
+
+
+def _route(scope):
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    return getattr(endpoint, "__name__", type(endpoint).__name__)
+
+
+class MetricsMiddleware:
+    """Times each HTTP request, and observes the database work done for it, by route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        # the router adds the matched endpoint to `scope` before calling it
+        stats = {"scope": scope, "commands": 0, "seconds": 0.0, "documents": 0}
+        token = _request.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_and_observe(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_observe)
+        finally:
+            _request.reset(token)
+            route = _route(scope)
+            HTTP_SECONDS.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - started
+            )
+            DB_REQUEST_COMMANDS.labels(route).observe(stats["commands"])
+            DB_REQUEST_SECONDS.labels(route).observe(stats["seconds"])
+            DB_REQUEST_DOCUMENTS.labels(route).observe(stats["documents"])
+
+
+def metrics_exposition():
+    """(body, content type) of the metrics in Prometheus text format, summed across workers."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,269 @@
+"""
+Ingest of SKOS/OWL topic vocabularies, such as the bundled CfHA.ttl, as `Concept` documents.
+
+rdflib parses the source (Turtle, N-Triples, RDF/XML, ...; optionally gzipped) into a sink that
+keeps only the facts concepts are made of: labels, definitions, types, `rdfs:subClassOf` and
+`skos:broader`/`skos:narrower`. No graph of the whole source is built, and N-Triples are read a
+line at a time.
+
+A concept is a `skos:Concept`, a class under the topic root (`CfHA:Topic`), or an individual of
+one of those classes. Its broader concepts are its SKOS broader concepts, its superclasses, and the
+topic classes it is an instance of. As for the corpus's concepts, its `skos:broader` edges are
+materialized transitively, leading to every ancestor, so closures need no graph traversal. Each
+document also holds its distance from a root in `concept.level`.
+
+Documents are tagged with their source and a hash of their content. Re-ingesting a revised
+source writes only the documents that changed, together with their `edges`, and deletes the
+documents the source no longer has, except those that other documents' edges still lead to, e.g.
+authors' `dcterms:relation`s: these are kept, and reported, until those edges are gone.
+"""
+
+from collections import defaultdict
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+
+from pymongo import DeleteMany, InsertOne, ReplaceOne
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import RDF, RDFS, SKOS
+from rdflib.util import guess_format
+
+from helioweb.infra.hierarchy import BROADER, Hierarchy
+from helioweb.infra.load import prepare, validate
+
+TOPIC_ROOT = "http://www.semanticweb.org/ontologies/2022/1/CfHA#Topic"
+# label predicates, most preferred first
+LABELS = (SKOS.prefLabel, RDFS.label)
+DEFINITIONS = (SKOS.definition, RDFS.comment)
+
+
+class _Sink(Graph):
+    """A graph that hands each parsed triple to `handle` instead of storing it."""
+
+    def __init__(self, handle):
+        super().__init__()
+        self._handle = handle
+
+    def add(self, triple):
+        self._handle(*triple)
+        return self
+
+
+def parse(path, handle, format=None):
+    """Call `handle(s, p, o)` for each triple of the RDF file at `path`."""
+    opener = gzip.open if path.endswith(".gz") else open
+    format = format or guess_format(path.removesuffix(".gz")) or "turtle"
+    with opener(path, "rb") as f:
+        _Sink(handle).parse(
+            f, format=format, publicID=f"file://{os.path.abspath(path)}"
+        )
+
+
+class Vocabulary:
+    """The facts of a source that concepts are made of, collected triple by triple."""
+
+    def __init__(self, topic_root=TOPIC_ROOT):
+        self.topic_root = topic_root
+        self.triples = 0
+        self.labels = {}  # s -> (rank, label)
+        self.definitions = {}
+        self.types = defaultdict(set)
+        self.superclasses = defaultdict(set)
+        self.broader = defaultdict(set)
+
+    def add(self, s, p, o):
+        self.triples += 1
+        if not isinstance(s, URIRef):
+            return
+        s = str(s)
+        if isinstance(o, Literal):
+            if o.language not in (None, "en"):
+                return
+            if p in LABELS:
+                rank = LABELS.index(p)
+                if s not in self.labels or rank < self.labels[s][0]:
+                    self.labels[s] = (rank, str(o))
+            elif p in DEFINITIONS:
+                self.definitions.setdefault(s, str(o))
+        elif isinstance(o, URIRef):
+            o = str(o)
+            if p == RDF.type:
+                self.types[s].add(o)
+            elif p == RDFS.subClassOf:
+                self.superclasses[s].add(o)
+            elif p == SKOS.broader:
+                self.broader[s].add(o)
+            elif p == SKOS.narrower:
+                self.broader[o].add(s)
+
+    def topic_classes(self):
+        """The classes under the topic root, not including it."""
+        subclasses = defaultdict(set)
+        for c, supers in self.superclasses.items():
+            for s in supers:
+                subclasses[s].add(c)
+        found, frontier = set(), [self.topic_root]
+        while frontier:
+            for c in subclasses[frontier.pop()]:
+                if c not in found:
+                    found.add(c)
+                    frontier.append(c)
+        return found - {self.topic_root}
+
+    def parents(self):
+        """{concept: its broader concepts}."""
+        classes = self.topic_classes()
+        kinds = classes | {self.topic_root, str(SKOS.Concept)}
+        concepts = (
+            classes
+            | {s for s, types in self.types.items() if types & kinds}
+            | set(self.broader)
+            | {o for os_ in self.broader.values() for o in os_}
+        )
+        return {
+            c: (self.broader[c] | self.superclasses[c] | self.types[c]) & concepts - {c}
+            for c in concepts
+        }
+
+    def documents(self, source):
+        """The `Concept` documents, each with its `_source` and content `_hash`."""
+        parents = self.parents()
+        hierarchy = Hierarchy(parents)
+        levels, level = {}, 0
+        frontier = {c for c, ps in hierarchy.parents.items() if not ps}
+        while frontier:
+            levels.update((c, level) for c in frontier)
+            frontier = {
+                child
+                for c in frontier
+                for child in hierarchy.children[c]
+                if child not in levels
+            }
+            level += 1
+        for c in sorted(parents):
+            doc = {
+                "_id": c,
+                "type": "Concept",
+                "display_name": self.labels.get(c, (None, _local_name(c)))[1],
+                "concept": {"level": levels.get(c)},
+                "outgoing": [
+                    {"p": BROADER, "o": a} for a in sorted(hierarchy.ancestors[c])
+                ],
+                "_source": source,
+            }
+            if c in self.definitions:
+                doc["description"] = self.definitions[c]
+            doc["_hash"] = content_hash(doc)
+            yield doc
+
+
+def _local_name(uri):
+    return uri.rstrip("/#").rsplit("#", 1)[-1].rsplit("/", 1)[-1].replace("+", " ")
+
+
+def content_hash(doc):
+    content = {k: v for k, v in doc.items() if k not in ("_hash", "_ac")}
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_batch(db, docs):
+    """Replace `docs` in `alldocs` and their `skos:broader` edges in `edges`."""
+    ids = [d["_id"] for d in docs]
+    db.alldocs.bulk_write(
+        [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs], ordered=False
+    )
+    db.edges.bulk_write(
+        [
+            DeleteMany({"s": {"$in": ids}, "p": BROADER}),
+            *(
+                InsertOne({"s": d["_id"], **e, "q": None, "q2": None})
+                for d in docs
+                for e in d["outgoing"]
+            ),
+        ],
+        ordered=True,
+    )
+
+
+def ingest(
+    db,
+    path,
+    source=None,
+    format=None,
+    topic_root=TOPIC_ROOT,
+    batch_size=1000,
+    out=sys.stderr,
+):
+    """Ingest the vocabulary at `path` into `alldocs`. Returns counts of what changed.
+
+    `source` (default: the file name) tags the documents, so a later ingest of the same source
+    can tell which of them it changed or dropped.
+    """
+    source = source or os.path.basename(path)
+    vocabulary = Vocabulary(topic_root)
+    started = time.monotonic()
+    parse(path, vocabulary.add, format=format)
+    elapsed = time.monotonic() - started
+    print(
+        f"{vocabulary.triples} triples parsed in {elapsed:.1f}s "
+        f"({vocabulary.triples / max(elapsed, 1e-9):,.0f} triples/s)",
+        file=out,
+    )
+
+    stored = {
+        d["_id"]: d.get("_hash")
+        for d in db.alldocs.find({"_source": source}, ["_hash"])
+    }
+    counts = {"concepts": 0, "written": 0, "unchanged": 0, "deleted": 0, "retained": 0}
+    seen = set()
+
+    def changed():
+        for doc in vocabulary.documents(source):
+            validate(doc)
+            counts["concepts"] += 1
+            seen.add(doc["_id"])
+            if stored.get(doc["_id"]) == doc["_hash"]:
+                counts["unchanged"] += 1
+            else:
+                yield prepare(doc)
+
+    started = time.monotonic()
+    for docs in _batches(changed(), batch_size):
+        write_batch(db, docs)
+        counts["written"] += len(docs)
+    if removed := list(stored.keys() - seen):
+        referenced = set(
+            db.edges.distinct("o", {"o": {"$in": removed}, "s": {"$nin": removed}})
+        )
+        for id_ in sorted(referenced):
+            print(f"kept {id_}: dropped from {source} but still referenced", file=out)
+        removed = [id_ for id_ in removed if id_ not in referenced]
+        db.alldocs.delete_many({"_id": {"$in": removed}, "_source": source})
+        db.edges.delete_many({"s": {"$in": removed}})
+        counts["deleted"] = len(removed)
+        counts["retained"] = len(referenced)
+    elapsed = time.monotonic() - started
+    print(
+        f"{counts['concepts']} concepts: {counts['written']} written, "
+        f"{counts['unchanged']} unchanged, {counts['deleted']} deleted, "
+        f"{counts['retained']} retained in {elapsed:.1f}s "
+        f"({counts['written'] / max(elapsed, 1e-9):,.0f} docs/s)",
+        file=out,
+    )
+    return counts
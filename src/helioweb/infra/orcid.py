@@ -0,0 +1,159 @@
+"""
+ORCID sign-in: the exchange of an authorization code for the user's tokens.
+
+Requests go through one pooled async client per process, opened and closed by the app's lifespan,
+so a slow ORCID response holds up only the login that is waiting for it. Each attempt is bounded
+by ORCID_TIMEOUT_SECONDS. Failures to connect, 429s and 502-504s are retried up to ORCID_RETRIES
+times with exponential backoff; other failures are not, since ORCID may have consumed the
+single-use code. After ORCID_BREAKER_FAILURES exchanges fail in a row, a circuit
+breaker refuses exchanges for ORCID_BREAKER_RESET_SECONDS, and then lets one trial through.
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from helioweb.infra.config import (
+    ORCID_BREAKER_FAILURES,
+    ORCID_BREAKER_RESET_SECONDS,
+    ORCID_CLIENT_ID,
+    ORCID_CLIENT_SECRET,
+    ORCID_REDIRECT_URI,
+    ORCID_RETRIES,
+    ORCID_TIMEOUT_SECONDS,
+    ORCID_TOKEN_URL,
+)
+
+BACKOFF_SECONDS = 0.2
+# errors and statuses that mean the request was not processed
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_RETRY_STATUSES = {429, 502, 503, 504}
+
+_client: httpx.AsyncClient | None = None
+
+
+class OrcidUnavailable(Exception):
+    """ORCID did not answer, or the breaker is open."""
+
+
+class OrcidRejected(Exception):
+    """ORCID refused the exchange, e.g. for an expired or reused code."""
+
+
+class CircuitBreaker:
+    def __init__(self, failures, reset_seconds):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._failed = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half-open"
+
+    def allow(self):
+        """Whether a call may go ahead. While half-open, only one trial call at a time does."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def succeeded(self):
+        self._failed, self._opened_at, self._trial = 0, None, False
+
+    def abandoned(self):
+        """A call that was let through ended without an outcome, e.g. was cancelled."""
+        self._trial = False
+
+    def failed(self):
+        self._failed += 1
+        self._trial = False
+        if self._opened_at is not None or self._failed >= self.failures:
+            self._opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(ORCID_BREAKER_FAILURES, ORCID_BREAKER_RESET_SECONDS)
+
+
+def connect_http():
+    """Create the process-wide pooled HTTP client, if not already created."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(ORCID_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            headers={"Accept": "application/json"},
+        )
+    return _client
+
+
+async def close_http():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def exchange_code(code):
+    """The token response for authorization `code`: {"orcid", "name", "id_token", ...}.
+
+    Raises OrcidRejected if ORCID refuses the code, and OrcidUnavailable if it cannot be asked.
+    """
+    if not breaker.allow():
+        raise OrcidUnavailable("ORCID sign-in is temporarily unavailable")
+    client = connect_http()
+    data = {
+        "client_id": ORCID_CLIENT_ID,
+        "client_secret": ORCID_CLIENT_SECRET,
+        "grant_type": "authorization_code",
+        "code": code,
+        "redirect_uri": ORCID_REDIRECT_URI,
+    }
+    problem = None
+    settled = False
+    try:
+        for attempt in range(ORCID_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(BACKOFF_SECONDS * 2 ** (attempt - 1))
+            try:
+                response = await client.post(ORCID_TOKEN_URL, data=data)
+            except _NOT_SENT as e:
+                problem = e
+                continue
+            except httpx.TransportError as e:
+                problem = e
+                break
+            if response.status_code in _RETRY_STATUSES:
+                problem = f"status {response.status_code}"
+                continue
+            if response.status_code >= 500:
+                problem = f"status {response.status_code}"
+                break
+            if response.status_code == 200:
+                try:
+                    token = response.json()
+                except ValueError as e:
+                    problem = f"unreadable response: {e}"
+                    break
+            # ORCID answered: a refused code is the user's problem, not ORCID's
+            breaker.succeeded()
+            settled = True
+            if response.status_code != 200:
+                raise OrcidRejected(f"status {response.status_code}")
+            return token
+        breaker.failed()
+        settled = True
+    finally:
+        # cancelled, or failed unexpectedly: release a half-open trial without judging ORCID
+        if not settled:
+            breaker.abandoned()
+    raise OrcidUnavailable(f"ORCID token exchange failed: {problem}")
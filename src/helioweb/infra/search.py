@@ -0,0 +1,168 @@
+"""
+Full-text search over `alldocs`, ranked by text score.
+
+One aggregation answers a page: a single `$text` match feeds a `$facet` that both counts the hits
+per type and pages through the (optionally type-restricted) hits by (score, _id) keyset.
+
+Pages are cached per worker by normalized (q, t, cursor) in an LRU bounded by
+SEARCH_CACHE_MAX_BYTES and SEARCH_CACHE_TTL_SECONDS. With SEARCH_CACHE_SHARED set, they are also
+kept in the `search_cache` collection, so a page computed by one worker serves the others.
+`invalidate_search` drops both, e.g. after a corpus load.
+"""
+
+from datetime import datetime, timezone
+import hashlib
+import json
+
+import bson
+from pymongo import ASCENDING, DESCENDING
+
+from helioweb.infra.cache import LRUCache
+from helioweb.infra.config import (
+    SEARCH_CACHE_MAX_BYTES,
+    SEARCH_CACHE_SHARED,
+    SEARCH_CACHE_TTL_SECONDS,
+)
+from helioweb.infra.metrics import named
+from helioweb.infra.util import aggregate_list, encode_cursor, keyset_filter
+from helioweb.infra.versions import bump_versions, current_versions
+
+SEARCH = "search"
+
+SEARCH_TYPES = ["Author", "Concept", "Institution", "Work"]
+SEARCH_SORT = [("score", DESCENDING), ("_id", ASCENDING)]
+HREF_PREFIX = {
+    "Author": "author",
+    "Concept": "concept",
+    "Institution": "affil",
+    "Work": "work",
+}
+
+
+def _href():
+    return {
+        "$concat": [
+            {
+                "$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$type", t]}, "then": prefix}
+                        for t, prefix in HREF_PREFIX.items()
+                    ],
+                    "default": "_",
+                }
+            },
+            ":",
+            "$_id",
+        ]
+    }
+
+
+def search_pipeline(q, type_=None, after=None, limit=50):
+    results = []
+    if type_ is not None:
+        results.append({"$match": {"type": type_}})
+    if after is not None:
+        results.append({"$match": keyset_filter(SEARCH_SORT, after)})
+    results += [
+        {"$sort": dict(SEARCH_SORT)},
+        {"$limit": limit + 1},
+        {"$addFields": {"_href": _href()}},
+    ]
+    return [
+        {"$match": {"$text": {"$search": q}}},
+        {
+            "$project": {
+                "type": 1,
+                "display_name": 1,
+                "score": {"$meta": "textScore"},
+            }
+        },
+        {
+            "$facet": {
+                "counts": [{"$group": {"_id": "$type", "n": {"$sum": 1}}}],
+                "results": results,
+            }
+        },
+    ]
+
+
+@named("search")
+async def search(mdb, q, type_=None, after=None, limit=50):
+    """A page of hits for `q`, best first.
+
+    Returns {"counts": {type: hits}, "total", "results", "next"}, where the counts cover all
+    types whatever `type_` is, and `next` is the cursor for the following page (or None).
+    """
+    if not q.strip():
+        return {"counts": {}, "total": 0, "results": [], "next": None}
+    found = (
+        await aggregate_list(
+            mdb.alldocs,
+            search_pipeline(q, type_=type_, after=after, limit=limit),
+            allowDiskUse=True,
+        )
+    )[0]
+    counts = {c["_id"]: c["n"] for c in found["counts"] if c["_id"] is not None}
+    results = found["results"]
+    next_ = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_ = encode_cursor([results[-1]["score"], results[-1]["_id"]])
+    return {
+        "counts": counts,
+        "total": sum(c["n"] for c in found["counts"]),
+        "results": results,
+        "next": next_,
+    }
+
+
+_cache = LRUCache(SEARCH_CACHE_MAX_BYTES, ttl=SEARCH_CACHE_TTL_SECONDS)
+_cache_version = None
+_shared_hits = 0
+
+
+def _cache_key(q, type_, after, limit):
+    # $text matching ignores case and spacing
+    return json.dumps([" ".join(q.casefold().split()), type_, after, limit])
+
+
+async def cached_search(mdb, q, type_=None, after=None, limit=50):
+    """`search`, answered from the worker's cache or the shared cache when possible."""
+    global _cache_version, _shared_hits
+    version = (await current_versions(mdb)).get(SEARCH, 0)
+    if version != _cache_version:
+        _cache.clear()
+        _cache_version = version
+    key = _cache_key(q, type_, after, limit)
+    if (found := _cache.get(key)) is not None:
+        return found
+    if SEARCH_CACHE_SHARED:
+        shared_id = hashlib.sha1(key.encode()).hexdigest()
+        if doc := await mdb.search_cache.find_one({"_id": shared_id, "v": version}):
+            found = doc["value"]
+            _shared_hits += 1
+    if found is None:
+        found = await search(mdb, q, type_=type_, after=after, limit=limit)
+        if SEARCH_CACHE_SHARED:
+            await mdb.search_cache.replace_one(
+                {"_id": shared_id},
+                {"v": version, "value": found, "at": datetime.now(timezone.utc)},
+                upsert=True,
+            )
+    _cache.put(key, found, len(bson.encode(found)))
+    return found
+
+
+def search_cache_stats():
+    return {
+        **_cache.stats(),
+        "shared": SEARCH_CACHE_SHARED,
+        "shared_hits": _shared_hits,
+    }
+
+
+async def invalidate_search(mdb):
+    """Have every worker drop its cached search pages, and empty the shared cache."""
+    await bump_versions(mdb, SEARCH)
+    if SEARCH_CACHE_SHARED:
+        await mdb.search_cache.delete_many({})
@@ -0,0 +1,251 @@
+"""
+"Similar researchers": for each author, the authors whose concept interests align best.
+
+An author's interests are a sparse vector over concepts: each `dcterms:relation` edge contributes
+its `q` score to its concept and ANCESTOR_WEIGHT times that to each of the concept's ancestors,
+so authors of sibling concepts still align. Weights are scaled by inverse document frequency, so
+broad concepts that most authors share count for less, and rows are L2-normalized, so a dot
+product is a cosine similarity.
+
+`build_similar` multiplies the author×concept matrix by its transpose a chunk of rows at a time
+and stores each author's top SIMILAR_K in `similar_authors`, for a single-document read on the
+author page. Asserting a relation marks the author stale with a fresh token. `update_similar`
+recomputes the stale authors' lists and merges their new scores into the lists of the authors they
+align with; it clears a mark only if its token is unchanged, so an author marked again meanwhile
+stays stale. Those merges cannot pull up an author who dropped out of a list, so run a full build
+periodically.
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from helioweb.infra.hierarchy import load_hierarchy
+from helioweb.infra.metrics import named
+
+RELATION = "dcterms:relation"
+SIMILAR_K = 20
+ANCESTOR_WEIGHT = 0.5
+
+
+def _weight(q):
+    return float(q) if isinstance(q, (int, float)) and q > 0 else 1.0
+
+
+class ConceptVectors:
+    """Authors' concept vectors as a row-normalized CSR matrix, with its transpose."""
+
+    def __init__(self, authors, relations, ancestors):
+        """`authors` are (id, display_name) pairs, `relations` (author_id, concept_id, q)
+        triples, and `ancestors` maps a concept to its ancestors."""
+        self.ids = [a[0] for a in authors]
+        self.names = [a[1] for a in authors]
+        self.index = {id_: i for i, id_ in enumerate(self.ids)}
+        concepts = {}
+        weights = {}  # (row, col) -> weight
+        for s, o, q in relations:
+            if s not in self.index:
+                continue
+            row, w = self.index[s], _weight(q)
+            for c, cw in ((o, w), *((a, w * ANCESTOR_WEIGHT) for a in ancestors(o))):
+                col = concepts.setdefault(c, len(concepts))
+                weights[row, col] = weights.get((row, col), 0.0) + cw
+        n = len(self.ids)
+        rows = np.fromiter((k[0] for k in weights), dtype=np.int32, count=len(weights))
+        cols = np.fromiter((k[1] for k in weights), dtype=np.int32, count=len(weights))
+        data = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+        df = np.bincount(cols, minlength=len(concepts))
+        data *= np.log((1 + n) / (1 + df[cols])) + 1
+        norms = np.sqrt(np.bincount(rows, weights=data**2, minlength=n))
+        data /= np.where(norms > 0, norms, 1)[rows]
+
+        order = np.lexsort((cols, rows))
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=self.indptr[1:])
+        self.cols, self.data = cols[order], data[order]
+        t_order = np.lexsort((rows, cols))
+        self.t_indptr = np.zeros(len(concepts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=len(concepts)), out=self.t_indptr[1:])
+        self.t_rows, self.t_data = rows[t_order], data[t_order]
+
+    def top_k(self, rows, k=SIMILAR_K):
+        """Row, other row and score arrays of the `k` best-aligned authors of each of `rows`."""
+        rows = np.asarray(rows, dtype=np.int32)
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        local = np.repeat(np.arange(len(rows)), lengths)
+        entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(
+            lengths.sum()
+        )
+        cols, vals = self.cols[entries], self.data[entries]
+        # expand each nonzero over the concept's column of the transpose
+        t_starts, t_ends = self.t_indptr[cols], self.t_indptr[cols + 1]
+        t_lengths = t_ends - t_starts
+        t_entries = np.repeat(
+            t_starts - np.cumsum(t_lengths) + t_lengths, t_lengths
+        ) + np.arange(t_lengths.sum())
+        pair_row = np.repeat(local, t_lengths)
+        pair_other = self.t_rows[t_entries]
+        products = np.repeat(vals, t_lengths) * self.t_data[t_entries]
+        keep = rows[pair_row] != pair_other
+        keys = pair_row[keep].astype(np.int64) * len(self.ids) + pair_other[keep]
+        keys, inverse = np.unique(keys, return_inverse=True)
+        scores = np.bincount(inverse, weights=products[keep])
+        row_of, other = rows[keys // len(self.ids)], keys % len(self.ids)
+        order = np.lexsort((other, -scores, row_of))
+        row_of, other, scores = row_of[order], other[order], scores[order]
+        first = np.searchsorted(row_of, row_of)
+        best = np.arange(len(row_of)) - first < k
+        return row_of[best], other[best], scores[best]
+
+    def similar(self, rows, k=SIMILAR_K, chunk_size=256):
+        """Yield (author_id, [{"_id", "display_name", "score"}]) for `rows`, best first."""
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size]
+            row_of, other, scores = self.top_k(chunk, k)
+            found = {r: [] for r in chunk}
+            for r, o, s in zip(row_of.tolist(), other.tolist(), scores.tolist()):
+                found[r].append(
+                    {"_id": self.ids[o], "display_name": self.names[o], "score": s}
+                )
+            yield from ((self.ids[r], lst) for r, lst in found.items())
+
+
+async def load_vectors(mdb):
+    hierarchy = await load_hierarchy(mdb, "Concept")
+    authors = [
+        (d["_id"], d.get("display_name"))
+        for d in await mdb.alldocs.find({"type": "Author"}, ["display_name"]).to_list()
+    ]
+    relations = [
+        (e["s"], e["o"], e.get("q"))
+        for e in await mdb.edges.find({"p": RELATION}, ["s", "o", "q"]).to_list()
+    ]
+    return ConceptVectors(
+        authors,
+        relations,
+        lambda c: hierarchy.ancestors.get(c, ()),
+    )
+
+
+async def _store(mdb, lists, batch_size=1000):
+    at = datetime.now(timezone.utc)
+    batch, n = [], 0
+    for author_id, similar in lists:
+        # $set, not a replacement, keeps a stale mark set since the vectors were read
+        batch.append(
+            UpdateOne(
+                {"_id": author_id},
+                {"$set": {"similar": similar, "at": at}},
+                upsert=True,
+            )
+        )
+        if len(batch) >= batch_size:
+            await mdb.similar_authors.bulk_write(batch, ordered=False)
+            n, batch = n + len(batch), []
+    if batch:
+        await mdb.similar_authors.bulk_write(batch, ordered=False)
+    return n + len(batch), at
+
+
+async def build_similar(mdb, k=SIMILAR_K, chunk_size=256):
+    """Recompute every author's list. Returns the number of authors stored."""
+    stale = await _stale(mdb)
+    vectors = await load_vectors(mdb)
+    n, at = await _store(
+        mdb,
+        vectors.similar(list(range(len(vectors.ids))), k=k, chunk_size=chunk_size),
+    )
+    await mdb.similar_authors.delete_many({"at": {"$lt": at}})
+    await _clear_stale(mdb, stale)
+    return n
+
+
+async def mark_similar_stale(mdb, author_ids):
+    """Note that the authors' concept edges changed, for `update_similar`."""
+    await mdb.similar_authors.bulk_write(
+        [
+            UpdateOne({"_id": a}, {"$set": {"stale": ObjectId()}}, upsert=True)
+            for a in author_ids
+        ],
+        ordered=False,
+    )
+
+
+async def _stale(mdb):
+    """The stale authors' marks, by author ID."""
+    return {
+        d["_id"]: d["stale"]
+        for d in await mdb.similar_authors.find(
+            {"stale": {"$exists": True}}, ["stale"]
+        ).to_list()
+    }
+
+
+async def _clear_stale(mdb, stale):
+    """Clear the marks read by `_stale`, except those set again since."""
+    if stale:
+        await mdb.similar_authors.bulk_write(
+            [
+                UpdateOne({"_id": a, "stale": token}, {"$unset": {"stale": ""}})
+                for a, token in stale.items()
+            ],
+            ordered=False,
+        )
+
+
+async def update_similar(mdb, k=SIMILAR_K, chunk_size=256):
+    """Recompute the lists of stale authors and merge their new scores into the lists of the
+    authors they align with. Returns the number of stale authors recomputed."""
+    stale = await _stale(mdb)
+    if not stale:
+        return 0
+    vectors = await load_vectors(mdb)
+    rows = [vectors.index[a] for a in stale if a in vectors.index]
+    own = {r: [] for r in rows}
+    changed = {vectors.ids[r]: {} for r in rows}
+    for start in range(0, len(rows), chunk_size):
+        # every pair score involving them: their own lists, and entries in other authors' lists
+        chunk = rows[start : start + chunk_size]
+        row_of, other, scores = vectors.top_k(chunk, k=len(vectors.ids))
+        for r, o, s in zip(row_of.tolist(), other.tolist(), scores.tolist()):
+            if len(own[r]) < k:
+                own[r].append(
+                    {
+                        "_id": vectors.ids[o],
+                        "display_name": vectors.names[o],
+                        "score": s,
+                    }
+                )
+            changed[vectors.ids[r]][vectors.ids[o]] = s
+    await _store(mdb, ((vectors.ids[r], lst) for r, lst in own.items()))
+    affected = {b for scores_ in changed.values() for b in scores_} - changed.keys()
+    updates = []
+    async for doc in mdb.similar_authors.find({"_id": {"$in": list(affected)}}):
+        merged = [e for e in doc.get("similar", []) if e["_id"] not in changed]
+        merged += [
+            {
+                "_id": a,
+                "display_name": vectors.names[vectors.index[a]],
+                "score": scores_[doc["_id"]],
+            }
+            for a, scores_ in changed.items()
+            if doc["_id"] in scores_
+        ]
+        merged.sort(key=lambda e: (-e["score"], e["_id"]))
+        updates.append(
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"similar": merged[:k]}})
+        )
+    if updates:
+        await mdb.similar_authors.bulk_write(updates, ordered=False)
+    await _clear_stale(mdb, stale)
+    return len(rows)
+
+
+@named("similar.similar_authors")
+async def similar_authors(mdb, author_id):
+    """The author's stored list of similar authors, best first."""
+    doc = await mdb.similar_authors.find_one({"_id": author_id}, ["similar"])
+    return (doc or {}).get("similar", [])
@@ -0,0 +1,353 @@
+"""
+Read-only graph snapshot, memory-mapped by every worker.
+
+`build_snapshot` writes `alldocs` as one binary file: node IDs interned to dense integers (in
+UTF-8 order, so an ID is found by binary search), string tables of IDs and display names, a type
+code per node, and CSR adjacency in both directions for each of PREDICATES. Edges whose ends are
+not of the types in EDGE_TYPES are left out, as FunnelEngine leaves them out, so that both answer
+alike. Workers map the file read-only and read its arrays as zero-copy NumPy views, so the OS page
+cache holds one copy for all of them.
+
+A snapshot is published by renaming a complete file over GRAPH_SNAPSHOT_PATH. Workers check the
+path at most every VERSION_CHECK_SECONDS and switch to a new file when it appears; requests
+already holding the old one keep it mapped until they finish. Edges asserted after the build are
+applied from the edge log as a small per-worker overlay; edges naming nodes the snapshot does not
+have wait for the next build.
+"""
+
+import asyncio
+from bisect import bisect_right
+from datetime import datetime, timezone
+import json
+import mmap
+import os
+import time
+
+import numpy as np
+
+from helioweb.infra.config import GRAPH_SNAPSHOT_PATH, VERSION_CHECK_SECONDS
+from helioweb.infra.csr import csr_from_pairs, gather
+from helioweb.infra.edgelog import EDGE_LOG, LogReader
+from helioweb.infra.versions import VERSIONS_ID
+
+MAGIC = b"HWGRAPH2"
+ALIGN = 64
+PREDICATES = ("author", "affil", "skos:broader", "dcterms:relation")
+TYPES = ("Author", "Concept", "Institution", "Work")
+NO_TYPE = 255
+# the (subject, object) types of the predicates whose ends are typed
+EDGE_TYPES = {
+    "author": ("Work", "Author"),
+    "affil": ("Work", "Institution"),
+    "dcterms:relation": ("Author", "Concept"),
+}
+
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+
+def _string_table(strings):
+    data = [s.encode() for s in strings]
+    offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in data], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(data), dtype=np.uint8)
+
+
+def write_snapshot(path, arrays, meta):
+    """Write `arrays` (name -> ndarray) and the JSON-able `meta` to `path`, then rename it into
+    place, so a reader sees the old file or the new one but never a partial one."""
+    layout, offset = {}, 0
+    for name, a in arrays.items():
+        layout[name] = {"dtype": a.dtype.str, "shape": a.shape, "offset": offset}
+        offset = _aligned(offset + a.nbytes)
+    header = json.dumps({**meta, "arrays": layout}).encode()
+    start = _aligned(len(MAGIC) + 8 + len(header))
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, a in arrays.items():
+            f.seek(start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(a).tobytes())
+        f.truncate(start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def build_snapshot(db, path, batch_size=10_000):
+    """Build a snapshot of `alldocs` at `path` from the blocking client `db`. Returns its meta."""
+    versions = db.meta.find_one({"_id": VERSIONS_ID}) or {}
+    seq = versions.get(EDGE_LOG, 0)
+    type_codes = {t: i for i, t in enumerate(TYPES)}
+    ids, names, types = [], [], []
+    edges = {p: ([], []) for p in PREDICATES}
+    for d in db.alldocs.find(
+        {}, ["type", "display_name", "outgoing.p", "outgoing.o"], batch_size=batch_size
+    ):
+        row = len(ids)
+        ids.append(d["_id"])
+        names.append(d.get("display_name"))
+        types.append(type_codes.get(d.get("type"), NO_TYPE))
+        for e in d.get("outgoing", []):
+            if e["p"] in edges:
+                edges[e["p"]][0].append(row)
+                edges[e["p"]][1].append(e["o"])
+
+    # intern IDs in UTF-8 order
+    by_id = sorted(range(len(ids)), key=lambda r: ids[r].encode())
+    node_of_row = np.empty(len(ids), dtype=np.int32)
+    node_of_row[by_id] = np.arange(len(ids), dtype=np.int32)
+    ids = [ids[r] for r in by_id]
+    names = [names[r] for r in by_id]
+    node_of_id = {id_: i for i, id_ in enumerate(ids)}
+    by_name = sorted(range(len(ids)), key=lambda i: (names[i] or "", ids[i]))
+
+    arrays = {}
+    arrays["id_offsets"], arrays["id_data"] = _string_table(ids)
+    arrays["name_offsets"], arrays["name_data"] = _string_table(n or "" for n in names)
+    arrays["named"] = np.array([n is not None for n in names], dtype=bool)
+    arrays["types"] = np.array([types[r] for r in by_id], dtype=np.uint8)
+    arrays["name_order"] = np.array(by_name, dtype=np.int32)
+    arrays["name_rank"] = np.empty(len(ids), dtype=np.int32)
+    arrays["name_rank"][arrays["name_order"]] = np.arange(len(ids), dtype=np.int32)
+    n_edges = {}
+    for k, p in enumerate(PREDICATES):
+        rows, targets = edges[p]
+        src = node_of_row[np.array(rows, dtype=np.int32)]
+        dst = np.array([node_of_id.get(o, -1) for o in targets], dtype=np.int32)
+        known = dst >= 0
+        src, dst = src[known], dst[known]
+        if p in EDGE_TYPES:
+            subject, object_ = (TYPES.index(t) for t in EDGE_TYPES[p])
+            typed = (arrays["types"][src] == subject) & (
+                arrays["types"][dst] == object_
+            )
+            src, dst = src[typed], dst[typed]
+        arrays[f"{k}.indptr"], arrays[f"{k}.indices"] = csr_from_pairs(
+            src, dst, len(ids)
+        )
+        arrays[f"{k}.rindptr"], arrays[f"{k}.rindices"] = csr_from_pairs(
+            dst, src, len(ids)
+        )
+        n_edges[p] = len(src)
+
+    meta = {
+        "seq": seq,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "nodes": len(ids),
+        "edges": n_edges,
+    }
+    write_snapshot(path, arrays, meta)
+    return meta
+
+
+class StringTable:
+    """The strings of a snapshot string table, decoded on access."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i] : self.offsets[i + 1]].tobytes().decode()
+
+    def find(self, s):
+        """The index of `s` in a table sorted by UTF-8 bytes, or None."""
+        key = s.encode()
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.data[self.offsets[mid] : self.offsets[mid + 1]].tobytes() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self[lo] == s:
+            return lo
+        return None
+
+
+class GraphSnapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a graph snapshot")
+        n = int.from_bytes(self._mmap[len(MAGIC) : len(MAGIC) + 8], "little")
+        header = json.loads(self._mmap[len(MAGIC) + 8 : len(MAGIC) + 8 + n])
+        start = _aligned(len(MAGIC) + 8 + n)
+        arrays = {}
+        for name, spec in header.pop("arrays").items():
+            count = int(np.prod(spec["shape"]))
+            arrays[name] = np.frombuffer(
+                self._mmap,
+                dtype=spec["dtype"],
+                count=count,
+                offset=start + spec["offset"],
+            ).reshape(spec["shape"])
+        self.meta = header
+        self.log = LogReader(header["seq"])
+        self.ids = StringTable(arrays["id_offsets"], arrays["id_data"])
+        self.names = StringTable(arrays["name_offsets"], arrays["name_data"])
+        self.named = arrays["named"]
+        self.types = arrays["types"]
+        # nodes by (display name, ID), and each node's position in that order
+        self.name_order = arrays["name_order"]
+        self.name_rank = arrays["name_rank"]
+        self.out = {
+            p: (arrays[f"{k}.indptr"], arrays[f"{k}.indices"])
+            for k, p in enumerate(PREDICATES)
+        }
+        self.into = {
+            p: (arrays[f"{k}.rindptr"], arrays[f"{k}.rindices"])
+            for k, p in enumerate(PREDICATES)
+        }
+        # edges asserted since the build, between nodes the snapshot has
+        self.extra_out = {p: {} for p in PREDICATES}
+        self.extra_in = {p: {} for p in PREDICATES}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def node(self, id_, type_=None):
+        i = self.ids.find(id_)
+        if i is None or (type_ is not None and self.types[i] != TYPES.index(type_)):
+            return None
+        return i
+
+    def add_edge(self, s, p, o):
+        """Apply an asserted edge to the overlay. Return False if it names an unknown node."""
+        if p not in PREDICATES:
+            return True
+        i, j = self.node(s), self.node(o)
+        if i is None or j is None:
+            return False
+        if p in EDGE_TYPES and (
+            TYPES[self.types[i]] != EDGE_TYPES[p][0]
+            or TYPES[self.types[j]] != EDGE_TYPES[p][1]
+        ):
+            return True  # left out, as a rebuilt snapshot would leave it out
+        self.extra_out[p].setdefault(i, set()).add(j)
+        self.extra_in[p].setdefault(j, set()).add(i)
+        return True
+
+    def neighbors(self, p, nodes, reverse=False):
+        """Sorted unique nodes linked from (or, with `reverse`, to) any of `nodes` by `p`."""
+        nodes = np.asarray(nodes, dtype=np.int32)
+        found = [gather((self.into if reverse else self.out)[p], nodes)]
+        if extra := (self.extra_in if reverse else self.extra_out)[p]:
+            keys = np.fromiter(extra, dtype=np.int32, count=len(extra))
+            for k in keys[np.isin(keys, nodes)]:
+                found.append(np.fromiter(extra[k], dtype=np.int32))
+        return np.unique(np.concatenate(found))
+
+    def tent(self, ids, type_):
+        """IDs in `ids` (of `type_`) and all of their skos:broader descendants."""
+        seen = np.zeros(len(self), dtype=bool)
+        frontier = np.array(
+            [i for i in (self.node(id_, type_) for id_ in ids if id_) if i is not None],
+            dtype=np.int32,
+        )
+        seen[frontier] = True
+        while len(frontier):
+            below = self.neighbors("skos:broader", frontier, reverse=True)
+            frontier = below[~seen[below]]
+            seen[frontier] = True
+        return [self.ids[i] for i in np.flatnonzero(seen)]
+
+    def _page(self, nodes, after=None, limit=50):
+        """Count `nodes` and return the first `limit` by display name after the `after` cursor,
+        plus the cursor for the next page (or None), as FunnelEngine pages do."""
+        count = len(nodes)
+        if after is not None:
+            start = bisect_right(
+                range(len(self)),
+                tuple(after),
+                key=lambda k: (
+                    self.names[self.name_order[k]],
+                    self.ids[self.name_order[k]],
+                ),
+            )
+            nodes = nodes[self.name_rank[nodes] >= start]
+        top = nodes[np.argsort(self.name_rank[nodes], kind="stable")[: limit + 1]]
+        items = [
+            {
+                "_id": self.ids[i],
+                "display_name": self.names[i] if self.named[i] else None,
+            }
+            for i in top[:limit]
+        ]
+        if len(top) <= limit:
+            return count, items, None
+        last = top[limit - 1]
+        return count, items, [self.names[last], self.ids[last]]
+
+    def coauthors(self, author_id, after=None, limit=50):
+        """Authors sharing a work with the author: (count, page, next cursor)."""
+        a = self.node(author_id, "Author")
+        if a is None:
+            return 0, [], None
+        works = self.neighbors("author", [a], reverse=True)
+        authors = self.neighbors("author", works)
+        return self._page(authors[authors != a], after=after, limit=limit)
+
+    def institution_authors(self, institution_id, after=None, limit=50):
+        """Authors of works affiliated with the institution: (count, page, next cursor)."""
+        i = self.node(institution_id, "Institution")
+        if i is None:
+            return 0, [], None
+        works = self.neighbors("affil", [i], reverse=True)
+        return self._page(self.neighbors("author", works), after=after, limit=limit)
+
+
+_snapshot = None
+_checked_at = float("-inf")
+_lock = asyncio.Lock()
+
+
+def _changed(stat, snapshot):
+    return snapshot is None or (stat.st_ino, stat.st_mtime_ns) != (
+        snapshot.stat.st_ino,
+        snapshot.stat.st_mtime_ns,
+    )
+
+
+async def get_graph(mdb):
+    """The published snapshot, caught up with the edge log, or None if there is none."""
+    global _snapshot, _checked_at
+    if not GRAPH_SNAPSHOT_PATH:
+        return None
+    if time.monotonic() - _checked_at >= VERSION_CHECK_SECONDS:
+        async with _lock:
+            if time.monotonic() - _checked_at >= VERSION_CHECK_SECONDS:
+                try:
+                    stat = os.stat(GRAPH_SNAPSHOT_PATH)
+                except FileNotFoundError:
+                    _snapshot = None
+                else:
+                    if _changed(stat, _snapshot):
+                        try:
+                            _snapshot = await asyncio.to_thread(
+                                GraphSnapshot, GRAPH_SNAPSHOT_PATH
+                            )
+                        except ValueError:
+                            # e.g. a file of an older format, until it is rebuilt
+                            _snapshot = None
+                _checked_at = time.monotonic()
+    snapshot = _snapshot
+    if snapshot is not None and await snapshot.log.behind(mdb):
+        async with _lock:
+            await snapshot.log.catch_up(
+                mdb, lambda e: snapshot.add_edge(e["s"], e["p"], e["o"])
+            )
+    return snapshot
+
+
+def snapshot_stats():
+    if _snapshot is None:
+        return None
+    return {"path": GRAPH_SNAPSHOT_PATH, **_snapshot.meta, "seq": _snapshot.log.seq}
@@ -0,0 +1,73 @@
+"""
+Prefix indexes over the facet lists, for paginated typeahead of authors, concepts and institutions.
+
+A query matches names that start with it first, in name order, and then names with a later word
+that starts with it. Matching ignores case, accents and runs of whitespace.
+"""
+
+from bisect import bisect_left
+from itertools import chain
+import unicodedata
+
+from helioweb.infra.facets import get_facet
+
+FACET_FOR_KIND = {
+    "authors": "authors",
+    "concepts": "author_concepts",
+    "institutions": "work_institutions",
+}
+
+
+def normalize(s):
+    s = unicodedata.normalize("NFKD", s or "")
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return " ".join(s.casefold().split())
+
+
+class PrefixIndex:
+    def __init__(self, docs):
+        self.ids = [d["_id"] for d in docs]
+        self.names = [d.get("display_name") or "" for d in docs]
+        self.by_id = dict(zip(self.ids, self.names))
+        self.full = sorted((normalize(n), i) for i, n in enumerate(self.names))
+        self.words = sorted(
+            (key[start:], i)
+            for key, i in self.full
+            for start in (j + 1 for j, c in enumerate(key) if c == " ")
+        )
+
+    @staticmethod
+    def _range(keys, prefix):
+        for j in range(bisect_left(keys, (prefix,)), len(keys)):
+            key, i = keys[j]
+            if not key.startswith(prefix):
+                return
+            yield i
+
+    def search(self, q, offset=0, limit=20, exclude=frozenset()):
+        """Return up to `limit` (id, name) pairs after skipping `offset` matches,
+        and whether there are more."""
+        prefix, seen, rv = normalize(q), set(), []
+        matches = self._range(self.full, prefix)
+        if prefix:
+            matches = chain(matches, self._range(self.words, prefix))
+        for i in matches:
+            if i in seen or self.ids[i] in exclude:
+                continue
+            seen.add(i)
+            if len(seen) > offset + limit:
+                return rv, True
+            if len(seen) > offset:
+                rv.append((self.ids[i], self.names[i]))
+        return rv, False
+
+
+_indexes = {}
+
+
+async def get_prefix_index(mdb, kind) -> PrefixIndex:
+    """The index for `kind`, rebuilt whenever its cached facet list is reloaded."""
+    docs = await get_facet(mdb, FACET_FOR_KIND[kind])
+    if kind not in _indexes or _indexes[kind][0] is not docs:
+        _indexes[kind] = (docs, PrefixIndex(docs))
+    return _indexes[kind][1]
@@ -1 +1,52 @@
+import base64
+import json
 
+
+async def aggregate_list(collection, pipeline, **kwargs):
+    """Run an aggregation pipeline and await all of its results."""
+    return await (await collection.aggregate(pipeline, **kwargs)).to_list()
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe token for a keyset-pagination position."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, kinds):
+    """Inverse of `encode_cursor`, for a position whose values are of the types `kinds`, one per
+    sort key, e.g. `((int, float), str)`. Raises ValueError for a malformed token."""
+    values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    if not isinstance(values, list) or len(values) != len(kinds):
+        raise ValueError(f"expected a list of {len(kinds)} values")
+    for value, kind in zip(values, kinds):
+        if isinstance(value, bool) or not isinstance(value, kind):
+            raise ValueError(f"unexpected value {value!r}")
+    return values
+
+
+def _beyond(value, direction):
+    """Conditions, any one of which a field value meets if it sorts after `value` in `direction`.
+
+    Comparisons only match values of the compared value's type, so the types that sort beyond it
+    (nulls lowest, then numbers, then strings) each need a condition of their own.
+    """
+    number = isinstance(value, (int, float))
+    if direction > 0:
+        if value is None:
+            return [{"$ne": None}]
+        return [{"$gt": value}, *([{"$type": "string"}] if number else [])]
+    if value is None:
+        return []
+    return [{"$lt": value}, None] if number else [{"$not": {"$gte": value}}]
+
+
+def keyset_filter(sort, values):
+    """Filter for documents that come after the one with sort-key `values` in `sort` order.
+
+    `sort` is a list of (field, direction) pairs ending in a unique field, e.g. `_id`.
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        equal = {f: v for (f, _), v in zip(sort[:i], values)}
+        branches += [{**equal, field: c} for c in _beyond(values[i], direction)]
+    return {"$or": branches} if branches else {"_id": {"$exists": False}}
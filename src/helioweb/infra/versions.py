@@ -0,0 +1,98 @@
+"""
+Version counters shared by all workers through the `meta` collection.
+
+Each process-local cache is tagged with the counter it was built at. A write bumps the counter,
+and every worker rebuilds on its next read after polling (at most every VERSION_CHECK_SECONDS).
+"""
+
+import asyncio
+import time
+
+from pymongo import ReturnDocument
+
+from helioweb.infra.config import VERSION_CHECK_SECONDS
+from helioweb.infra.metrics import named_query
+
+VERSIONS_ID = "versions"
+
+_versions: dict[str, int] = {}
+_checked_at = float("-inf")
+
+
+def _remember(doc):
+    global _versions, _checked_at
+    _versions = {k: v for k, v in (doc or {}).items() if k != "_id"}
+    _checked_at = time.monotonic()
+    return _versions
+
+
+async def current_versions(mdb):
+    if time.monotonic() - _checked_at >= VERSION_CHECK_SECONDS:
+        _remember(await mdb.meta.find_one({"_id": VERSIONS_ID}))
+    return _versions
+
+
+async def bump_versions(mdb, *names, by=1):
+    return _remember(
+        await mdb.meta.find_one_and_update(
+            {"_id": VERSIONS_ID},
+            {"$inc": {name: by for name in names}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    )
+
+
+async def raise_version(mdb, name, value):
+    """Raise counter `name` to `value`, unless it is already higher."""
+    return _remember(
+        await mdb.meta.find_one_and_update(
+            {"_id": VERSIONS_ID},
+            {"$max": {name: value}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    )
+
+
+def bump_versions_sync(db, *names):
+    """Blocking counterpart of `bump_versions`, for command-line tools."""
+    db.meta.update_one(
+        {"_id": VERSIONS_ID}, {"$inc": {name: 1 for name in names}}, upsert=True
+    )
+
+
+class Versioned:
+    """A process-local value built from the database.
+
+    It is rebuilt when its version changes and, if `ttl` (seconds) is given, when it gets older.
+    """
+
+    def __init__(self, name, build, ttl=None):
+        self.name = name
+        self.ttl = ttl
+        self._build = build
+        self._value = None
+        self._version = None
+        self._built_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def _stale(self, version):
+        return self._version != version or (
+            self.ttl is not None and time.monotonic() - self._built_at >= self.ttl
+        )
+
+    async def get(self, mdb):
+        version = (await current_versions(mdb)).get(self.name, 0)
+        if self._stale(version):
+            async with self._lock:
+                if self._stale(version):
+                    with named_query(f"build {self.name}"):
+                        self._value = await self._build(mdb)
+                    self._version = version
+                    self._built_at = time.monotonic()
+        return self._value
+
+    async def invalidate(self, mdb):
+        """Have every worker, this one included, rebuild on its next read."""
+        await bump_versions(mdb, self.name)
@@ -0,0 +1,399 @@
+"""
+Versioned JSON API for entities: `/api/v1/{kind}/{id}` and batched `/api/v1/{kind}?ids=...`.
+
+`fields=` selects what a response carries: names of document fields are projected by the database,
+and names of relations (an author's works, a concept's children, ...) each run one sub-query for
+the whole batch. Without `fields=`, a response has the document's fields and no relations. Lists
+that grow without bound hold their first page, as {"count", "items", "next"}; later pages are
+served by the `*-works:` and `*-authors:` routes.
+
+`POST /api/v1/assertions` asserts a batch of edges for the logged-in curator.
+
+Responses are serialized with orjson.
+"""
+
+import asyncio
+import re
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from starlette import status
+
+from helioweb.infra.core import get_mongodb
+from helioweb.infra.config import CONNECTION_TIMEOUT_MS
+from helioweb.ui.assertions import assert_edges
+from helioweb.ui.util import get_user
+from helioweb.ui.views import (
+    affil_authors,
+    affil_works,
+    author_coauthors,
+    connection_view,
+    edges_by_target,
+)
+
+MAX_BATCH = 100
+MAX_ASSERTIONS = 500
+
+router = APIRouter(prefix="/api/v1", default_response_class=ORJSONResponse)
+
+KINDS = {
+    "authors": "Author",
+    "works": "Work",
+    "concepts": "Concept",
+    "institutions": "Institution",
+}
+_FIELD = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$")
+
+
+def _link(doc, edge):
+    doc = {
+        "_id": doc["_id"],
+        "display_name": doc.get("display_name"),
+        "q": edge.get("q"),
+    }
+    if submitter := edge.get("q2"):
+        doc["submitter"] = submitter
+    return doc
+
+
+async def _by_id(mdb, type_, ids, fields=("display_name",)):
+    found = await mdb.alldocs.find(
+        {"type": type_, "_id": {"$in": list(ids)}}, list(fields)
+    ).to_list()
+    return {d["_id"]: d for d in found}
+
+
+def _by_name(docs):
+    return sorted(docs, key=lambda d: d.get("display_name") or "")
+
+
+async def _incoming(mdb, p, ids):
+    """{o: {s: edge}} for the edges with predicate `p` into each of `ids`."""
+    found = {id_: {} for id_ in ids}
+    async for e in mdb.edges.find({"o": {"$in": list(ids)}, "p": p}):
+        found[e["o"]][e["s"]] = e
+    return found
+
+
+def _outgoing(docs, p):
+    return {d["_id"]: edges_by_target(d, p) for d in docs}
+
+
+async def _linked(mdb, type_, links):
+    """{id: [linked document]} for {id: {linked_id: edge}}, the documents named and qualified."""
+    named = await _by_id(mdb, type_, {o for ls in links.values() for o in ls})
+    return {
+        id_: [_link(named[o], e) for o, e in ls.items() if o in named]
+        for id_, ls in links.items()
+    }
+
+
+def _parents(type_):
+    async def load(mdb, docs):
+        found = await _linked(mdb, type_, _outgoing(docs, "skos:broader"))
+        return {id_: _by_name(ds) for id_, ds in found.items()}
+
+    return load
+
+
+def _children(type_):
+    async def load(mdb, docs):
+        links = await _incoming(mdb, "skos:broader", [d["_id"] for d in docs])
+        named = await _by_id(mdb, type_, {s for ls in links.values() for s in ls})
+        return {
+            id_: _by_name(named[s] for s in ls if s in named)
+            for id_, ls in links.items()
+        }
+
+    return load
+
+
+def _paged(page):
+    async def load(mdb, docs):
+        pages = await asyncio.gather(*(page(mdb, d["_id"]) for d in docs))
+        return {d["_id"]: p for d, p in zip(docs, pages)}
+
+    return load
+
+
+def _concept_order(c):
+    return c.get("q") or 0, c.get("display_name") or ""
+
+
+def _work_order(w):
+    """Order years as MongoDB does, missing before numbers before strings."""
+    year = w.get("year")
+    return (
+        year is not None,
+        isinstance(year, str),
+        0 if year is None else year,
+        w.get("display_name") or "",
+    )
+
+
+async def _author_concepts(mdb, docs):
+    found = await _linked(mdb, "Concept", _outgoing(docs, "dcterms:relation"))
+    return {
+        id_: sorted(ds, key=_concept_order, reverse=True) for id_, ds in found.items()
+    }
+
+
+async def _author_works(mdb, docs):
+    links = await _incoming(mdb, "author", [d["_id"] for d in docs])
+    named = await _by_id(
+        mdb,
+        "Work",
+        {s for ls in links.values() for s in ls},
+        ["display_name", "ads_work.year"],
+    )
+    return {
+        id_: sorted(
+            (
+                {**_link(named[s], e), "year": named[s].get("ads_work", {}).get("year")}
+                for s, e in ls.items()
+                if s in named
+            ),
+            key=_work_order,
+            reverse=True,
+        )
+        for id_, ls in links.items()
+    }
+
+
+async def _author_institutions(mdb, docs):
+    works = await _incoming(mdb, "author", [d["_id"] for d in docs])
+    affils = {}
+    async for e in mdb.edges.find(
+        {"s": {"$in": list({s for ws in works.values() for s in ws})}, "p": "affil"},
+        ["s", "o"],
+    ):
+        affils.setdefault(e["s"], set()).add(e["o"])
+    named = await _by_id(mdb, "Institution", set().union(*affils.values()))
+    return {
+        id_: _by_name(
+            named[o]
+            for o in set().union(*(affils.get(w, ()) for w in ws))
+            if o in named
+        )
+        for id_, ws in works.items()
+    }
+
+
+async def _similar(mdb, docs):
+    found = {d["_id"]: [] for d in docs}
+    async for d in mdb.similar_authors.find({"_id": {"$in": list(found)}}, ["similar"]):
+        found[d["_id"]] = d.get("similar", [])
+    return found
+
+
+async def _work_authors(mdb, docs):
+    found = await _linked(mdb, "Author", _outgoing(docs, "author"))
+    return {id_: _by_name(ds) for id_, ds in found.items()}
+
+
+async def _work_institutions(mdb, docs):
+    links = _outgoing(docs, "affil")
+    named = await _by_id(mdb, "Institution", {o for ls in links.values() for o in ls})
+    return {
+        id_: _by_name(named[o] for o in ls if o in named) for id_, ls in links.items()
+    }
+
+
+async def _concept_authors(mdb, docs):
+    links = await _incoming(mdb, "dcterms:relation", [d["_id"] for d in docs])
+    named = await _by_id(mdb, "Author", {s for ls in links.values() for s in ls})
+    return {
+        id_: _by_name(_link(named[s], e) for s, e in ls.items() if s in named)
+        for id_, ls in links.items()
+    }
+
+
+# each kind's relations: name -> loader(mdb, docs) returning {id: value}
+RELATIONS = {
+    "Author": {
+        "concepts": _author_concepts,
+        "works": _author_works,
+        "coauthors": _paged(author_coauthors),
+        "institutions": _author_institutions,
+        "similar": _similar,
+    },
+    "Work": {
+        "authors": _work_authors,
+        "institutions": _work_institutions,
+    },
+    "Concept": {
+        "parents": _parents("Concept"),
+        "children": _children("Concept"),
+        "authors": _concept_authors,
+    },
+    "Institution": {
+        "parents": _parents("Institution"),
+        "children": _children("Institution"),
+        "works": _paged(lambda mdb, id_: affil_works(mdb, id_, count=True)),
+        "authors": _paged(affil_authors),
+    },
+}
+
+
+# relations read from the documents' own `outgoing` edges, which are then fetched with them
+FROM_OUTGOING = {
+    ("Author", "concepts"),
+    ("Work", "authors"),
+    ("Work", "institutions"),
+    ("Concept", "parents"),
+    ("Institution", "parents"),
+}
+
+
+def parse_fields(type_, fields):
+    """(document fields or None for all, relation names) for a `fields=` value."""
+    if fields is None:
+        return None, []
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    relations = [f for f in names if f in RELATIONS[type_]]
+    projected = [f for f in names if f not in RELATIONS[type_]]
+    if bad := [f for f in projected if not _FIELD.match(f)]:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"invalid fields: {', '.join(bad)}",
+        )
+    return projected, relations
+
+
+def _outermost(paths):
+    """`paths` without duplicates and those under another of them, which MongoDB rejects in one
+    projection, e.g. "ads_work.year" alongside "ads_work"."""
+    paths = list(dict.fromkeys(paths))
+    return [p for p in paths if not any(p.startswith(f"{q}.") for q in paths if q != p)]
+
+
+async def entities(mdb, type_, ids, fields=None):
+    """The documents of `type_` with `ids` that exist, in order, with the requested fields."""
+    projected, relations = parse_fields(type_, fields)
+    outgoing = any((type_, r) in FROM_OUTGOING for r in relations)
+    if projected is None:
+        projection = None if outgoing else {"outgoing": 0}
+    else:
+        projection = dict.fromkeys(
+            _outermost(
+                ["display_name", *projected, *(["outgoing"] if outgoing else [])]
+            ),
+            1,
+        )
+    found = {
+        d["_id"]: d
+        for d in await mdb.alldocs.find(
+            {"type": type_, "_id": {"$in": list(ids)}}, projection
+        ).to_list()
+    }
+    docs = [found[id_] for id_ in dict.fromkeys(ids) if id_ in found]
+    loaded = await asyncio.gather(*(RELATIONS[type_][r](mdb, docs) for r in relations))
+    for r, values in zip(relations, loaded):
+        for d in docs:
+            d[r] = values[d["_id"]]
+    if outgoing and not any(
+        f == "outgoing" or f.startswith("outgoing.") for f in projected or ()
+    ):
+        for d in docs:
+            d.pop("outgoing", None)
+    return docs
+
+
+Kind = Literal["authors", "works", "concepts", "institutions"]
+Fields = Annotated[
+    str | None,
+    Query(
+        description="Comma-separated document fields and relations; "
+        "without it, every document field and no relations."
+    ),
+]
+
+
+class Triple(BaseModel):
+    s: str
+    p: str
+    o: str
+
+
+@router.post("/assertions")
+async def api_assert_edges(
+    triples: Annotated[list[Triple], Body(embed=True)],
+    mdb=Depends(get_mongodb),
+    user=Depends(get_user),
+):
+    """Assert up to MAX_ASSERTIONS edges as the logged-in user, in one request.
+
+    Returns {"added", "existing", "rejected"}; re-asserting an edge leaves it as it is.
+    """
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    if len(triples) > MAX_ASSERTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"at most {MAX_ASSERTIONS} triples per request",
+        )
+    result = await assert_edges(
+        mdb, [(t.s, t.p, t.o) for t in triples], submitter=user["orcid"]
+    )
+
+    def as_dict(triple):
+        return dict(zip("spo", triple))
+
+    return {
+        "added": [as_dict(t) for t in result["added"]],
+        "existing": [as_dict(t) for t in result["existing"]],
+        "rejected": [
+            {**as_dict(r["triple"]), "reason": r["reason"]} for r in result["rejected"]
+        ],
+    }
+
+
+@router.get("/connection")
+async def api_connection(
+    source: str,
+    target: str,
+    max_depth: Annotated[int, Query(ge=1, le=10)] = 6,
+    mdb=Depends(get_mongodb),
+):
+    """The shortest coauthorship chain between two authors: {"status", "authors", "works"}.
+
+    `works[i]` links `authors[i]` and `authors[i + 1]`. `status` is "found", "unknown",
+    "unconnected", "too_far" or "timeout".
+    """
+    return await connection_view(
+        mdb, source, target, max_depth, CONNECTION_TIMEOUT_MS / 1000
+    )
+
+
+@router.get("/{kind}")
+async def api_entities(
+    kind: Kind,
+    ids: Annotated[list[str], Query(min_length=1)],
+    fields: Fields = None,
+    mdb=Depends(get_mongodb),
+):
+    """Up to MAX_BATCH entities by ID: {"items", "missing"}, items in the order of `ids`."""
+    if len(ids) > MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"at most {MAX_BATCH} ids per request",
+        )
+    docs = await entities(mdb, KINDS[kind], ids, fields)
+    found = {d["_id"] for d in docs}
+    return {"items": docs, "missing": [id_ for id_ in ids if id_ not in found]}
+
+
+@router.get("/{kind}/{id_:path}")
+async def api_entity(
+    kind: Kind,
+    id_: str,
+    fields: Fields = None,
+    mdb=Depends(get_mongodb),
+):
+    """One entity, with the requested fields."""
+    docs = await entities(mdb, KINDS[kind], [id_], fields)
+    if not docs:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return docs[0]
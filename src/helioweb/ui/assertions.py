@@ -0,0 +1,135 @@
+"""
+Curators' edge assertions, applied in batches.
+
+A batch of (s, p, o) triples costs a fixed number of round trips whatever its size. One `$in` query
+checks that every subject and object exists with the right type, and reads the subjects' edges.
+Each write is then a single `bulk_write` or `insert_many`. Writes are idempotent: an edge is pushed
+onto its subject's `outgoing` only if the subject has no edge (p, o) yet, so re-submitting adds
+nothing; of two concurrent submissions of a new edge, the one upserting it second reports it as
+existing. Every accepted assertion, new or not, is appended to `edge_provenance` with its submitter.
+"""
+
+from datetime import datetime, timezone
+import re
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from helioweb.infra.edgelog import log_edges
+from helioweb.infra.facets import add_author_concepts
+from helioweb.infra.load import DUPLICATE_KEY
+from helioweb.infra.similar import mark_similar_stale
+from helioweb.ui.cache import touched_by
+
+# predicates curators may assert, with the types of their subjects and objects
+ASSERTABLE = {
+    "dcterms:relation": ("Author", "Concept"),
+    "author": ("Work", "Author"),
+}
+QUALIFIER = 100
+_TRIPLE = re.compile(r"(\S+)\s(\S+)\s(\S+)")
+
+
+def parse_triple(text):
+    """(s, p, o) from "s p o", or None."""
+    m = _TRIPLE.match(text)
+    return m.groups() if m else None
+
+
+def _rejection(triple, docs):
+    s, p, o = triple
+    if p not in ASSERTABLE:
+        return f"predicate {p} cannot be asserted"
+    for id_, type_ in zip((s, o), ASSERTABLE[p]):
+        if docs.get(id_, {}).get("type") != type_:
+            return f"{type_.lower()} {id_} not found"
+    return None
+
+
+async def _upsert_edges(mdb, triples, q2):
+    """Upsert `triples` into `edges`. Returns those a concurrent assertion inserted first."""
+    try:
+        await mdb.edges.bulk_write(
+            [
+                UpdateOne(
+                    {"s": s, "p": p, "o": o},
+                    {"$setOnInsert": {"q": QUALIFIER, "q2": q2}},
+                    upsert=True,
+                )
+                for s, p, o in triples
+            ],
+            ordered=False,
+        )
+    except BulkWriteError as e:
+        # two upserts of an absent edge race, and the unique index rejects the later insert
+        if any(err["code"] != DUPLICATE_KEY for err in e.details["writeErrors"]):
+            raise
+        return [triples[err["index"]] for err in e.details["writeErrors"]]
+    return []
+
+
+async def assert_edges(mdb, triples, submitter):
+    """Assert (s, p, o) `triples` on behalf of the ORCID iD `submitter`.
+
+    Returns {"added": [...], "existing": [...], "rejected": [{"triple", "reason"}]}.
+    """
+    triples = list(dict.fromkeys(tuple(t) for t in triples))
+    ids = {id_ for s, _, o in triples for id_ in (s, o)}
+    docs = {
+        d["_id"]: d
+        for d in await mdb.alldocs.find(
+            {"_id": {"$in": list(ids)}}, ["type", "outgoing.p", "outgoing.o"]
+        ).to_list()
+    }
+    added, existing, rejected = [], [], []
+    for triple in triples:
+        s, p, o = triple
+        if reason := _rejection(triple, docs):
+            rejected.append({"triple": triple, "reason": reason})
+        elif any(e["p"] == p and e["o"] == o for e in docs[s].get("outgoing", [])):
+            existing.append(triple)
+        else:
+            added.append(triple)
+
+    q2 = f"https://orcid.org/{submitter}"
+    if added:
+        await mdb.alldocs.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": s, "outgoing": {"$not": {"$elemMatch": {"p": p, "o": o}}}},
+                    {"$push": {"outgoing": {"p": p, "o": o, "q": QUALIFIER, "q2": q2}}},
+                )
+                for s, p, o in added
+            ],
+            ordered=False,
+        )
+        if raced := await _upsert_edges(mdb, added, q2):
+            added = [t for t in added if t not in raced]
+            existing += raced
+        await log_edges(
+            mdb,
+            [
+                {
+                    "s": s,
+                    "p": p,
+                    "o": o,
+                    "q": QUALIFIER,
+                    "q2": q2,
+                    "touches": touched_by(s, p, o, docs[s]),
+                }
+                for s, p, o in added
+            ],
+        )
+        if relations := [(s, o) for s, p, o in added if p == "dcterms:relation"]:
+            await add_author_concepts(mdb, {o for _, o in relations})
+            await mark_similar_stale(mdb, {s for s, _ in relations})
+    if accepted := added + existing:
+        at = datetime.now(timezone.utc)
+        new = set(added)
+        await mdb.edge_provenance.insert_many(
+            [
+                {"s": s, "p": p, "o": o, "q2": q2, "at": at, "new": (s, p, o) in new}
+                for s, p, o in accepted
+            ]
+        )
+    return {"added": added, "existing": existing, "rejected": rejected}
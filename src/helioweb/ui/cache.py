@@ -0,0 +1,139 @@
+"""
+Rendered entity pages, cached per worker.
+
+A page is cached under its URL and viewer, since pages differ for logged-in users, and is tagged
+with the version of its entity. Asserting an edge logs the IDs of the pages it changes, and each
+worker bumps those entities' versions as it replays the edge log, so a changed page is re-rendered
+on its next view. Responses carry a strong ETag, and a matching `If-None-Match` gets a 304;
+a streamed page is passed through and cached as it completes.
+"""
+
+import asyncio
+from functools import wraps
+import hashlib
+
+from starlette import status
+from starlette.responses import HTMLResponse, Response, StreamingResponse
+
+from helioweb.infra.cache import LRUCache
+from helioweb.infra.config import PAGE_CACHE_MAX_BYTES
+from helioweb.infra.edgelog import LogReader, edge_log_seq
+from helioweb.infra.metrics import named
+from helioweb.infra.versions import bump_versions, current_versions
+
+PAGES = "pages"
+
+_pages = LRUCache(PAGE_CACHE_MAX_BYTES)
+_entity_versions: dict[str, int] = {}
+_log: LogReader | None = None
+_catch_up = asyncio.Lock()
+
+
+def touched_by(s, p, o, subject):
+    """IDs of the entity pages that show the edge (s, p, o) or a list derived from it.
+
+    `subject` is the document `s`, with its `outgoing` edges.
+    """
+    touched = {s, o}
+    if p in ("author", "affil"):
+        # coauthor and collaborator lists of the work's other authors and institutions
+        touched.update(e["o"] for e in subject.get("outgoing", []))
+    return sorted(touched)
+
+
+def _bump_touched(entry):
+    for t in entry.get("touches", (entry["s"], entry["o"])):
+        _entity_versions[t] = _entity_versions.get(t, 0) + 1
+
+
+@named("cache.entity_version")
+async def entity_version(mdb, id_):
+    """The version of the page for entity `id_`, after catching up with the edge log."""
+    global _log
+    if _log is None:
+        # edges logged before this worker's first page are already in the data it reads
+        _log = LogReader(await edge_log_seq(mdb))
+    elif await _log.behind(mdb):
+        async with _catch_up:
+            await _log.catch_up(mdb, _bump_touched)
+    return (await current_versions(mdb)).get(PAGES, 0), _entity_versions.get(id_, 0)
+
+
+async def invalidate_pages(mdb):
+    """Have every worker re-render every page, e.g. after a corpus load."""
+    await bump_versions(mdb, PAGES)
+
+
+def page_cache_stats():
+    return _pages.stats()
+
+
+def _etag(body):
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _if_none_match(request):
+    return {
+        tag.strip().removeprefix("W/")
+        for tag in request.headers.get("if-none-match", "").split(",")
+    }
+
+
+# pages differ by viewer, and the entity routes serve RDF to clients that ask for it
+_HEADERS = {"Cache-Control": "no-cache", "Vary": "Accept, Cookie"}
+
+
+def _streamed(response, key, version):
+    """Pass a streamed page through, and cache it once it is complete.
+
+    Its ETag is not known until then, so it is sent without one; the next view gets one.
+    """
+
+    async def tee():
+        chunks = []
+        async for chunk in response.body_iterator:
+            chunk = chunk if isinstance(chunk, bytes) else chunk.encode()
+            chunks.append(chunk)
+            yield chunk
+        body = b"".join(chunks)
+        _pages.put(key, (version, _etag(body), body), len(body))
+
+    return StreamingResponse(tee(), media_type="text/html", headers=_HEADERS)
+
+
+def cached_page(id_param):
+    """Serve the decorated entity-page endpoint from the page cache.
+
+    The endpoint must take `request`, `mdb` and `user`; `id_param` names its entity-ID parameter.
+    """
+
+    def decorate(endpoint):
+        @wraps(endpoint)
+        async def wrapper(**kwargs):
+            request, mdb, user = kwargs["request"], kwargs["mdb"], kwargs["user"]
+            version = await entity_version(mdb, kwargs[id_param])
+            key = (
+                str(request.base_url),
+                request.url.path,
+                user and (user["orcid"], user["name"]),
+            )
+            entry = _pages.get(key)
+            if entry is None or entry[0] != version:
+                response = await endpoint(**kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                if isinstance(response, StreamingResponse):
+                    return _streamed(response, key, version)
+                entry = (version, _etag(response.body), response.body)
+                _pages.put(key, entry, len(response.body))
+            _, etag, body = entry
+            headers = {"ETag": etag, **_HEADERS}
+            if {etag, "*"} & _if_none_match(request):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+                )
+            return HTMLResponse(body, headers=headers)
+
+        return wrapper
+
+    return decorate
@@ -1,39 +1,103 @@
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import date
 from gettext import gettext, ngettext
 from pathlib import Path
-import re
-from typing import Any, Annotated
+from typing import Any, Annotated, Literal
 from urllib.parse import unquote_plus
 
-from fastapi import FastAPI, Depends, Query, Cookie, Form, HTTPException
+from fastapi import FastAPI, Depends, Query, Form, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-import requests
+from pymongo.errors import PyMongoError
 from starlette import status
 from starlette.requests import Request
-from starlette.responses import HTMLResponse, RedirectResponse, JSONResponse
-from toolz import assoc, merge
+from starlette.responses import (
+    HTMLResponse,
+    RedirectResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 
 from helioweb.infra.config import (
+    CONNECTION_TIMEOUT_MS,
     HTTPS_URLS,
+    INDEX_CHECK_ON_STARTUP,
+    METRICS_ENABLED,
+    MONGO_PING_ON_STARTUP,
     ORCID_CLIENT_ID,
-    ORCID_CLIENT_SECRET,
     ORCID_REDIRECT_URI,
 )
-from helioweb.infra.core import get_mongodb
+from helioweb.infra.autocomplete import autocomplete
+from helioweb.infra.core import (
+    check_mongodb,
+    close_mongodb,
+    connect_mongodb,
+    get_mongodb,
+)
+from helioweb.infra.edges import subject_ids, subjects
+from helioweb.infra.facets import get_facet
+from helioweb.infra.funnel import get_funnel
+from helioweb.infra.indexes import report_index_drift
+from helioweb.infra.metrics import MetricsMiddleware, metrics_exposition
+from helioweb.infra.orcid import (
+    OrcidRejected,
+    OrcidUnavailable,
+    close_http,
+    connect_http,
+    exchange_code,
+)
+from helioweb.infra.search import cached_search, search_cache_stats
+from helioweb.infra.snapshot import snapshot_stats
+from helioweb.infra.typeahead import get_prefix_index
+from helioweb.infra.util import decode_cursor
+from helioweb.ui import api
+from helioweb.ui.assertions import assert_edges, parse_triple
+from helioweb.ui.rdf import linked_data, ntriples_dump, site_base
+from helioweb.ui.render import PageTemplates, render_stats
 from helioweb.ui.util import (
+    get_user,
     raise404_if_none,
     concept_tent,
     institution_tent,
 )
+from helioweb.ui.cache import cached_page, page_cache_stats
+from helioweb.ui.views import (
+    PAGE_SIZE,
+    connection_view,
+    affil_authors,
+    affil_view,
+    affil_works,
+    author_coauthors,
+    author_view,
+    work_view,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect_mongodb()
+    connect_http()
+    if MONGO_PING_ON_STARTUP:
+        await check_mongodb()
+    if INDEX_CHECK_ON_STARTUP:
+        await report_index_drift(get_mongodb())
+    templates.warm()
+    yield
+    await close_http()
+    await close_mongodb()
 
-app = FastAPI(docs_url="/apidocs")
+
+app = FastAPI(docs_url="/apidocs", lifespan=lifespan)
 app.mount(
     "/static",
     StaticFiles(directory=Path(__file__).parent.joinpath("static")),
     name="static",
 )
-templates = Jinja2Templates(directory=Path(__file__).parent.joinpath("templates"))
+app.include_router(api.router)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+templates = PageTemplates(directory=Path(__file__).parent.joinpath("templates"))
 templates.env.globals.update({"GLOBALS_today_year": str(date.today().year)})
 templates.env.globals.update(
     {
@@ -57,20 +121,20 @@ def https_url_for(request: Request, name: str, **path_params: Any):
 templates.env.globals["https_url_for"] = https_url_for
 
 
-async def get_user(
-    user_orcid: Annotated[str | None, Cookie()] = None,
-    user_name: Annotated[str | None, Cookie()] = None,
-    user_id_token: Annotated[str | None, Cookie()] = None,
-):
-    return (
-        {
-            "orcid": user_orcid,
-            "name": user_name,
-            "id_token": user_id_token,
-        }
-        if user_orcid
-        else None
-    )
+# types of the values of each listing's cursor, one per sort key
+SEARCH_CURSOR = ((int, float), str)
+# ADS years are strings, but the loader keeps whatever the dump has
+WORK_LIST_CURSOR = ((int, str, type(None)), (str, type(None)), str)
+NAME_CURSOR = (str, str)
+
+
+def parse_cursor(after, kinds):
+    try:
+        return None if after is None else decode_cursor(after, kinds)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="invalid cursor"
+        )
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -80,18 +144,18 @@ async def read_home(request: Request, user=Depends(get_user)):
 
 @app.get("/orcid_code", response_class=RedirectResponse)
 async def receive_orcid_code(request: Request, code: str, state: str | None = None):
-    rv = requests.post(
-        "https://orcid.org/oauth/token",
-        data=(
-            f"client_id={ORCID_CLIENT_ID}&client_secret={ORCID_CLIENT_SECRET}&"
-            f"grant_type=authorization_code&code={code}&redirect_uri={ORCID_REDIRECT_URI}"
-        ),
-        headers={
-            "Content-type": "application/x-www-form-urlencoded",
-            "Accept": "application/json",
-        },
-    )
-    token_response = rv.json()
+    try:
+        token_response = await exchange_code(code)
+    except OrcidRejected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ORCID did not accept the sign-in; please try again",
+        )
+    except OrcidUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ORCID sign-in is unavailable; please try again later",
+        )
     response = RedirectResponse(state or request.url_for("read_home"))
     for key in ["user_orcid", "user_name", "user_id_token"]:
         response.set_cookie(
@@ -115,6 +179,55 @@ async def logout(request: Request, state: str | None = None):
     return response
 
 
+@app.get("/healthz", response_class=JSONResponse)
+async def healthz():
+    """Readiness probe: 503 until the database answers a ping."""
+    try:
+        await check_mongodb()
+    except PyMongoError as e:
+        return JSONResponse(
+            {"status": "unavailable", "detail": str(e)},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return {"status": "ok"}
+
+
+@app.get("/cache-stats", response_class=JSONResponse)
+async def cache_stats():
+    """This worker's cache sizes and hit/miss counters, and the graph snapshot it maps."""
+    return {
+        "pages": page_cache_stats(),
+        "search": search_cache_stats(),
+        "graph_snapshot": snapshot_stats(),
+    }
+
+
+@app.get("/render-stats", response_class=JSONResponse)
+async def template_render_stats():
+    """This worker's render count and time per template."""
+    return render_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request latency and database work by route, in Prometheus text format, for all workers."""
+    body, content_type = metrics_exposition()
+    return Response(body, headers={"Content-Type": content_type})
+
+
+@app.get("/dump.nt")
+async def dump_ntriples(
+    request: Request,
+    t: Literal["Author", "Concept", "Institution", "Work"] | None = None,
+    mdb=Depends(get_mongodb),
+):
+    """The whole graph (or its documents of type `t`) as N-Triples, streamed."""
+    return StreamingResponse(
+        ntriples_dump(mdb, site_base(request), type_=t),
+        media_type="application/n-triples",
+    )
+
+
 @app.get("/docs", response_class=HTMLResponse)
 async def read_docs(request: Request, user=Depends(get_user)):
     return templates.TemplateResponse("docs.html", {"request": request, "user": user})
@@ -124,37 +237,26 @@ async def read_docs(request: Request, user=Depends(get_user)):
 async def search(
     request: Request,
     q: str = "",
-    t: str | None = None,
+    t: Literal["Author", "Concept", "Institution", "Work"] | None = None,
+    after: str | None = None,
     mdb=Depends(get_mongodb),
     user=Depends(get_user),
 ):
-    filter_ = {"$text": {"$search": q}}
-    if t is not None:
-        filter_ = merge(filter_, {"type": t})
-    results = list(
-        mdb.alldocs.find(
-            filter=filter_,
-            projection={"score": {"$meta": "textScore"}},
-            sort={"score": {"$meta": "textScore"}},
-            limit=50,
-        )
+    found = await cached_search(
+        mdb, q, type_=t, after=parse_cursor(after, SEARCH_CURSOR)
     )
-    for r in results:
-        match r["type"]:
-            case "Author":
-                r["_href"] = "author:" + r["_id"]
-            case "Concept":
-                r["_href"] = "concept:" + r["_id"]
-            case "Institution":
-                r["_href"] = "affil:" + r["_id"]
-            case "Work":
-                r["_href"] = "work:" + r["_id"]
-            case _:
-                r["_href"] = "_:" + r["_id"]
-
     return templates.TemplateResponse(
         "search.html",
-        {"request": request, "q": q, "results": results, "t": t, "user": user},
+        {
+            "request": request,
+            "q": q,
+            "t": t,
+            "results": found["results"],
+            "counts": found["counts"],
+            "total": found["total"],
+            "next": found["next"],
+            "user": user,
+        },
     )
 
 
@@ -182,56 +284,27 @@ async def funnel_authors(
         or any(qarg_values["institution"])
         or any(qarg_values["coauthor"])
     ):
-        authors_with_concepts_filter = {"type": "Author"}
-        if any(qarg_values["concept"]):
-            tent = concept_tent(qarg_values["concept"], mdb=mdb)
-            authors_with_concepts_filter["outgoing.o"] = {"$in": tent}
-        author_ids_from_concepts = [
-            d["_id"] for d in mdb.alldocs.find(authors_with_concepts_filter)
-        ]
-        works_with_authors_filter = {"type": "Work", "outgoing.p": "author"}
-        if any(qarg_values["institution"]):
-            tent = institution_tent(qarg_values["institution"], mdb=mdb)
-            works_with_authors_filter["outgoing.o"] = {"$in": tent}
-        if any(qarg_values["coauthor"]):
-            works_with_authors_filter["outgoing"] = {
-                "$all": [
-                    {"$elemMatch": {"p": "author", "o": a}}
-                    for a in filter(None, qarg_values["coauthor"])
-                ]
-            }
-        author_ids_from_institutions_and_coauthors = [
-            d["_id"]
-            for d in mdb.alldocs.aggregate(
-                [
-                    {"$match": works_with_authors_filter},
-                    {"$project": {"_id": 0, "outgoing": 1}},
-                    {"$unwind": {"path": "$outgoing"}},
-                    {"$match": {"outgoing.p": "author"}},
-                    {"$project": {"_id": "$outgoing.o"}},
-                    {"$group": {"_id": "$_id"}},
-                ],
-                allowDiskUse=True,
-            )
-        ]
-
-        author_ids = list(
-            set(author_ids_from_concepts)
-            & set(author_ids_from_institutions_and_coauthors)
+        concepts_tent, institutions_tent, funnel = await asyncio.gather(
+            concept_tent(qarg_values["concept"], mdb=mdb),
+            institution_tent(qarg_values["institution"], mdb=mdb),
+            get_funnel(mdb),
         )
-        n_authors = len(author_ids)
-        authors = mdb.alldocs.find(
-            filter={"_id": {"$in": author_ids}},
-            projection=["display_name"],
-            sort=[("display_name", 1)],
+        n_authors, authors = funnel.query(
+            concepts=concepts_tent if any(qarg_values["concept"]) else None,
+            institutions=(
+                institutions_tent if any(qarg_values["institution"]) else None
+            ),
+            coauthors=list(filter(None, qarg_values["coauthor"])),
             limit=50,
         )
     else:
-        n_authors = mdb.alldocs.count_documents({"type": "Author"})
+        n_authors = len(await get_facet(mdb, "authors"))
         authors = []
-    all_author_concepts = list(mdb.all_author_concepts.find())
-    all_work_institutions = list(mdb.all_work_institutions.find())
-    all_authors = list(mdb.alldocs.find({"type": "Author"}, ["display_name"]))
+    concept_labels, institution_labels, coauthor_labels = await asyncio.gather(
+        typeahead_labels(mdb, "concepts", qarg_values["concept"]),
+        typeahead_labels(mdb, "institutions", qarg_values["institution"]),
+        typeahead_labels(mdb, "authors", qarg_values["coauthor"]),
+    )
     qarg_counts = {
         qarg: [i for i in qarg_values[qarg] if i]
         for qarg in ["concept", "institution", "coauthor"]
@@ -246,14 +319,87 @@ async def funnel_authors(
             "institutions": tuple(qarg_values["institution"]),
             "coauthors": tuple(qarg_values["coauthor"]),
             "qarg_counts": qarg_counts,
-            "all_author_concepts": all_author_concepts,
-            "all_work_institutions": all_work_institutions,
-            "all_authors": all_authors,
+            "concept_labels": concept_labels,
+            "institution_labels": institution_labels,
+            "coauthor_labels": coauthor_labels,
+            "user": user,
+        },
+    )
+
+
+@app.get("/connection", response_class=HTMLResponse)
+async def connection(
+    request: Request,
+    source: str | None = None,
+    target: str | None = None,
+    max_depth: Annotated[int, Query(ge=1, le=10)] = 6,
+    mdb=Depends(get_mongodb),
+    user=Depends(get_user),
+):
+    found = None
+    if source and target:
+        found = await connection_view(
+            mdb, source, target, max_depth, CONNECTION_TIMEOUT_MS / 1000
+        )
+    labels = await typeahead_labels(mdb, "authors", [source, target])
+    return templates.TemplateResponse(
+        "connection.html",
+        {
+            "request": request,
+            "source": source,
+            "target": target,
+            "source_label": labels.get(source, ""),
+            "target_label": labels.get(target, ""),
+            "max_depth": max_depth,
+            "connection": found,
             "user": user,
         },
     )
 
 
+# the unversioned path predates /api/v1, and is served by the same endpoint
+app.add_api_route("/api/connection", api.api_connection, include_in_schema=False)
+
+
+def typeahead_label(kind, id_, name):
+    if kind == "authors":
+        return f'{name} ({id_.replace("https://orcid.org/", "orcid:")})'
+    return name
+
+
+async def typeahead_labels(mdb, kind, ids):
+    """Labels for the selected `ids` that a page pre-fills into its typeahead inputs."""
+    index = await get_prefix_index(mdb, kind)
+    return {
+        id_: typeahead_label(kind, id_, index.by_id[id_])
+        for id_ in ids
+        if id_ in index.by_id
+    }
+
+
+@app.get("/typeahead/{kind}", response_class=JSONResponse)
+async def typeahead(
+    kind: Literal["authors", "concepts", "institutions"],
+    q: str = "",
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    exclude_concept: str | None = None,
+    mdb=Depends(get_mongodb),
+):
+    index = await get_prefix_index(mdb, kind)
+    exclude = frozenset()
+    if kind == "authors" and exclude_concept:
+        exclude = (await get_funnel(mdb)).concept_author_ids(exclude_concept)
+    items, more = index.search(q, offset=offset, limit=limit, exclude=exclude)
+    return {
+        "items": [
+            {"id": id_, "value": typeahead_label(kind, id_, name)}
+            for id_, name in items
+        ],
+        "next": offset + limit if more else None,
+    }
+
+
 @app.post("/connectable-works", response_class=JSONResponse)
 async def connectable_works(
     author_id: str,
@@ -263,19 +409,11 @@ async def connectable_works(
     if not authored_work:
         return []
 
-    all_works_author_complement = list(
-        mdb.alldocs.find(
-            {
-                "type": "Work",
-                "display_name": {
-                    "$regex": unquote_plus_and_escape_parens(authored_work),
-                    "$options": "i",
-                },
-                "outgoing": {"$not": {"$elemMatch": {"p": "author", "o": author_id}}},
-            },
-            ["display_name", "ads_work.year", "ads_work.bibcode"],
-            limit=25,
-        )
+    all_works_author_complement = await autocomplete(
+        mdb,
+        "Work",
+        authored_work,
+        {"outgoing": {"$not": {"$elemMatch": {"p": "author", "o": author_id}}}},
     )
     return [
         {
@@ -286,11 +424,6 @@ async def connectable_works(
     ]
 
 
-def unquote_plus_and_escape_parens(s):
-    """For use of `s` in a regex."""
-    return unquote_plus(s).replace("(", "\\(").replace(")", "\\)")
-
-
 @app.post("/connectable-concepts", response_class=JSONResponse)
 async def connectable_concepts(
     author_id: str,
@@ -300,29 +433,14 @@ async def connectable_concepts(
     if not associated_concept:
         return []
 
-    author = raise404_if_none(mdb.alldocs.find_one({"_id": author_id}, ["outgoing"]))
-    author_concepts = list(
-        mdb.alldocs.find(
-            {
-                "type": "Concept",
-                "_id": {"$in": [edge["o"] for edge in author["outgoing"]]},
-            },
-            ["_id"],
-        )
+    author = raise404_if_none(
+        await mdb.alldocs.find_one({"_id": author_id}, ["outgoing"])
     )
-    all_concepts_author_complement = list(
-        mdb.alldocs.find(
-            {
-                "type": "Concept",
-                "display_name": {
-                    "$regex": unquote_plus_and_escape_parens(associated_concept),
-                    "$options": "i",
-                },
-                "_id": {"$nin": [c["_id"] for c in author_concepts]},
-            },
-            ["display_name"],
-            limit=25,
-        )
+    all_concepts_author_complement = await autocomplete(
+        mdb,
+        "Concept",
+        associated_concept,
+        {"_id": {"$nin": [edge["o"] for edge in author.get("outgoing", [])]}},
     )
     return [
         {
@@ -334,110 +452,21 @@ async def connectable_concepts(
 
 
 @app.get("/author:{orcid:path}", response_class=HTMLResponse)
+@linked_data("orcid")
+@cached_page("orcid")
 async def author_home(
     request: Request, orcid: str, mdb=Depends(get_mongodb), user=Depends(get_user)
 ):
-    author = raise404_if_none(mdb.alldocs.find_one({"_id": orcid}))
-    author_concepts = list(
-        mdb.alldocs.find(
-            {
-                "type": "Concept",
-                "_id": {"$in": [edge["o"] for edge in author["outgoing"]]},
-            }
-        )
-    )
-    author_concept_links = {
-        edge["o"]: edge
-        for edge in author["outgoing"]
-        if edge["p"] == "dcterms:relation"
-    }
-    for c in author_concepts:
-        if submitter := author_concept_links[c["_id"]].get("q2"):
-            c["_submitter"] = submitter
-    author_concepts = sorted(
-        author_concepts,
-        key=lambda concept: (
-            next(edge for edge in author["outgoing"] if edge["o"] == concept["_id"])[
-                "q"
-            ],
-            concept["display_name"],
-        ),
-        reverse=True,
-    )
-    author_works = list(mdb.alldocs.find({"type": "Work", "outgoing.o": author["_id"]}))
-    work_author_links = {
-        w["_id"]: edge
-        for w in author_works
-        for edge in w["outgoing"]
-        if edge["p"] == "author"
-    }
-    author_works = sorted(
-        author_works,
-        key=lambda work: (work["ads_work"]["year"], work["display_name"]),
-        reverse=True,
-    )
-    for w in author_works:
-        if submitter := work_author_links[w["_id"]].get("q2"):
-            w["_submitter"] = submitter
-    author_coauthors = list(
-        mdb.alldocs.aggregate(
-            [
-                {"$match": {"type": "Work", "outgoing.o": author["_id"]}},
-                {"$project": {"outgoing": 1}},
-                {"$unwind": {"path": "$outgoing"}},
-                {"$match": {"outgoing.p": "author"}},
-                {"$project": {"_id": "$outgoing.o"}},
-                {"$group": {"_id": "$_id"}},
-                {
-                    "$lookup": {
-                        "from": "alldocs",
-                        "localField": "_id",
-                        "foreignField": "_id",
-                        "as": "author",
-                    }
-                },
-                {"$match": {"author._id": {"$exists": True, "$ne": author["_id"]}}},
-                {"$project": {"display_name": {"$first": "$author.display_name"}}},
-                {"$sort": {"display_name": 1}},
-            ],
-            allowDiskUse=True,
-        )
-    )
-    author_collaborating_institutions = list(
-        mdb.alldocs.aggregate(
-            [
-                {"$match": {"type": "Work", "outgoing.o": author["_id"]}},
-                {"$project": {"outgoing": 1}},
-                {"$unwind": {"path": "$outgoing"}},
-                {"$match": {"outgoing.p": "affil"}},
-                {"$project": {"_id": "$outgoing.o"}},
-                {"$group": {"_id": "$_id"}},
-                {
-                    "$lookup": {
-                        "from": "alldocs",
-                        "localField": "_id",
-                        "foreignField": "_id",
-                        "as": "institution",
-                    }
-                },
-                {"$match": {"institution._id": {"$exists": True}}},
-                {"$project": {"display_name": {"$first": "$institution.display_name"}}},
-                {"$sort": {"display_name": 1}},
-            ],
-            allowDiskUse=True,
-        )
-    )
+    author = raise404_if_none(await mdb.alldocs.find_one({"_id": orcid}))
+    view = await author_view(mdb, author)
     author_oax_api_link = oax_api_link_for(author.get("oax_author", {}).get("id", ""))
     return templates.TemplateResponse(
         "author.html",
         {
             "request": request,
             "author": author,
-            "author_coauthors": author_coauthors,
-            "author_collaborating_institutions": author_collaborating_institutions,
+            **view,
             "author_oax_api_link": author_oax_api_link,
-            "author_concepts": author_concepts,
-            "author_works": author_works,
             "user": user,
             "all_works_author_complement": [],
             "all_concepts_author_complement": [],
@@ -445,6 +474,15 @@ async def author_home(
     )
 
 
+async def assert_edge(mdb, s, p, o, submitter):
+    result = await assert_edges(mdb, [(s, p, o)], submitter)
+    if result["rejected"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=result["rejected"][0]["reason"],
+        )
+
+
 @app.post("/author:{author_id:path}", response_class=RedirectResponse)
 async def add_edge_to_author(
     request: Request,
@@ -457,62 +495,29 @@ async def add_edge_to_author(
     if not user:
         return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-    raise404_if_none(mdb.alldocs.find_one({"_id": author_id}, ["_id"]))
     if associated_concept_id:
-        if m := re.match(r"(\S+)\s(\S+)\s(\S+)", unquote_plus(associated_concept_id)):
-            s, p, o = m.groups()
+        if triple := parse_triple(unquote_plus(associated_concept_id)):
+            s, p, o = triple
             if s != author_id or p not in ("dcterms:relation",):
                 return HTTPException(
                     status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                     detail="unacceptable author association",
                 )
-            raise404_if_none(
-                mdb.alldocs.find_one({"_id": o}, ["_id"]),
-                detail=f"concept {o} not found",
-            )
-            mdb.alldocs.update_one(
-                {"_id": s},
-                {
-                    "$push": {
-                        "outgoing": {
-                            "p": p,
-                            "o": o,
-                            "q": 100,
-                            "q2": f'https://orcid.org/{user["orcid"]}',
-                        }
-                    }
-                },
-            )
+            await assert_edge(mdb, s, p, o, submitter=user["orcid"])
         else:
             return HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail="concept association not properly formatted",
             )
     elif authored_work_id:
-        if m := re.match(r"(\S+)\s(\S+)\s(\S+)", unquote_plus(authored_work_id)):
-            s, p, o = m.groups()
+        if triple := parse_triple(unquote_plus(authored_work_id)):
+            s, p, o = triple
             if o != author_id or p not in ("author",):
                 return HTTPException(
                     status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                     detail="unacceptable author association",
                 )
-            raise404_if_none(
-                mdb.alldocs.find_one({"_id": s}, ["_id"]),
-                detail=f"work {s} not found",
-            )
-            mdb.alldocs.update_one(
-                {"_id": s},
-                {
-                    "$push": {
-                        "outgoing": {
-                            "p": p,
-                            "o": o,
-                            "q": 100,
-                            "q2": f'https://orcid.org/{user["orcid"]}',
-                        }
-                    }
-                },
-            )
+            await assert_edge(mdb, s, p, o, submitter=user["orcid"])
         else:
             return HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -530,201 +535,138 @@ async def add_edge_to_author(
 
 
 @app.get("/work:{work_id:path}", response_class=HTMLResponse)
+@linked_data("work_id")
+@cached_page("work_id")
 async def work_home(
     request: Request, work_id: str, mdb=Depends(get_mongodb), user=Depends(get_user)
 ):
-    work = raise404_if_none(mdb.alldocs.find_one({"_id": work_id}))
-    work_authors = sorted(
-        list(
-            assoc(
-                doc, "q", next(w["q"] for w in work["outgoing"] if w["o"] == doc["_id"])
-            )
-            for doc in mdb.alldocs.find(
-                {
-                    "type": "Author",
-                    "_id": {
-                        "$in": [w["o"] for w in work["outgoing"] if w["p"] == "author"]
-                    },
-                }
-            )
-        ),
-        key=lambda author: author["display_name"],
-    )
-    work_affils = sorted(
-        list(
-            mdb.alldocs.find(
-                {
-                    "type": "Institution",
-                    "_id": {
-                        "$in": [w["o"] for w in work["outgoing"] if w["p"] == "affil"]
-                    },
-                }
-            )
-        ),
-        key=lambda affil: affil["display_name"],
-    )
+    work = raise404_if_none(await mdb.alldocs.find_one({"_id": work_id}))
+    view = await work_view(mdb, work)
     return templates.TemplateResponse(
         "work.html",
         {
             "request": request,
             "work": work,
-            "work_authors": work_authors,
-            "work_affils": work_affils,
+            **view,
             "user": user,
         },
     )
 
 
 @app.get("/affil:{affil_id:path}", response_class=HTMLResponse)
+@linked_data("affil_id")
+@cached_page("affil_id")
 async def affil_home(
     request: Request, affil_id: str, mdb=Depends(get_mongodb), user=Depends(get_user)
 ):
-    affil = raise404_if_none(mdb.alldocs.find_one({"_id": affil_id}))
-    if affil.get("outgoing"):
-        affil_parents = sorted(
-            list(
-                mdb.alldocs.find(
-                    {
-                        "type": "Institution",
-                        "_id": {
-                            "$in": [
-                                a["o"]
-                                for a in affil["outgoing"]
-                                if a["p"] == "skos:broader"
-                            ]
-                        },
-                    }
-                )
-            ),
-            key=lambda affil: affil["display_name"],
-        )
-    else:
-        affil_parents = []
-    affil_children = sorted(
-        list(
-            mdb.alldocs.find(
-                {
-                    "type": "Institution",
-                    "outgoing": {
-                        "$elemMatch": {"p": "skos:broader", "o": affil["_id"]}
-                    },
-                }
-            )
-        ),
-        key=lambda affil: affil["display_name"],
-    )
-    affil_works = sorted(
-        list(mdb.alldocs.find({"type": "Work", "outgoing.o": affil["_id"]})),
-        key=lambda work: (work["ads_work"]["year"], work["display_name"] or ""),
-    )
-    affil_collaborating_authors = list(
-        mdb.alldocs.aggregate(
-            [
-                {"$match": {"type": "Work", "outgoing.o": affil["_id"]}},
-                {"$project": {"outgoing": 1}},
-                {"$unwind": {"path": "$outgoing"}},
-                {"$match": {"outgoing.p": "author"}},
-                {"$project": {"_id": "$outgoing.o"}},
-                {"$group": {"_id": "$_id"}},
-                {
-                    "$lookup": {
-                        "from": "alldocs",
-                        "localField": "_id",
-                        "foreignField": "_id",
-                        "as": "author",
-                    }
-                },
-                {"$match": {"author._id": {"$exists": True}}},
-                {"$project": {"display_name": {"$first": "$author.display_name"}}},
-                {"$sort": {"display_name": 1}},
-            ],
-            allowDiskUse=True,
-        )
-    )
+    affil = raise404_if_none(await mdb.alldocs.find_one({"_id": affil_id}))
+    view = await affil_view(mdb, affil)
     affil_ads_id = affil["_id"].split("/")[-1]
     return templates.TemplateResponse(
         "affil.html",
         {
             "request": request,
             "affil": affil,
-            "affil_collaborating_authors": affil_collaborating_authors,
+            **view,
             "affil_ads_id": affil_ads_id,
-            "affil_parents": affil_parents,
-            "affil_children": affil_children,
-            "affil_works": affil_works,
             "user": user,
         },
     )
 
 
+def list_page_response(request, page, kind, more_url):
+    """An htmx "load more" fragment, or the page as JSON for other clients."""
+    if request.headers.get("HX-Request"):
+        return templates.TemplateResponse(
+            "list_page.html",
+            {"request": request, "page": page, "kind": kind, "more_url": more_url},
+        )
+    return JSONResponse(page)
+
+
+@app.get("/affil-works:{affil_id:path}")
+async def affil_works_page(
+    request: Request,
+    affil_id: str,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=500)] = PAGE_SIZE,
+    mdb=Depends(get_mongodb),
+):
+    page = await affil_works(
+        mdb, affil_id, after=parse_cursor(after, WORK_LIST_CURSOR), limit=limit
+    )
+    return list_page_response(request, page, "work", f"/affil-works:{affil_id}")
+
+
+@app.get("/affil-authors:{affil_id:path}")
+async def affil_authors_page(
+    request: Request,
+    affil_id: str,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=500)] = PAGE_SIZE,
+    mdb=Depends(get_mongodb),
+):
+    page = await affil_authors(
+        mdb, affil_id, after=parse_cursor(after, NAME_CURSOR), limit=limit
+    )
+    return list_page_response(request, page, "author", f"/affil-authors:{affil_id}")
+
+
+@app.get("/author-coauthors:{orcid:path}")
+async def author_coauthors_page(
+    request: Request,
+    orcid: str,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=500)] = PAGE_SIZE,
+    mdb=Depends(get_mongodb),
+):
+    page = await author_coauthors(
+        mdb, orcid, after=parse_cursor(after, NAME_CURSOR), limit=limit
+    )
+    return list_page_response(request, page, "author", f"/author-coauthors:{orcid}")
+
+
 @app.get("/concept:{concept_id:path}", response_class=HTMLResponse)
+@linked_data("concept_id")
+@cached_page("concept_id")
 async def concept_home(
     request: Request, concept_id: str, mdb=Depends(get_mongodb), user=Depends(get_user)
 ):
-    concept = raise404_if_none(mdb.alldocs.find_one({"_id": concept_id}))
-    if concept.get("outgoing"):
-        concept_parents = sorted(
-            list(
-                mdb.alldocs.find(
-                    {
-                        "type": "Concept",
-                        "_id": {
-                            "$in": [
-                                c["o"]
-                                for c in concept["outgoing"]
-                                if c["p"] == "skos:broader"
-                            ]
-                        },
-                    }
-                )
-            ),
-            key=lambda concept: concept["display_name"],
-        )
-    else:
-        concept_parents = []
-    concept_children = sorted(
-        list(
-            mdb.alldocs.find(
-                {
-                    "type": "Concept",
-                    "outgoing": {
-                        "$elemMatch": {"p": "skos:broader", "o": concept["_id"]}
-                    },
-                }
-            )
-        ),
-        key=lambda concept: concept["display_name"],
+    concept = raise404_if_none(await mdb.alldocs.find_one({"_id": concept_id}))
+    child_ids, author_links = await asyncio.gather(
+        subject_ids(mdb, concept_id, ["skos:broader"]),
+        subjects(mdb, "dcterms:relation", concept_id),
     )
-    concept_authors = sorted(
-        list(
-            mdb.alldocs.find(
-                {
-                    "type": "Author",
-                    "outgoing": {
-                        "$elemMatch": {"p": "dcterms:relation", "o": concept_id}
-                    },
-                }
-            )
-        ),
-        key=lambda author: author["display_name"],
-    )
-    for a in concept_authors:
-        if submitter := next(
-            (edge for edge in a["outgoing"] if edge["o"] == concept_id)
-        ).get("q2"):
-            a["_submitter"] = submitter
-    concept_oax_api_link = oax_api_link_for(concept["_id"])
-    all_eligible_authors = list(
+    author_links = {e["s"]: e for e in author_links}
+    (concept_parents, concept_children, concept_authors,) = await asyncio.gather(
         mdb.alldocs.find(
             {
-                "type": "Author",
-                "outgoing": {
-                    "$not": {"$elemMatch": {"p": "dcterms:relation", "o": concept_id}}
+                "type": "Concept",
+                "_id": {
+                    "$in": [
+                        c["o"]
+                        for c in concept.get("outgoing", [])
+                        if c["p"] == "skos:broader"
+                    ]
                 },
-            },
-            ["display_name"],
-        )
+            }
+        ).to_list(),
+        mdb.alldocs.find({"type": "Concept", "_id": {"$in": child_ids}}).to_list(),
+        mdb.alldocs.find(
+            {"type": "Author", "_id": {"$in": list(author_links)}}
+        ).to_list(),
+    )
+    concept_parents = sorted(
+        concept_parents, key=lambda concept: concept["display_name"]
     )
+    concept_children = sorted(
+        concept_children, key=lambda concept: concept["display_name"]
+    )
+    concept_authors = sorted(concept_authors, key=lambda author: author["display_name"])
+    for a in concept_authors:
+        if submitter := author_links[a["_id"]].get("q2"):
+            a["_submitter"] = submitter
+    concept_oax_api_link = oax_api_link_for(concept["_id"])
     return templates.TemplateResponse(
         "concept.html",
         {
@@ -735,8 +677,6 @@ async def concept_home(
             "concept_children": concept_children,
             "concept_authors": concept_authors,
             "user": user,
-            "all_author_concepts": list(mdb.all_author_concepts.find()),
-            "all_eligible_authors": all_eligible_authors,
         },
     )
 
@@ -752,32 +692,15 @@ async def add_edge_to_concept(
     if not user:
         return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-    raise404_if_none(mdb.alldocs.find_one({"_id": concept_id}, ["_id"]))
     if associated_author:
-        if m := re.match(r"(\S+)\s(\S+)\s(\S+)", associated_author):
-            s, p, o = m.groups()
+        if triple := parse_triple(associated_author):
+            s, p, o = triple
             if o != concept_id or p not in ("dcterms:relation",):
                 return HTTPException(
                     status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                     detail="unacceptable author association",
                 )
-            raise404_if_none(
-                mdb.alldocs.find_one({"_id": s}, ["_id"]),
-                detail=f"author {s} not found",
-            )
-            mdb.alldocs.update_one(
-                {"_id": s},
-                {
-                    "$push": {
-                        "outgoing": {
-                            "p": p,
-                            "o": o,
-                            "q": 100,
-                            "q2": f'https://orcid.org/{user["orcid"]}',
-                        }
-                    }
-                },
-            )
+            await assert_edge(mdb, s, p, o, submitter=user["orcid"])
         else:
             return HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
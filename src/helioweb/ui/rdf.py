@@ -0,0 +1,78 @@
+"""
+Linked Data views of the entity pages, and a streamed N-Triples dump of the whole graph.
+
+An entity route decorated with `linked_data` answers a request whose `Accept` prefers Turtle,
+N-Triples or JSON-LD to HTML with the entity's description: its type, label, outgoing edges and
+the edges linking to it. Other requests reach the page as before.
+"""
+
+from functools import wraps
+
+from starlette.responses import Response
+
+from helioweb.infra.config import HTTPS_URLS
+from helioweb.infra.linkeddata import (
+    MEDIA_TYPES,
+    Minter,
+    negotiate,
+    ntriples,
+    serialize,
+)
+from helioweb.ui.util import raise404_if_none
+
+_FIELDS = ["type", "display_name", "outgoing", "ads_work.year"]
+
+
+def site_base(request):
+    base = request.base_url
+    return str(base.replace(scheme="https") if HTTPS_URLS else base)
+
+
+async def entity_triples(mdb, minter, id_):
+    doc = raise404_if_none(await mdb.alldocs.find_one({"_id": id_}, _FIELDS))
+    incoming = await mdb.edges.find({"o": id_}, ["s", "p"]).to_list()
+    return [*minter.outgoing(doc), *minter.incoming(doc, incoming)]
+
+
+def linked_data(id_param):
+    """Serve the decorated entity-page endpoint as RDF when the request asks for it.
+
+    The endpoint must take `request` and `mdb`; `id_param` names its entity-ID parameter.
+    """
+
+    def decorate(endpoint):
+        @wraps(endpoint)
+        async def wrapper(**kwargs):
+            request = kwargs["request"]
+            media_type = negotiate(request.headers.get("accept", ""))
+            if media_type is None:
+                return await endpoint(**kwargs)
+            minter = Minter(site_base(request))
+            triples = await entity_triples(kwargs["mdb"], minter, kwargs[id_param])
+            return Response(
+                serialize(triples, MEDIA_TYPES[media_type], vocab=minter.vocab),
+                media_type=media_type,
+                headers={"Vary": "Accept, Cookie"},
+            )
+
+        return wrapper
+
+    return decorate
+
+
+async def ntriples_dump(mdb, base, type_=None, batch_size=1000):
+    """Yield the graph as N-Triples, a batch of documents at a time.
+
+    Every edge is some document's outgoing edge, so one pass over `alldocs` covers the graph.
+    """
+    minter = Minter(base)
+    lines = []
+    async for doc in mdb.alldocs.find(
+        {"type": type_} if type_ else {}, _FIELDS, batch_size=batch_size
+    ):
+        lines.extend(ntriples(minter.outgoing(doc)))
+        if len(lines) >= 10 * batch_size:
+            yield "".join(lines).encode()
+            lines = []
+    if lines:
+        yield "".join(lines).encode()
@@ -0,0 +1,107 @@
+"""
+Page templates, with optional streaming, a persistent bytecode cache, and render timings.
+
+With TEMPLATE_STREAMING set, a page is sent as Jinja's async generator yields it, so long lists
+reach the browser while they render instead of after. With TEMPLATE_BYTECODE_CACHE_DIR set,
+compiled templates are kept there, so a new worker loads rather than recompiles them.
+
+Render time is recorded per template: for a streamed page, only the time spent producing its
+chunks counts, not the time spent sending them.
+"""
+
+import os
+import time
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from starlette.responses import StreamingResponse
+
+from helioweb.infra.config import TEMPLATE_BYTECODE_CACHE_DIR, TEMPLATE_STREAMING
+
+_timings: dict[str, dict] = {}
+
+
+def _record(name, seconds):
+    t = _timings.setdefault(name, {"renders": 0, "seconds": 0.0, "max_seconds": 0.0})
+    t["renders"] += 1
+    t["seconds"] += seconds
+    t["max_seconds"] = max(t["max_seconds"], seconds)
+
+
+def render_stats():
+    """This worker's render count, total and worst time per template, costliest first."""
+    return dict(
+        sorted(_timings.items(), key=lambda item: item[1]["seconds"], reverse=True)
+    )
+
+
+class PageTemplates(Jinja2Templates):
+    def __init__(self, directory):
+        # a streaming environment compiles templates to async code, which cannot render
+        # synchronously, so it serves every page by streaming
+        super().__init__(directory=directory, enable_async=TEMPLATE_STREAMING)
+        if TEMPLATE_BYTECODE_CACHE_DIR:
+            # bytecode is keyed by template source only, so keep the two kinds apart
+            cache_dir = os.path.join(
+                TEMPLATE_BYTECODE_CACHE_DIR, "async" if TEMPLATE_STREAMING else "sync"
+            )
+            os.makedirs(cache_dir, exist_ok=True)
+            self.env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    def warm(self):
+        """Compile (or load from the bytecode cache) every template."""
+        for name in self.env.list_templates(extensions=["html"]):
+            self.env.get_template(name)
+
+    def TemplateResponse(
+        self,
+        name,
+        context,
+        status_code=200,
+        headers=None,
+        media_type=None,
+        background=None,
+    ):
+        if TEMPLATE_STREAMING:
+            return self._stream(name, context, status_code, headers, background)
+        started = time.perf_counter()
+        try:
+            return super().TemplateResponse(
+                context["request"],
+                name,
+                context,
+                status_code=status_code,
+                headers=headers,
+                media_type=media_type,
+                background=background,
+            )
+        finally:
+            _record(name, time.perf_counter() - started)
+
+    def _stream(self, name, context, status_code, headers, background):
+        template = self.get_template(name)
+
+        async def chunks():
+            spent = 0.0
+            generator = template.generate_async(context)
+            try:
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        chunk = await generator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        spent += time.perf_counter() - started
+                    yield chunk
+            finally:
+                await generator.aclose()
+                _record(name, spent)
+
+        return StreamingResponse(
+            chunks(),
+            status_code=status_code,
+            headers=headers,
+            media_type="text/html",
+            background=background,
+        )
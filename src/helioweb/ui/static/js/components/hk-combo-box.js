@@ -11,10 +11,17 @@ customElements.define('hk-combo-box', class extends HTMLElement {
 
 		// Set base properties
 		this.endpoint = this.getAttribute('endpoint');
+		this.method = (this.getAttribute('method') || 'post').toLowerCase();
 		this.input = this.querySelector('input');
 		let delay = this.getAttribute('delay');
 		this.delay = delay ? parseFloat(delay) : 500;
 		this.debounce = null;
+		this.data = [];
+
+		// The hidden field submits the selected ID, formatted by [field-format] (e.g. into a triple)
+		this.fieldName = this.getAttribute('field-name') || `${this.input.name}_id`;
+		this.fieldFormat = this.getAttribute('field-format') || '{id}';
+		this.fieldValue = this.getAttribute('field-value') || '';
 
 		// Render UI
 		this.init();
@@ -33,7 +40,8 @@ customElements.define('hk-combo-box', class extends HTMLElement {
 		// Create hidden field with ID
 		this.field = document.createElement('input');
 		this.field.type = 'hidden';
-		this.field.name = `${this.input.name}_id`;
+		this.field.name = this.fieldName;
+		this.field.value = this.fieldValue;
 
 		// Create hidden note
 		let note = document.createElement('div');
@@ -68,6 +76,7 @@ customElements.define('hk-combo-box', class extends HTMLElement {
 	 */
 	oninput (event) {
 		clearTimeout(this.debounce);
+		if (this.select()) return;
 		this.debounce = setTimeout(() => {
 			this.updateDatalist();
 		}, this.delay);
@@ -81,20 +90,29 @@ customElements.define('hk-combo-box', class extends HTMLElement {
 		try {
 
 			// Query the API
-			let response = await fetch(this.endpoint, {
-				method: 'POST',
-				headers: {
-					'Content-type': 'application/x-www-form-urlencoded',
-					'Hk-Combo-Box': true
-				},
-				body: new URLSearchParams([[this.input.name, this.input.value]]).toString()
-			});
+			let response;
+			if (this.method === 'get') {
+				let separator = this.endpoint.includes('?') ? '&' : '?';
+				response = await fetch(this.endpoint + separator + new URLSearchParams([['q', this.input.value]]).toString(), {
+					headers: {'Hk-Combo-Box': true}
+				});
+			} else {
+				response = await fetch(this.endpoint, {
+					method: 'POST',
+					headers: {
+						'Content-type': 'application/x-www-form-urlencoded',
+						'Hk-Combo-Box': true
+					},
+					body: new URLSearchParams([[this.input.name, this.input.value]]).toString()
+				});
+			}
 
 			// If the response is bad, throw error
 			if (!response.ok) throw response;
 
-			// Otherwise, get response
+			// Otherwise, get response (a list, or a page of {items, next})
 			let data = await response.json();
+			if (!Array.isArray(data)) data = data.items;
 
 			// Render
 			this.renderDatalist(data);
@@ -111,6 +129,8 @@ customElements.define('hk-combo-box', class extends HTMLElement {
 	 */
 	renderDatalist (data) {
 
+		this.data = data;
+
 		// Render datalist content
 		this.datalist.innerHTML =
 			data.map(function (item) {
@@ -118,10 +138,7 @@ customElements.define('hk-combo-box', class extends HTMLElement {
 			}).join('');
 
 		// If selected text matches valid option, set ID field
-		let selected = data.find((item) => item.value === this.input.value);
-		if (selected) {
-			this.field.value = selected.id;
-		}
+		this.select();
 
 		// Set [pattern] attribute for validation
 		let pattern = data.map((item) => item.value.replace('(', '\\(').replace(')','\\)')).join('|');
@@ -129,4 +146,18 @@ customElements.define('hk-combo-box', class extends HTMLElement {
 
 	}
 
+	/**
+	 * Set the ID field from the option matching the input text, if any
+	 * @return {Boolean} Whether an option matched
+	 */
+	select () {
+		let selected = this.data.find((item) => item.value === this.input.value);
+		if (selected) {
+			this.field.value = this.fieldFormat.replace('{id}', selected.id);
+		} else {
+			this.field.value = '';
+		}
+		return !!selected;
+	}
+
 });
\ No newline at end of file
@@ -1,6 +1,26 @@
-from fastapi import HTTPException
+from typing import Annotated
+
+from fastapi import Cookie, HTTPException
 from starlette import status
-from toolz import unique, concat
+
+from helioweb.infra.hierarchy import get_hierarchy
+from helioweb.infra.snapshot import get_graph
+
+
+async def get_user(
+    user_orcid: Annotated[str | None, Cookie()] = None,
+    user_name: Annotated[str | None, Cookie()] = None,
+    user_id_token: Annotated[str | None, Cookie()] = None,
+):
+    return (
+        {
+            "orcid": user_orcid,
+            "name": user_name,
+            "id_token": user_id_token,
+        }
+        if user_orcid
+        else None
+    )
 
 
 def raise404_if_none(doc, detail="Not found"):
@@ -9,199 +29,22 @@ def raise404_if_none(doc, detail="Not found"):
     return doc
 
 
-def concept_tent(concept_ids, mdb=None):
-    rv = []
-    for cid in [i for i in concept_ids if i]:
-        rv.append(
-            [
-                d["_id"]
-                for d in mdb.alldocs.aggregate(
-                    [
-                        {"$match": {"_id": cid}},
-                        {
-                            "$graphLookup": {
-                                "from": "alldocs",
-                                "startWith": "$_id",
-                                "connectFromField": "_id",
-                                "connectToField": "outgoing.o",
-                                "restrictSearchWithMatch": {"type": "Concept"},
-                                "as": "descendant_concepts",
-                            }
-                        },
-                        {
-                            "$project": {
-                                "_id": 0,
-                                "concept_tent": {
-                                    "$concatArrays": [
-                                        "$descendant_concepts",
-                                        [{"_id": "$_id"}],
-                                    ]
-                                },
-                            }
-                        },
-                        {
-                            "$unwind": {
-                                "path": "$concept_tent",
-                            }
-                        },
-                        {
-                            "$project": {
-                                "_id": "$concept_tent._id",
-                            }
-                        },
-                        {
-                            "$group": {
-                                "_id": "$_id",
-                            }
-                        },
-                    ],
-                    allowDiskUse=True,
-                )
-            ]
-        )
-    return list(unique(concat(rv)))
+async def concept_tent(concept_ids, mdb=None):
+    if graph := await get_graph(mdb):
+        return graph.tent(concept_ids, "Concept")
+    return (await get_hierarchy(mdb, "Concept")).tent(concept_ids)
 
 
-def concept_transitive_closure(cid, mdb=None):
+async def concept_transitive_closure(cid, mdb=None):
     """Return concept IDs for all ancestors of concept ID `cid`, including `cid`."""
-    return [
-        d["_id"]
-        for d in mdb.alldocs.aggregate(
-            [
-                {"$match": {"_id": cid}},
-                {
-                    "$lookup": {
-                        # no need for $graphLookup
-                        #   because skos:braoderTransitive relations are materialized in `outgoing.o`
-                        "from": "alldocs",
-                        "localField": "outgoing.o",
-                        "foreignField": "_id",
-                        "as": "ancestor_concepts",
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": 0,
-                        "concept_closure": {
-                            "$concatArrays": ["$ancestor_concepts", [{"_id": "$_id"}]]
-                        },
-                    }
-                },
-                {
-                    "$unwind": {
-                        "path": "$concept_closure",
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": "$concept_closure._id",
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": "$_id",
-                    }
-                },
-            ]
-        )
-    ]
+    return (await get_hierarchy(mdb, "Concept")).closure(cid)
 
 
-def institution_tent(institution_ids, mdb=None):
-    rv = []
-    for iid in [i for i in institution_ids if i]:
-        rv.append(
-            [
-                d["_id"]
-                for d in mdb.alldocs.aggregate(
-                    [
-                        {"$match": {"_id": iid}},
-                        {
-                            "$graphLookup": {
-                                "from": "alldocs",
-                                "startWith": "$_id",
-                                "connectFromField": "_id",
-                                "connectToField": "outgoing.o",
-                                "restrictSearchWithMatch": {"type": "Institution"},
-                                "as": "descendant_institutions",
-                            }
-                        },
-                        {
-                            "$project": {
-                                "_id": 0,
-                                "institution_tent": {
-                                    "$concatArrays": [
-                                        "$descendant_institutions",
-                                        [{"_id": "$_id"}],
-                                    ]
-                                },
-                            }
-                        },
-                        {
-                            "$unwind": {
-                                "path": "$institution_tent",
-                            }
-                        },
-                        {
-                            "$project": {
-                                "_id": "$institution_tent._id",
-                            }
-                        },
-                        {
-                            "$group": {
-                                "_id": "$_id",
-                            }
-                        },
-                    ],
-                    allowDiskUse=True,
-                )
-            ]
-        )
-    return list(unique(concat(rv)))
+async def institution_tent(institution_ids, mdb=None):
+    if graph := await get_graph(mdb):
+        return graph.tent(institution_ids, "Institution")
+    return (await get_hierarchy(mdb, "Institution")).tent(institution_ids)
 
 
-def institution_transitive_closure(iid, mdb=None):
-    return [
-        d["_id"]
-        for d in mdb.alldocs.aggregate(
-            [
-                {"$match": {"_id": iid}},
-                {
-                    # institution hierarchy is currently just one-deep, so $lookup would currently work as well.
-                    "$graphLookup": {
-                        "from": "alldocs",
-                        "startWith": "$outgoing.o",
-                        "connectFromField": "outgoing.o",
-                        "connectToField": "_id",
-                        "as": "ancestor_institutions",
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": 0,
-                        "institution_closure": {
-                            "$concatArrays": [
-                                "$ancestor_institutions",
-                                [{"_id": "$_id"}],
-                            ]
-                        },
-                    }
-                },
-                {
-                    "$unwind": {
-                        "path": "$institution_closure",
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": "$institution_closure._id",
-                    }
-                },
-                {
-                    "$group": {
-                        "_id": "$_id",
-                    }
-                },
-            ]
-        )
-    ]
+async def institution_transitive_closure(iid, mdb=None):
+    return (await get_hierarchy(mdb, "Institution")).closure(iid)
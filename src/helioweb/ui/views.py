@@ -0,0 +1,228 @@
+"""
+View models for the author, work and institution pages.
+
+A page's neighborhood is fetched in one aggregation over the documents linking to or linked from
+its node, split by role with `$facet`; those linking to it are first found by a range scan of
+`edges`. Edge qualifiers are then read through dicts built once per page rather than by scanning a
+document's edges for each linked document.
+
+Lists that grow without bound (an institution's works, coauthors and collaborating authors) are
+paged by keyset cursors: the first page is part of the view model, later pages are served by the
+`*-works:` and `*-authors:` routes.
+"""
+
+import asyncio
+
+from pymongo import DESCENDING
+
+from helioweb.infra.edges import object_ids, subject_ids, subjects
+from helioweb.infra.funnel import get_funnel
+from helioweb.infra.metrics import named
+from helioweb.infra.similar import similar_authors
+from helioweb.infra.snapshot import get_graph
+from helioweb.infra.util import aggregate_list, encode_cursor, keyset_filter
+
+PAGE_SIZE = 50
+# an institution's works, newest first, by a backward walk of indexes.WORK_LIST_INDEX
+WORK_LIST_SORT = [
+    ("ads_work.year", DESCENDING),
+    ("display_name", DESCENDING),
+    ("_id", DESCENDING),
+]
+
+
+def edges_by_target(doc, p):
+    """{o: edge} for the outgoing edges of `doc` with predicate `p`."""
+    return {e["o"]: e for e in doc.get("outgoing", []) if e["p"] == p}
+
+
+def _targets(doc, p):
+    return list(edges_by_target(doc, p))
+
+
+def _named(match):
+    return [
+        {"$match": match},
+        {"$project": {"display_name": 1}},
+        {"$sort": {"display_name": 1}},
+    ]
+
+
+@named("views.neighborhood")
+async def neighborhood(mdb, ids, facets):
+    """Run the `facets` sub-pipelines over the documents with `ids`."""
+    pipeline = [{"$match": {"_id": {"$in": list(ids)}}}, {"$facet": facets}]
+    return (await aggregate_list(mdb.alldocs, pipeline, allowDiskUse=True))[0]
+
+
+def _page(count, items, next_):
+    return {
+        "count": count,
+        "items": items,
+        "next": encode_cursor(next_) if next_ is not None else None,
+    }
+
+
+async def _paging_graph(mdb):
+    # the shared snapshot when one is published, else this worker's funnel engine
+    return await get_graph(mdb) or await get_funnel(mdb)
+
+
+async def author_coauthors(mdb, author_id, after=None, limit=PAGE_SIZE):
+    """A page of the author's coauthors by name: {"count", "items", "next"}."""
+    graph = await _paging_graph(mdb)
+    return _page(*graph.coauthors(author_id, after=after, limit=limit))
+
+
+async def affil_authors(mdb, affil_id, after=None, limit=PAGE_SIZE):
+    """A page of the authors of the institution's works by name: {"count", "items", "next"}."""
+    graph = await _paging_graph(mdb)
+    return _page(*graph.institution_authors(affil_id, after=after, limit=limit))
+
+
+@named("views.affil_works")
+async def affil_works(mdb, affil_id, after=None, limit=PAGE_SIZE, count=False):
+    """A page of the institution's works, newest first: {"count", "items", "next"}.
+
+    The database walks WORK_LIST_INDEX from the `after` cursor; `count` is None unless requested.
+    """
+    affiliated = {"type": "Work", "outgoing.o": affil_id}
+    filter_ = (
+        affiliated
+        if after is None
+        else {**affiliated, **keyset_filter(WORK_LIST_SORT, after)}
+    )
+    find = mdb.alldocs.find(
+        filter_, ["display_name", "ads_work.year"], sort=WORK_LIST_SORT, limit=limit + 1
+    ).to_list()
+    if count:
+        works, n = await asyncio.gather(find, mdb.alldocs.count_documents(affiliated))
+    else:
+        works, n = await find, None
+    next_ = None
+    if len(works) > limit:
+        last = works[limit - 1]
+        next_ = [
+            last.get("ads_work", {}).get("year"),
+            last.get("display_name"),
+            last["_id"],
+        ]
+    return _page(n, works[:limit], next_)
+
+
+def _with_submitter(doc, edge):
+    if submitter := (edge or {}).get("q2"):
+        doc["_submitter"] = submitter
+    return doc
+
+
+async def author_view(mdb, author):
+    author_id = author["_id"]
+    concept_links = edges_by_target(author, "dcterms:relation")
+
+    async def linked():
+        work_links = {e["s"]: e for e in await subjects(mdb, "author", author_id)}
+        affil_ids = await object_ids(mdb, work_links, "affil")
+        found = await neighborhood(
+            mdb,
+            [*concept_links, *work_links, *affil_ids],
+            {
+                "concepts": _named(
+                    {"type": "Concept", "_id": {"$in": list(concept_links)}}
+                ),
+                "works": [
+                    {"$match": {"type": "Work", "_id": {"$in": list(work_links)}}},
+                    {"$project": {"display_name": 1, "ads_work.year": 1}},
+                ],
+                "institutions": _named(
+                    {"type": "Institution", "_id": {"$in": affil_ids}}
+                ),
+            },
+        )
+        return work_links, found
+
+    (work_links, found), coauthors, similar = await asyncio.gather(
+        linked(),
+        author_coauthors(mdb, author_id),
+        similar_authors(mdb, author_id),
+    )
+    author_concepts = sorted(
+        (_with_submitter(c, concept_links[c["_id"]]) for c in found["concepts"]),
+        key=lambda c: (concept_links[c["_id"]]["q"], c["display_name"]),
+        reverse=True,
+    )
+    author_works = sorted(
+        (_with_submitter(w, work_links[w["_id"]]) for w in found["works"]),
+        key=lambda work: (work["ads_work"]["year"], work["display_name"]),
+        reverse=True,
+    )
+    return {
+        "author_concepts": author_concepts,
+        "author_works": author_works,
+        "author_coauthors": coauthors,
+        "author_collaborating_institutions": found["institutions"],
+        "author_similar": similar,
+    }
+
+
+async def work_view(mdb, work):
+    author_links = edges_by_target(work, "author")
+    found = await neighborhood(
+        mdb,
+        [e["o"] for e in work.get("outgoing", [])],
+        {
+            "authors": _named({"type": "Author", "_id": {"$in": list(author_links)}}),
+            "affils": _named(
+                {"type": "Institution", "_id": {"$in": _targets(work, "affil")}}
+            ),
+        },
+    )
+    return {
+        "work_authors": [
+            {**a, "q": author_links[a["_id"]]["q"]} for a in found["authors"]
+        ],
+        "work_affils": found["affils"],
+    }
+
+
+async def affil_view(mdb, affil):
+    affil_id = affil["_id"]
+    parent_ids = _targets(affil, "skos:broader")
+    child_ids = await subject_ids(mdb, affil_id, ["skos:broader"])
+    found, works, authors = await asyncio.gather(
+        neighborhood(
+            mdb,
+            [*parent_ids, *child_ids],
+            {
+                "parents": _named({"type": "Institution", "_id": {"$in": parent_ids}}),
+                "children": _named({"type": "Institution", "_id": {"$in": child_ids}}),
+            },
+        ),
+        affil_works(mdb, affil_id, count=True),
+        affil_authors(mdb, affil_id),
+    )
+    return {
+        "affil_parents": found["parents"],
+        "affil_children": found["children"],
+        "affil_works": works,
+        "affil_collaborating_authors": authors,
+    }
+
+
+async def connection_view(mdb, source, target, max_depth, timeout):
+    """The shortest coauthorship chain between two authors, with its works' documents."""
+    funnel = await get_funnel(mdb)
+    status, authors, work_ids = await asyncio.to_thread(
+        funnel.coauthor_path, source, target, max_depth=max_depth, timeout=timeout
+    )
+    works = {
+        w["_id"]: w
+        for w in await mdb.alldocs.find(
+            {"_id": {"$in": work_ids}}, ["display_name", "ads_work.year"]
+        ).to_list()
+    }
+    return {
+        "status": status,
+        "authors": authors,
+        "works": [works.get(w, {"_id": w, "display_name": w}) for w in work_ids],
+    }
@@ -0,0 +1,188 @@
+"""
+A minimal in-memory stand-in for the async driver's collections, covering only the queries and
+updates the tested code runs.
+"""
+
+import asyncio
+import copy
+import operator
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+
+def evaluate(expr, doc):
+    """An aggregation expression of the few operators used in pipeline updates."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, dict):
+        ((op, args),) = expr.items()
+        values = [evaluate(a, doc) for a in args]
+        if op == "$ifNull":
+            return values[0] if values[0] is not None else values[1]
+        if op == "$max":
+            return max(v for v in values if v is not None)
+        if op == "$add":
+            return sum(values)
+        raise NotImplementedError(op)
+    return expr
+
+
+COMPARISONS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt}
+TYPES = {"number": 1, "string": 2}
+
+
+def rank(value):
+    """The BSON sort order of the value types used: nulls, then numbers, then strings."""
+    if value is None:
+        return 0
+    return 1 if isinstance(value, (int, float)) else 2
+
+
+def sort_key(value):
+    return rank(value), 0 if value is None else value
+
+
+def meets(doc, field, cond):
+    value = doc.get(field)
+    if not (isinstance(cond, dict) and all(k.startswith("$") for k in cond)):
+        return value == cond
+    for op, arg in cond.items():
+        if op in COMPARISONS:
+            # comparisons only match values of the same type
+            met = rank(value) == rank(arg) != 0 and COMPARISONS[op](value, arg)
+        elif op == "$ne":
+            met = value != arg
+        elif op == "$in":
+            met = value in arg
+        elif op == "$exists":
+            met = (field in doc) == arg
+        elif op == "$type":
+            met = rank(value) == TYPES[arg]
+        elif op == "$not":
+            met = not meets(doc, field, arg)
+        elif op == "$elemMatch":
+            met = any(matches(e, arg) for e in value or [])
+        else:
+            raise NotImplementedError(op)
+        if not met:
+            return False
+    return True
+
+
+def matches(doc, filter_):
+    return all(
+        any(matches(doc, f) for f in cond)
+        if field == "$or"
+        else meets(doc, field, cond)
+        for field, cond in filter_.items()
+    )
+
+
+def apply_update(doc, update, inserting=False):
+    if isinstance(update, list):
+        for stage in update:
+            for field, expr in stage["$set"].items():
+                doc[field] = evaluate(expr, doc)
+        return
+    for op, fields in update.items():
+        for field, value in fields.items():
+            if op == "$set":
+                doc[field] = value
+            elif op == "$inc":
+                doc[field] = doc.get(field, 0) + value
+            elif op == "$max":
+                doc[field] = value if doc.get(field) is None else max(doc[field], value)
+            elif op == "$push":
+                doc.setdefault(field, []).append(value)
+            elif op == "$setOnInsert":
+                if inserting:
+                    doc[field] = value
+            else:
+                raise NotImplementedError(op)
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self):
+        await asyncio.sleep(0)  # a round trip, during which other tasks run
+        return self.docs
+
+    async def __aiter__(self):
+        for d in self.docs:
+            yield d
+
+
+class Collection:
+    def __init__(self):
+        self.docs = {}
+        self.unique = None  # the fields of a unique index, if any
+
+    def _find(self, filter_):
+        return [d for d in self.docs.values() if matches(d, filter_)]
+
+    def find(self, filter_=None, projection=None, sort=None, batch_size=None):
+        docs = [copy.deepcopy(d) for d in self._find(filter_ or {})]
+        for field, direction in reversed(sort or []):
+            docs.sort(key=lambda d: sort_key(d.get(field)), reverse=direction < 0)
+        return Cursor(docs)
+
+    async def find_one(self, filter_=None, projection=None):
+        found = self._find(filter_ or {})
+        return copy.deepcopy(found[0]) if found else None
+
+    def _insert(self, doc):
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.docs or (
+            self.unique
+            and self._find({f: doc.get(f) for f in self.unique if f != "_id"})
+        ):
+            raise DuplicateKeyError(f"E11000 duplicate key: {doc['_id']}")
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+
+    async def insert_many(self, docs):
+        for d in docs:
+            self._insert(d)
+
+    async def bulk_write(self, requests, ordered=True):
+        """Apply `UpdateOne` requests. Upserts yield to other tasks between finding no document
+        and inserting one, as the server's may."""
+        errors = []
+        for index, op in enumerate(requests):
+            if found := self._find(op._filter):
+                apply_update(found[0], op._doc)
+            elif op._upsert:
+                await asyncio.sleep(0)
+                doc = {f: v for f, v in op._filter.items() if not isinstance(v, dict)}
+                apply_update(doc, op._doc, inserting=True)
+                try:
+                    self._insert(doc)
+                except DuplicateKeyError as e:
+                    errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": []})
+
+    async def find_one_and_update(
+        self, filter_, update, upsert=False, return_document=ReturnDocument.BEFORE
+    ):
+        found = self._find(filter_)
+        if not found and not upsert:
+            return None
+        doc = found[0] if found else {"_id": filter_["_id"]}
+        before = copy.deepcopy(doc)
+        apply_update(doc, update)
+        self.docs[doc["_id"]] = doc
+        return copy.deepcopy(doc if return_document == ReturnDocument.AFTER else before)
+
+
+class Database:
+    def __init__(self):
+        self._collections = {}
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, Collection())
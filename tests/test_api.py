@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from fakemongo import Database
+from fastapi import HTTPException
+
+from helioweb.ui.api import _author_concepts, _author_works, _outermost, parse_fields
+
+
+def test_outermost_drops_covered_paths():
+    assert _outermost(["display_name", "ads_work.year", "ads_work", "ads_work"]) == [
+        "display_name",
+        "ads_work",
+    ]
+    # a shared prefix is not a parent path
+    assert _outermost(["ads_work", "ads_workshop"]) == ["ads_work", "ads_workshop"]
+
+
+def test_parse_fields_splits_relations():
+    assert parse_fields("Work", "ads_work.year, authors") == (
+        ["ads_work.year"],
+        ["authors"],
+    )
+    assert parse_fields("Work", None) == (None, [])
+
+
+def test_parse_fields_rejects_operators():
+    with pytest.raises(HTTPException):
+        parse_fields("Work", "$where")
+
+
+def test_author_lists_sort_missing_values():
+    mdb = Database()
+    concepts = {"C1": "Corona", "C2": None, "C3": "Aurora", "C4": "Wind"}
+    for id_, name in concepts.items():
+        mdb.alldocs.docs[id_] = {"_id": id_, "type": "Concept", "display_name": name}
+    works = {"W1": 2001, "W2": None, "W3": "1999", "W4": 2010}
+    for id_, year in works.items():
+        mdb.alldocs.docs[id_] = {"_id": id_, "type": "Work", "display_name": id_}
+        if year is not None:
+            mdb.alldocs.docs[id_]["ads_work"] = {"year": year}
+        mdb.edges.docs[id_] = {"_id": id_, "s": id_, "p": "author", "o": "A1"}
+    mdb.alldocs.docs["W1"]["display_name"] = None
+    author = {
+        "_id": "A1",
+        "outgoing": [
+            {"p": "dcterms:relation", "o": "C1", "q": 2},
+            {"p": "dcterms:relation", "o": "C2", "q": 2},
+            {"p": "dcterms:relation", "o": "C3", "q": None},
+            {"p": "dcterms:relation", "o": "C4"},
+        ],
+    }
+
+    async def load():
+        return await asyncio.gather(
+            _author_concepts(mdb, [author]), _author_works(mdb, [author])
+        )
+
+    found_concepts, found_works = asyncio.run(load())
+    assert [c["_id"] for c in found_concepts["A1"]] == ["C1", "C2", "C4", "C3"]
+    assert [w["_id"] for w in found_works["A1"]] == ["W3", "W4", "W1", "W2"]
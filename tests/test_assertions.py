@@ -0,0 +1,25 @@
+import asyncio
+
+from fakemongo import Database
+from helioweb.ui.assertions import assert_edges
+
+
+def test_concurrent_submissions_add_an_edge_once():
+    mdb = Database()
+    mdb.edges.unique = ("s", "p", "o")
+    for id_, type_ in (("W1", "Work"), ("A1", "Author"), ("A2", "Author")):
+        mdb.alldocs.docs[id_] = {"_id": id_, "type": type_}
+    triples = [("W1", "author", "A1"), ("W1", "author", "A2")]
+
+    async def submit_twice():
+        return await asyncio.gather(
+            assert_edges(mdb, triples, "0000-0001-0000-0001"),
+            assert_edges(mdb, triples, "0000-0002-0000-0002"),
+        )
+
+    results = asyncio.run(submit_twice())
+    assert sorted(t for r in results for t in r["added"]) == triples
+    assert sorted(t for r in results for t in r["existing"]) == triples
+    assert len(mdb.edges.docs) == 2
+    assert len(mdb.alldocs.docs["W1"]["outgoing"]) == 2
+    assert sorted(e["o"] for e in mdb.edge_log.docs.values()) == ["A1", "A2"]
@@ -0,0 +1,24 @@
+import numpy as np
+
+from helioweb.infra.csr import csr_from_pairs, csr_from_rows, gather
+
+
+def test_csr_from_rows_and_transpose():
+    (indptr, indices), (t_indptr, t_indices) = csr_from_rows([[1, 2], [], [0, 2]], 3)
+    assert indptr.tolist() == [0, 2, 2, 4]
+    assert indices.tolist() == [1, 2, 0, 2]
+    # column c's rows are t_indices[t_indptr[c]:t_indptr[c + 1]]
+    assert t_indptr.tolist() == [0, 1, 2, 4]
+    assert t_indices.tolist() == [2, 0, 0, 2]
+
+
+def test_csr_from_pairs_sorts_neighbors():
+    indptr, indices = csr_from_pairs(np.array([2, 0, 2, 0]), np.array([1, 3, 0, 2]), 4)
+    assert indptr.tolist() == [0, 2, 2, 4, 4]
+    assert indices.tolist() == [2, 3, 0, 1]
+
+
+def test_gather():
+    csr = csr_from_rows([[1, 2], [], [0, 2], [3]], 4)[0]
+    assert gather(csr, np.array([3, 0, 1])).tolist() == [3, 1, 2]
+    assert gather(csr, np.array([], dtype=np.int64)).tolist() == []
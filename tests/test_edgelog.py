@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fakemongo import Database
+from helioweb.infra import edgelog, versions
+from helioweb.infra.edgelog import GAP_SECONDS, LogReader, edge_log_seq, log_edges
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def entry(seq, age=timedelta()):
+    return {"_id": seq, "s": f"s{seq}", "p": "author", "o": "o", "at": NOW - age}
+
+
+def fake_log(monkeypatch, entries):
+    async def edge_log_seq(mdb):
+        return max((e["_id"] for e in entries), default=0)
+
+    async def edges_since(mdb, seq):
+        return sorted((e for e in entries if e["_id"] > seq), key=lambda e: e["_id"])
+
+    monkeypatch.setattr(edgelog, "edge_log_seq", edge_log_seq)
+    monkeypatch.setattr(edgelog, "edges_since", edges_since)
+
+
+def test_advances_across_gap_free_run():
+    log = LogReader(3)
+    log.applied([entry(4), entry(5)], now=NOW)
+    assert log.seq == 5
+
+
+def test_waits_at_a_recent_gap():
+    log = LogReader(3)
+    log.applied([entry(5), entry(6)], now=NOW)
+    assert log.seq == 3
+    log.applied([entry(4)], now=NOW)
+    assert log.seq == 6
+
+
+def test_skips_a_gap_once_it_is_old():
+    log = LogReader(3)
+    log.applied([entry(5)], now=NOW)
+    assert log.seq == 3
+    log.applied([], now=NOW + timedelta(seconds=GAP_SECONDS))
+    assert log.seq == 5
+
+
+def test_naive_times_are_utc():
+    log = LogReader(0)
+    stale = {**entry(2), "at": (NOW - timedelta(hours=1)).replace(tzinfo=None)}
+    log.applied([stale], now=NOW)
+    assert log.seq == 2
+
+
+def test_lost_entry_is_applied_once_and_skipped(monkeypatch):
+    # entry 2 was allocated, but its writer died before inserting it
+    entries = [{**entry(seq), "at": datetime.now(timezone.utc)} for seq in (1, 3)]
+    fake_log(monkeypatch, entries)
+    log = LogReader(0)
+    applied = []
+
+    async def replay():
+        return await log.catch_up(None, lambda e: applied.append(e["_id"]))
+
+    asyncio.run(replay())
+    asyncio.run(replay())
+    assert applied == [1, 3]
+    assert log.seq == 1
+    assert asyncio.run(log.behind(None))
+
+    # the gap is old enough to give up on entry 2
+    monkeypatch.setattr(edgelog, "GAP_SECONDS", 0)
+    asyncio.run(replay())
+    assert applied == [1, 3]
+    assert log.seq == 3
+    assert not asyncio.run(log.behind(None))
+
+
+def test_writer_sees_its_entries_at_once(monkeypatch):
+    monkeypatch.setattr(versions, "VERSION_CHECK_SECONDS", 3600)
+    mdb = Database()
+    # an older log, from before entries were allocated from their own counter
+    mdb.meta.docs["versions"] = {"_id": "versions", "edge_log": 5}
+
+    async def write():
+        versions._remember(await mdb.meta.find_one({"_id": "versions"}))
+        await log_edges(mdb, [{"s": "W1", "p": "author", "o": "A1"}] * 2)
+        return await edge_log_seq(mdb)
+
+    assert asyncio.run(write()) == 7
+    assert sorted(mdb.edge_log.docs) == [6, 7]
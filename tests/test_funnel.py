@@ -0,0 +1,90 @@
+from helioweb.infra.funnel import FunnelEngine
+
+AUTHORS = [
+    ("A1", "Alice", ["C1"]),
+    ("A2", "Bob", ["C1", "C2"]),
+    ("A3", "Carol", ["C2"]),
+    ("A4", "Dan", []),
+    ("A5", "Eve", []),
+]
+WORKS = [
+    ("W1", ["A1", "A2"], ["I1"]),
+    ("W2", ["A2", "A3"], ["I2"]),
+    ("W3", ["A3", "A4"], []),
+    ("W4", ["A5", "unknown"], ["I1"]),
+]
+
+
+def engine():
+    return FunnelEngine(AUTHORS, WORKS)
+
+
+def ids(items):
+    return [i["_id"] for i in items]
+
+
+def test_query_by_concept_and_institution():
+    e = engine()
+    assert e.query(concepts=["C1"]) == (
+        2,
+        [{"_id": "A1", "display_name": "Alice"}, {"_id": "A2", "display_name": "Bob"}],
+    )
+    count, items = e.query(concepts=["C1"], institutions=["I2"])
+    assert (count, ids(items)) == (1, ["A2"])
+    count, items = e.query(institutions=["I1"])
+    assert (count, ids(items)) == (3, ["A1", "A2", "A5"])
+
+
+def test_query_by_coauthors_requires_all():
+    count, items = engine().query(coauthors=["A2", "A3"])
+    assert (count, ids(items)) == (2, ["A2", "A3"])
+
+
+def test_add_edge():
+    e = engine()
+    assert e.add_edge("W3", "author", "A5")
+    assert ids(e.query(coauthors=["A5"])[1]) == ["A3", "A4", "A5"]
+    assert e.add_edge("A4", "dcterms:relation", "C1")
+    assert ids(e.query(concepts=["C1"])[1]) == ["A1", "A2", "A4"]
+    # documents the engine was not built with need a rebuild
+    assert not e.add_edge("W9", "author", "A1")
+    assert not e.add_edge("A9", "dcterms:relation", "C1")
+
+
+def test_coauthors_pages_by_name():
+    e = engine()
+    count, page, next_ = e.coauthors("A2", limit=1)
+    assert (count, ids(page), next_) == (2, ["A1"], ["Alice", "A1"])
+    count, page, next_ = e.coauthors("A2", after=next_, limit=1)
+    assert (count, ids(page), next_) == (2, ["A3"], None)
+
+
+def test_institution_authors():
+    count, page, next_ = engine().institution_authors("I1", limit=2)
+    assert (count, ids(page), next_) == (3, ["A1", "A2"], ["Bob", "A2"])
+
+
+def test_coauthor_path():
+    e = engine()
+    status, authors, works = e.coauthor_path("A1", "A4")
+    assert status == "found"
+    assert ids(authors) == ["A1", "A2", "A3", "A4"]
+    assert works == ["W1", "W2", "W3"]
+    assert e.coauthor_path("A1", "A1")[:2] == (
+        "found",
+        [{"_id": "A1", "display_name": "Alice"}],
+    )
+    assert e.coauthor_path("A1", "A4", max_depth=2)[0] == "too_far"
+    assert e.coauthor_path("A1", "A5")[0] == "unconnected"
+    assert e.coauthor_path("A1", "nobody")[0] == "unknown"
+
+
+def test_coauthor_path_through_asserted_edge():
+    e = engine()
+    e.add_edge("W4", "author", "A1")
+    status, authors, works = e.coauthor_path("A5", "A3")
+    assert (status, ids(authors), works) == (
+        "found",
+        ["A5", "A1", "A2", "A3"],
+        ["W4", "W1", "W2"],
+    )
@@ -0,0 +1,36 @@
+from helioweb.infra.hierarchy import Hierarchy
+
+
+def hierarchy():
+    # B and C are under A, D is under both B and C; E names an unknown parent and itself
+    return Hierarchy(
+        {"A": set(), "B": {"A"}, "C": {"A"}, "D": {"B", "C"}, "E": {"X", "E"}}
+    )
+
+
+def test_unknown_parents_and_self_loops_are_dropped():
+    h = hierarchy()
+    assert h.parents["E"] == frozenset()
+    assert "X" not in h
+
+
+def test_closure():
+    h = hierarchy()
+    assert h.closure("D")[0] == "D"
+    assert set(h.closure("D")) == {"A", "B", "C", "D"}
+    assert h.closure("A") == ["A"]
+    assert h.closure("X") == []
+
+
+def test_tent():
+    h = hierarchy()
+    assert h.tent(["B"]) == ["B", "D"]
+    assert sorted(h.tent(["A"])) == ["A", "B", "C", "D"]
+    # each ID once, and unknown IDs skipped
+    assert sorted(h.tent(["B", "C", "X"])) == ["B", "C", "D"]
+
+
+def test_cycle_terminates():
+    h = Hierarchy({"A": {"B"}, "B": {"A"}})
+    assert h.ancestors == {"A": {"B"}, "B": {"A"}}
+    assert sorted(h.tent(["A"])) == ["A", "B"]
@@ -0,0 +1,82 @@
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import DCTERMS, FOAF, RDF, RDFS
+
+from helioweb.infra.linkeddata import Minter, negotiate, ntriples, serialize
+
+BASE = "https://example.org/"
+WORK = {
+    "_id": "W1",
+    "type": "Work",
+    "display_name": 'A "quoted"\ntitle',
+    "ads_work": {"year": "2020"},
+    "outgoing": [
+        {"p": "author", "o": "https://orcid.org/0000-0001"},
+        {"p": "affil", "o": "I1"},
+    ],
+}
+
+
+def test_negotiate():
+    assert negotiate("text/turtle") == "text/turtle"
+    assert negotiate("text/html,application/xhtml+xml,*/*;q=0.8") is None
+    assert negotiate("application/ld+json;q=0.5, text/turtle;q=0.9") == "text/turtle"
+    assert negotiate("text/turtle;q=0, */*") is None
+    assert negotiate("application/n-triples;q=bad, application/ld+json") == (
+        "application/ld+json"
+    )
+    assert negotiate("") is None
+
+
+def test_minter_nodes():
+    minter = Minter(BASE)
+    assert minter.node("W1", "Work") == f"{BASE}work:W1"
+    assert minter.node("https://orcid.org/0000-0001", "Author") == (
+        "https://orcid.org/0000-0001"
+    )
+    assert minter.node("a b", "Concept") == f"{BASE}concept:a%20b"
+    assert minter.predicate("author") == str(DCTERMS.creator)
+    assert minter.predicate("skos:broader").endswith("#broader")
+    assert minter.predicate("affil") == f"{BASE}vocab#affil"
+
+
+def test_outgoing_and_incoming():
+    minter = Minter(BASE)
+    triples = list(minter.outgoing(WORK))
+    s = f"{BASE}work:W1"
+    assert (s, str(RDF.type), str(DCTERMS.BibliographicResource), False) in triples
+    assert (s, str(RDFS.label), WORK["display_name"], True) in triples
+    assert (s, f"{BASE}vocab#affil", f"{BASE}affil:I1", False) in triples
+    incoming = list(
+        minter.incoming(
+            {"_id": "I1", "type": "Institution"}, [{"s": "W1", "p": "affil"}]
+        )
+    )
+    assert incoming == [(s, f"{BASE}vocab#affil", f"{BASE}affil:I1", False)]
+
+
+def test_ntriples_escape_literals():
+    minter = Minter(BASE)
+    text = "".join(ntriples(minter.outgoing(WORK)))
+    assert '"A \\"quoted\\"\\ntitle"' in text
+    graph = Graph().parse(data=text, format="nt")
+    assert (
+        URIRef(f"{BASE}work:W1"),
+        RDFS.label,
+        Literal(WORK["display_name"]),
+    ) in graph
+
+
+def test_serialize_round_trips():
+    minter = Minter(BASE)
+    triples = list(minter.outgoing(WORK))
+    for format in ("turtle", "json-ld"):
+        graph = Graph().parse(
+            data=serialize(triples, format, vocab=minter.vocab), format=format
+        )
+        assert len(graph) == len(triples)
+        assert (
+            URIRef(f"{BASE}work:W1"),
+            DCTERMS.creator,
+            URIRef("https://orcid.org/0000-0001"),
+        ) in graph
+    assert (URIRef(f"{BASE}work:W1"), RDF.type, FOAF.Person) not in graph
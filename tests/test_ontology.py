@@ -0,0 +1,54 @@
+from helioweb.infra.ontology import Vocabulary, content_hash, parse
+
+CFHA = "http://www.semanticweb.org/ontologies/2022/1/CfHA#"
+TTL = f"""
+@prefix cfha: <{CFHA}> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+
+cfha:Topic a owl:Class .
+cfha:Sun rdfs:subClassOf cfha:Topic ; rdfs:label "Sun"@en, "Soleil"@fr .
+<{CFHA}Solar+wind> rdfs:subClassOf cfha:Sun ; rdfs:comment "Outflow of plasma." .
+cfha:Parker a <{CFHA}Solar+wind> ; skos:prefLabel "Parker spiral" ; rdfs:label "Parker" .
+<http://example.org/Other> rdfs:subClassOf <http://example.org/Thing> .
+"""
+
+
+def documents(tmp_path):
+    path = tmp_path / "vocab.ttl"
+    path.write_text(TTL)
+    vocabulary = Vocabulary(topic_root=CFHA + "Topic")
+    parse(str(path), vocabulary.add)
+    return {d["_id"]: d for d in vocabulary.documents("vocab.ttl")}
+
+
+def test_concepts_are_topic_classes_and_their_individuals(tmp_path):
+    assert set(documents(tmp_path)) == {
+        CFHA + "Sun",
+        CFHA + "Solar+wind",
+        CFHA + "Parker",
+    }
+
+
+def test_labels_prefer_english_skos(tmp_path):
+    docs = documents(tmp_path)
+    assert docs[CFHA + "Sun"]["display_name"] == "Sun"
+    assert docs[CFHA + "Parker"]["display_name"] == "Parker spiral"
+    assert docs[CFHA + "Solar+wind"]["display_name"] == "Solar wind"
+    assert docs[CFHA + "Solar+wind"]["description"] == "Outflow of plasma."
+
+
+def test_broader_edges_are_the_closure(tmp_path):
+    docs = documents(tmp_path)
+    parker = docs[CFHA + "Parker"]
+    assert [e["o"] for e in parker["outgoing"]] == [CFHA + "Solar+wind", CFHA + "Sun"]
+    assert {e["p"] for e in parker["outgoing"]} == {"skos:broader"}
+    assert parker["concept"]["level"] == 2
+    assert docs[CFHA + "Sun"]["concept"]["level"] == 0
+
+
+def test_hash_ignores_derived_fields(tmp_path):
+    doc = documents(tmp_path)[CFHA + "Sun"]
+    assert doc["_hash"] == content_hash({**doc, "_ac": ["sun"]})
+    assert doc["_hash"] != content_hash({**doc, "display_name": "Sol"})
@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+from helioweb.infra import orcid
+from helioweb.infra.orcid import CircuitBreaker, OrcidRejected, OrcidUnavailable
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    b = CircuitBreaker(failures=2, reset_seconds=0)
+    monkeypatch.setattr(orcid, "breaker", b)
+    monkeypatch.setattr(orcid, "BACKOFF_SECONDS", 0)
+    return b
+
+
+def answer(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(orcid, "_client", client)
+
+
+def half_open(b):
+    b.failed()
+    b.failed()
+    assert b.state == "half-open"
+
+
+def test_opens_after_failures_in_a_row():
+    b = CircuitBreaker(failures=2, reset_seconds=60)
+    b.failed()
+    assert b.state == "closed"
+    b.failed()
+    assert b.state == "open"
+    assert not b.allow()
+
+
+def test_half_open_lets_one_trial_through():
+    b = CircuitBreaker(failures=1, reset_seconds=0)
+    b.failed()
+    assert b.allow()
+    assert not b.allow()
+    b.succeeded()
+    assert b.state == "closed"
+    assert b.allow()
+
+
+def test_exchange_returns_the_token(monkeypatch, breaker):
+    answer(monkeypatch, lambda request: httpx.Response(200, json={"orcid": "0000"}))
+    assert asyncio.run(orcid.exchange_code("code")) == {"orcid": "0000"}
+    assert breaker.state == "closed"
+
+
+def test_refused_code_is_not_a_failure(monkeypatch, breaker):
+    answer(monkeypatch, lambda request: httpx.Response(400))
+    half_open(breaker)
+    with pytest.raises(OrcidRejected):
+        asyncio.run(orcid.exchange_code("code"))
+    assert breaker.state == "closed"
+
+
+def test_retries_unavailable_statuses(monkeypatch, breaker):
+    statuses = [503, 200]
+    answer(
+        monkeypatch,
+        lambda request: httpx.Response(statuses.pop(0), json={"orcid": "0000"}),
+    )
+    assert asyncio.run(orcid.exchange_code("code")) == {"orcid": "0000"}
+    assert not statuses
+
+
+def test_unreadable_answer_is_a_failure(monkeypatch, breaker):
+    answer(monkeypatch, lambda request: httpx.Response(200, content=b"<html>"))
+    with pytest.raises(OrcidUnavailable):
+        asyncio.run(orcid.exchange_code("code"))
+    assert breaker._failed == 1
+
+
+def test_unexpected_error_releases_the_trial(monkeypatch, breaker):
+    def handler(request):
+        raise httpx.DecodingError("bad gzip", request=request)
+
+    answer(monkeypatch, handler)
+    half_open(breaker)
+    with pytest.raises(httpx.DecodingError):
+        asyncio.run(orcid.exchange_code("code"))
+    assert breaker.allow()
+
+
+def test_cancelled_exchange_releases_the_trial(monkeypatch, breaker):
+    async def handler(request):
+        await asyncio.sleep(10)
+
+    answer(monkeypatch, handler)
+    half_open(breaker)
+
+    async def cancel():
+        task = asyncio.create_task(orcid.exchange_code("code"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert breaker.allow()
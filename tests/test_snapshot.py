@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fakemongo import Database
+
+from helioweb.infra.funnel import build_funnel
+from helioweb.infra.snapshot import GraphSnapshot, build_snapshot
+
+
+def doc(id_, type_, name=None, **outgoing):
+    d = {"_id": id_, "type": type_}
+    if name is not None:
+        d["display_name"] = name
+    d["outgoing"] = [{"p": p, "o": o} for p, os in outgoing.items() for o in os]
+    return d
+
+
+DOCS = [
+    doc("A1", "Author", "Ada"),
+    doc("A2", "Author"),  # no display name
+    doc("A3", "Author", "Bo"),
+    doc("A4", "Author", "Ada"),
+    doc("A5", "Author", "Cy"),
+    doc("C1", "Concept", "Corona"),
+    doc("I1", "Institution", "Lab"),
+    doc("I2", "Institution", "Observatory"),
+    # a concept given as an author, and an author missing from the corpus
+    doc("W1", "Work", "Flares", author=["A1", "A2", "C1"], affil=["I1"]),
+    doc("W2", "Work", "Winds", author=["A1", "A3", "A4", "gone"], affil=["I1"]),
+    doc("W3", "Work", "Spots", author=["A3"], affil=["I2"]),
+    doc("W4", "Work", "Loops", author=["A5"]),
+]
+
+
+def all_pages(graph, method, id_):
+    pages, after = [], None
+    for _ in DOCS:  # bounded, should a cursor not advance
+        count, items, after = getattr(graph, method)(id_, after=after, limit=2)
+        pages.append((count, items))
+        if after is None:
+            break
+    return pages
+
+
+@pytest.fixture
+def graphs(tmp_path):
+    db = SimpleNamespace(
+        meta=SimpleNamespace(find_one=lambda filter_: None),
+        alldocs=SimpleNamespace(find=lambda *args, **kwargs: iter(DOCS)),
+    )
+    build_snapshot(db, tmp_path / "graph")
+    mdb = Database()
+    mdb.alldocs.docs = {d["_id"]: d for d in DOCS}
+    return GraphSnapshot(tmp_path / "graph"), asyncio.run(build_funnel(mdb))
+
+
+def assert_same_answers(snapshot, funnel):
+    for id_ in ("A1", "A2", "A3", "A5", "C1", "missing"):
+        assert all_pages(snapshot, "coauthors", id_) == all_pages(
+            funnel, "coauthors", id_
+        )
+    for id_ in ("I1", "I2", "missing"):
+        assert all_pages(snapshot, "institution_authors", id_) == all_pages(
+            funnel, "institution_authors", id_
+        )
+
+
+def test_snapshot_answers_as_the_funnel_does(graphs):
+    snapshot, funnel = graphs
+    assert all_pages(snapshot, "coauthors", "A1") == [
+        (
+            3,
+            [{"_id": "A2", "display_name": None}, {"_id": "A4", "display_name": "Ada"}],
+        ),
+        (3, [{"_id": "A3", "display_name": "Bo"}]),
+    ]
+    assert_same_answers(snapshot, funnel)
+
+
+def test_snapshot_overlay_answers_as_the_funnel_does(graphs):
+    snapshot, funnel = graphs
+    edges = [("W4", "author", "A2"), ("W3", "author", "C1"), ("W3", "affil", "I1")]
+    assert [snapshot.add_edge(*e) for e in edges] == [True, True, True]
+    # the funnel asks for a rebuild, which leaves the concept out too
+    assert [funnel.add_edge(*e) for e in edges] == [True, False, True]
+    assert_same_answers(snapshot, funnel)
@@ -0,0 +1,38 @@
+from helioweb.infra.typeahead import PrefixIndex, normalize
+
+DOCS = [
+    {"_id": "1", "display_name": "Solar Wind"},
+    {"_id": "2", "display_name": "Wind Shear"},
+    {"_id": "3", "display_name": "Élodie Wind"},
+    {"_id": "4", "display_name": None},
+]
+
+
+def test_normalize():
+    assert normalize("  Élodie   WIND ") == "elodie wind"
+    assert normalize(None) == ""
+
+
+def test_whole_name_matches_come_before_word_matches():
+    matches, more = PrefixIndex(DOCS).search("wind")
+    assert matches == [("2", "Wind Shear"), ("1", "Solar Wind"), ("3", "Élodie Wind")]
+    assert not more
+
+
+def test_accents_and_case_are_ignored():
+    assert PrefixIndex(DOCS).search("ELO")[0] == [("3", "Élodie Wind")]
+
+
+def test_offset_limit_and_exclude():
+    index = PrefixIndex(DOCS)
+    assert index.search("wind", limit=1) == ([("2", "Wind Shear")], True)
+    assert index.search("wind", offset=1, limit=1) == ([("1", "Solar Wind")], True)
+    assert index.search("wind", exclude={"2"}) == (
+        [("1", "Solar Wind"), ("3", "Élodie Wind")],
+        False,
+    )
+
+
+def test_empty_query_lists_everything_once():
+    matches, _ = PrefixIndex(DOCS).search("")
+    assert sorted(i for i, _ in matches) == ["1", "2", "3", "4"]